@@ -1,14 +1,22 @@
 import os
-import csv
-import json
+import atexit
+import threading
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
-from mrs import hybrid_recommendation,new_df, tfidf_matrix, indices, model_knn, movie_user_mat_sparse,movie_to_idx, recommend_by_mood# Assumes your recommendation logic is in mrs.py
-from watchlist_recommender import personalized_recommend
+from recommender import hybrid_recommendation, hybrid_recommendation_batch, recommend_by_mood  # serving side of mrs.py
+import model_store
+from model_store import get_model, warmup
+from watchlist_recommender import multi_seed_recommend
+from title_index import TitleSearchIndex
+from explore_index import ExploreIndex
+from result_cache import ResultCache
+from mood_index import SORT_KEYS as MOOD_SORT_KEYS
+from catalog_cache import movies_table
+from movie_store import MovieStore
 from datetime import datetime
-from chatbot import chatbot_bp
+from chatbot import chatbot_bp, router as chat_router
 from dotenv import load_dotenv
 
 
@@ -49,65 +57,117 @@ class RecentlyViewed(db.Model):
     movie_title = db.Column(db.String(200), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+# --------------------- Recommendation Model ---------------------
+# Trained offline by build_bundle.py. Nothing is loaded at import time: get_model() maps the
+# CURRENT bundle on first use, and warmup() does it eagerly at startup. Handlers take the model
+# once per request, so a hot swap (POST /admin/model/reload) never changes it mid-request.
+
+# Finished hybrid results, keyed by (resolved catalog row, top_n, model version). Restored from
+# the last snapshot and prewarmed with the most popular titles at startup (see result_cache.py).
+RESULT_CACHE = ResultCache()
+PREWARM_TITLES = int(os.getenv('RESULT_CACHE_PREWARM', 100))
+MAX_BATCH_TITLES = int(os.getenv('RECOMMEND_BATCH_MAX', 50))
+
+def snapshot_result_cache():
+    # Runs at interpreter exit under any server, so a restart restores the live hot set. A process
+    # that never served (e.g. the debug reloader's parent) keeps the previous snapshot
+    if not len(RESULT_CACHE):
+        return
+    try:
+        RESULT_CACHE.snapshot()
+    except OSError as e:
+        print(f"[WARNING] Could not write the result cache snapshot: {e}")
+
+atexit.register(snapshot_result_cache)
+
+def cached_recommendations(movie_name, model, top_n=20):
+    pos = model.title_resolver.position(movie_name)
+    if pos is None:
+        return hybrid_recommendation(movie_name, model, top_n=top_n).to_dict(orient='records')
+
+    # Computed for the catalog spelling, so every spelling that resolves to this row gets the same list
+    title = model.catalog['title'].iat[pos].lower()
+    return RESULT_CACHE.get_or_compute(
+        (int(pos), top_n, model.version),
+        lambda: hybrid_recommendation(title, model, top_n=top_n).to_dict(orient='records'),
+    )
+
+def cached_recommendations_batch(movie_names, model, top_n=20):
+    # cached_recommendations() for a list of titles; the misses are scored together in one batch
+    results = [None] * len(movie_names)
+    misses = {}  # catalog row -> indices into movie_names
+    for i, movie_name in enumerate(movie_names):
+        pos = model.title_resolver.position(movie_name)
+        if pos is None:
+            results[i] = []  # unknown title, as get_recommendations() after its error
+            continue
+        cached = RESULT_CACHE.get((int(pos), top_n, model.version))
+        if cached is not None:
+            results[i] = cached
+        else:
+            misses.setdefault(int(pos), []).append(i)
+
+    if misses:
+        rows = list(misses)
+        titles = [model.catalog['title'].iat[pos].lower() for pos in rows]
+        for pos, recs in zip(rows, hybrid_recommendation_batch(titles, model, top_n=top_n)):
+            RESULT_CACHE.put((pos, top_n, model.version), recs)
+            for i in misses[pos]:
+                results[i] = recs
+    return results
+
+def prewarm_result_cache(limit=PREWARM_TITLES, top_n=20, model=None):
+    model = model or get_model()
+    restored = RESULT_CACHE.restore(version=model.version)
+    catalog = model.catalog
+    for title in catalog.loc[catalog['popularity'].nlargest(limit).index, 'title']:
+        try:
+            cached_recommendations(title, model, top_n=top_n)
+        except Exception as e:
+            print(f"[WARNING] Could not prewarm recommendations for '{title}': {e}")
+    snapshot_result_cache()  # a failed write is only logged, so it never blocks a model swap
+    print(f"Result cache ready: {restored} entries restored, {len(RESULT_CACHE)} cached.")
+
 # --------------------- Local Movie Dataset ---------------------
-MOVIE_DATASET = {}
+MOVIE_DATASET = {}  # lowercased title -> movie; a MovieStore once load_movie_dataset() has run
+TITLE_INDEX = TitleSearchIndex([], [])  # rebuilt by load_movie_dataset()
 
 def load_movie_dataset():
-    global MOVIE_DATASET
+    global MOVIE_DATASET, TITLE_INDEX
     dataset_path = os.path.join(basedir, 'TMDB_IMDB_movies.csv')  # Ensure this file exists
     try:
-        with open(dataset_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                key = row['title'].strip().lower()
-                try:
-                    cast = json.loads(row['cast'])
-                except Exception:
-                    cast = [member.strip() for member in row['cast'].split(',')]
-
-                MOVIE_DATASET[key] = {
-                    "title": row['title'],
-                    "release_date": row.get('release_date', ''),
-                    "runtime": row.get('runtime', ''),
-                    "original_title": row.get('original_title', ''),
-                    "spoken_languages": row.get('spoken_languages', ''),
-                    "revenue": row.get('revenue', ''),
-                    "budget": row.get('budget', ''),
-                    "production_countries": row.get('production_countries', ''),
-                    "vote_count": row.get('vote_count', ''),
-                    "adult": row.get('adult', ''),
-                    "overview": row.get('overview', ''),
-                    "poster_path": row.get('poster_path', ''),
-                    "tagline": row.get('tagline', ''),
-                    "genres": row.get('genres', ''),
-                    "directors": row.get('directors', ''),
-                    "writers": row.get('writers', ''),
-                    "cast": cast,
-                    "popularity": row.get('popularity', 0),  # ✅ Add this line
-                    "vote_average": row.get('vote_average', 0)  
-                }
+        # Column arrays over the catalog cache (catalog_cache.py, rebuilt only when the CSV
+        # changes); lookups return MovieRecord views with the old dicts' .get()
+        MOVIE_DATASET = MovieStore.from_cache(movies_table(dataset_path))
         print("Movie dataset loaded successfully.")
     except Exception as e:
         print("Error loading movie dataset:", e)
 
+    # Trigram + prefix index over the title keys, used by /search, /movie_details and /autocomplete
+    TITLE_INDEX = TitleSearchIndex.from_dataset(MOVIE_DATASET)
+
 # --------------------- Utility Functions ---------------------
 def get_movie_details(movie_name):
+    # A fresh dict, so callers can add fields (the watchlist adds status and rating)
     key = movie_name.strip().lower()
-    return MOVIE_DATASET.get(key)
+    movie = MOVIE_DATASET.get(key)
+    return movie.to_dict() if movie is not None else None
+
+def find_movie(title):
+    # Catalog record for a title typed in a chat message: the exact title, else the most popular
+    # title containing it as whole words ("dark knight" -> "the dark knight")
+    key = ' '.join(title.lower().split())
+    movie = MOVIE_DATASET.get(key)
+    if movie is None and len(key) >= 4:
+        for match in TITLE_INDEX.search(key, limit=5):
+            if f' {key} ' in f' {match} ':
+                return MOVIE_DATASET[match]
+    return movie
 
 def get_recommendations(movie_name):
     try:
         movie_name = movie_name.strip().lower()
-        recommendations = hybrid_recommendation(
-            movie_name,
-            new_df,
-            tfidf_matrix,
-            indices,
-            model_knn,
-            movie_user_mat_sparse,
-            movie_to_idx,
-            top_n=20
-        )
+        recommendations = cached_recommendations(movie_name, get_model(), top_n=20)
 
         # Convert to list of dicts if it's a DataFrame
         if hasattr(recommendations, 'to_dict'):
@@ -135,7 +195,8 @@ def get_recommendations(movie_name):
 def get_mood_recommendations(mood):
     try:
         top_n = int(request.args.get('top_n', 25))
-        recommendations = recommend_by_mood(mood,top_n)  # ✅ simple call
+        model = get_model()
+        recommendations = recommend_by_mood(mood, model.mood_df, top_n, mood_index=model.mood_index)  # ✅ simple call
         if isinstance(recommendations, str):
             return []
 
@@ -167,31 +228,37 @@ def enrich_movie(row):
         "poster_path": extra.get("poster_path", ""),
     }
 
-def get_top_10_by_popularity():
-    top = new_df.sort_values(by='popularity', ascending=False).head(10)
-    return [enrich_movie(row) for _, row in top.iterrows()]
-
-def get_top_10_by_rating():
-    top = new_df.sort_values(by='vote_average', ascending=False).head(10)
-    return [enrich_movie(row) for _, row in top.iterrows()]
-
-def get_top_10_by_genre():
-    genre_top10 = {}
-    df = new_df.copy()
-    df['genres'] = df['genres'].apply(lambda x: x.split('|') if isinstance(x, str) else [])
-
-    # Only include the following genres:
-    selected_genres = [
-        "Action", "Drama", "Comedy", "Romance", "Crime", "Thriller", "Animation",
-        "Family", "Fantasy", "Horror", "Mystery", "Documentary"
-    ]
-
-    for genre in selected_genres:
-        filtered = df[df['genres'].apply(lambda x: genre in x)]
-        top10 = filtered.sort_values(by='vote_average', ascending=False).head(10)
-        genre_top10[genre] = [enrich_movie(row) for _, row in top10.iterrows()]
-
-    return genre_top10
+# Genres shown by /explore when no ?genres= is given
+EXPLORE_GENRES = [
+    "Action", "Drama", "Comedy", "Romance", "Crime", "Thriller", "Animation",
+    "Family", "Fantasy", "Horror", "Mystery", "Documentary"
+]
+EXPLORE_PAYLOAD = {}  # model version -> enriched explore sections, every genre included
+
+def get_explore_payload(model=None):
+    # Built once per model version from the genre index (see explore_index.py), then served as is
+    model = model or get_model()
+    payload = EXPLORE_PAYLOAD.get(model.version)
+    if payload is None:
+        index = ExploreIndex(model.catalog, model.person_index)
+        titles = model.catalog['title'].to_numpy()
+
+        def enrich(positions):
+            return [enrich_movie({"title": title}) for title in titles[positions]]
+
+        payload = {
+            "popular": enrich(index.popular),
+            "top_rated": enrich(index.top_rated),
+            "genres": {name: enrich(positions) for name, positions in index.by_genre.values()},
+        }
+        EXPLORE_PAYLOAD[model.version] = payload
+        while len(EXPLORE_PAYLOAD) > 2:  # the served model's and the one being swapped in
+            EXPLORE_PAYLOAD.pop(next(iter(EXPLORE_PAYLOAD)))
+    return payload
+
+# A reloaded model gets its explore payload and popular results before it serves anything
+model_store.add_warmup_hook(get_explore_payload)
+model_store.add_warmup_hook(lambda model: prewarm_result_cache(model=model))
 
 def username_exists(username):
     return User.query.filter_by(username=username).first() is not None
@@ -205,6 +272,14 @@ def create_new_user(username, password):
 def get_user_by_username(username):
     return User.query.filter_by(username=username).first()
 
+def get_limit_arg(default=None):
+    # Optional ?limit= cap on result lists; invalid or non-positive values mean no cap
+    try:
+        limit = int(request.args.get('limit', default))
+    except (TypeError, ValueError):
+        return default
+    return limit if limit > 0 else default
+
 
 # --------------------- API Endpoints ---------------------
 
@@ -217,23 +292,24 @@ def search():
     query = query.strip().lower()
     results = []
 
-    for key, details in MOVIE_DATASET.items():
-        if query in key:
-            # 🔽 Parse genres safely
-            genres = details.get('genres', [])
-            if isinstance(genres, str):
-                genres = [genre.strip() for genre in genres.split(',') if genre.strip()]
-
-            results.append({
-                "title": details.get('title', ''),
-                "overview": details.get('overview', ''),
-                "genres": genres,
-                "writers": details.get('writers', ''),
-                "directors": details.get('directors', ''),
-                "cast": details.get('cast', []),
-                "poster_path": details.get('poster_path', 'NA'),
-                "popularity": details.get('popularity', 0.0)  # ✅ Add this for frontend sorting
-            })
+    # Matching titles come back most popular first
+    for key in TITLE_INDEX.search(query, limit=get_limit_arg()):
+        details = MOVIE_DATASET[key]
+        # 🔽 Parse genres safely
+        genres = details.get('genres', [])
+        if isinstance(genres, str):
+            genres = [genre.strip() for genre in genres.split(',') if genre.strip()]
+
+        results.append({
+            "title": details.get('title', ''),
+            "overview": details.get('overview', ''),
+            "genres": genres,
+            "writers": details.get('writers', ''),
+            "directors": details.get('directors', ''),
+            "cast": details.get('cast', []),
+            "poster_path": details.get('poster_path', 'NA'),
+            "popularity": details.get('popularity', 0.0)  # ✅ Add this for frontend sorting
+        })
 
     if not results:
         return jsonify({"message": "No movies found for your search."}), 404
@@ -241,6 +317,21 @@ def search():
     return jsonify({"results": results})
 
 
+@app.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    # Typeahead for the search bar: titles starting with q (or with a word starting with q)
+    query = request.args.get('q', '')
+    suggestions = []
+    for key, popularity in TITLE_INDEX.complete_keys(query, limit=get_limit_arg(8)):
+        details = MOVIE_DATASET[key]
+        suggestions.append({
+            "title": details.get('title', ''),
+            "poster_path": details.get('poster_path', ''),
+            "popularity": popularity
+        })
+    return jsonify({"query": query, "suggestions": suggestions})
+
+
 @app.route('/recommendations', methods=['GET'])
 def recommendations():
     movie_name = request.args.get('movie')
@@ -251,15 +342,64 @@ def recommendations():
     recs = get_recommendations(movie_name)
     return jsonify({"movie": movie_name, "recommendations": recs})
 
+@app.route('/recommendations/batch', methods=['POST'])
+def recommendations_batch():
+    # Body: {"titles": [...]} or {"ids": [...]} (TMDB ids), optional "top_n" (default 20)
+    data = request.get_json(silent=True) or {}
+    model = get_model()
+    if data.get('ids') is not None:
+        queries = data['ids']
+        if not isinstance(queries, list):
+            return jsonify({"error": "Expected a JSON body with a 'titles' or 'ids' list"}), 400
+        id_to_title = model.id_to_title
+        movie_names = [id_to_title.get(str(movie_id), '').strip().lower() for movie_id in queries]
+    else:
+        queries = data.get('titles')
+        if not isinstance(queries, list):
+            return jsonify({"error": "Expected a JSON body with a 'titles' or 'ids' list"}), 400
+        movie_names = [str(title).strip().lower() for title in queries]
+
+    if len(queries) > MAX_BATCH_TITLES:
+        return jsonify({"error": f"At most {MAX_BATCH_TITLES} titles per batch"}), 400
+    try:
+        top_n = int(data.get('top_n', 20))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_n must be an integer"}), 400
+    if top_n <= 0:
+        return jsonify({"error": "top_n must be positive"}), 400
+
+    try:
+        batch = cached_recommendations_batch(movie_names, model, top_n=top_n)
+    except Exception as e:
+        print("Error in recommendations_batch:", e)
+        return jsonify({"error": "Could not compute recommendations"}), 500
+
+    results = []
+    for query, movie_name, recs in zip(queries, movie_names, batch):
+        results.append({
+            "query": query,
+            "movie": movie_name,
+            "recommendations": [enrich_movie(rec) for rec in recs]
+        })
+    return jsonify({"results": results})
+
 @app.route('/mood', methods=['GET'])
 def mood():
     mood = request.args.get('mood')
     if not mood:
         return jsonify({"error": "Missing mood parameter"}), 400
     
+    # Optional paging and order: ?page=2&top_n=25&sort=popularity|rating|recency
+    sort = request.args.get('sort', 'popularity')
+    if sort not in MOOD_SORT_KEYS:
+        return jsonify({"error": f"sort must be one of {', '.join(MOOD_SORT_KEYS)}"}), 400
+
     try:
         top_n = int(request.args.get('top_n', 25))
-        results = recommend_by_mood(mood,top_n)
+        page = max(int(request.args.get('page', 1)), 1)
+        model = get_model()
+        results = recommend_by_mood(mood, model.mood_df, top_n, mood_index=model.mood_index,
+                                    sort=sort, offset=(page - 1) * top_n)
         if isinstance(results, str):
             return jsonify({"message": results}), 404
         
@@ -275,17 +415,99 @@ def mood():
                 "genre": extra.get('genres', ''),
                 "poster_path": extra.get('poster_path', ''),
             })
-        return jsonify({"mood": mood, "recommendations": recs})
+        total = model.mood_index.count(mood) if model.mood_index is not None else len(recs)
+        return jsonify({"mood": mood, "sort": sort, "page": page, "total": total, "recommendations": recs})
     except Exception as e:
         print("Error in mood recommendation:", e)
         return jsonify({"error": "Internal server error"}), 500
     
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    # Hit / miss / eviction counters of the recommendation result cache, for sizing it
+    return jsonify(RESULT_CACHE.stats())
+
+# --------------------- Admin ---------------------
+# Disabled unless ADMIN_TOKEN is set; requests pass it in the X-Admin-Token header
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+INGEST_LOCK = threading.Lock()
+
+def is_admin_request():
+    return bool(ADMIN_TOKEN) and request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+
+@app.route('/admin/ingest', methods=['POST'])
+def admin_ingest():
+    # Appends new movies to the served model without a full rebuild (see ingest.py):
+    # {"movies": [{"title": ..., "genres": ..., "popularity": ..., ...}]}, fields as in the TMDB CSV
+    global MOVIE_DATASET, TITLE_INDEX
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    data = request.get_json(silent=True) or {}
+    movies = data.get('movies')
+    if not isinstance(movies, list) or not movies or not all(isinstance(m, dict) for m in movies):
+        return jsonify({"error": "Expected a non-empty 'movies' list"}), 400
+
+    from ingest import ingest_and_publish  # the feature pipeline is only imported when used
+    try:
+        # Holds the reload lock, so a background reload cannot swap a pre-ingest model back in
+        with INGEST_LOCK, model_store.exclusive_update() as acquired:
+            if not acquired:
+                return jsonify({"error": "A model reload is in progress"}), 409
+            model, report = ingest_and_publish(movies, get_model())
+            if model is not None:
+                model_store.publish(model, source='ingest')
+                if isinstance(MOVIE_DATASET, MovieStore):
+                    # New column arrays with the movies appended (a copy of each column, in C);
+                    # the title index only splits the new titles (TitleSearchIndex.extended)
+                    previous = MOVIE_DATASET
+                    MOVIE_DATASET = MOVIE_DATASET.extended(report['movies'])
+                    added = dict.fromkeys(str(movie.get('title') or '').strip().lower() for movie in report['movies'])
+                    new_keys = [key for key in added if key not in previous]
+                    TITLE_INDEX = TITLE_INDEX.extended_from_dataset(MOVIE_DATASET, new_keys)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        print("Error in admin ingest:", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+    report.pop('movies', None)
+    return jsonify(report)
+
+@app.route('/admin/model', methods=['GET'])
+def admin_model():
+    # Active bundle version, its load time and memory, and the last background reload
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    get_model()
+    return jsonify(model_store.status())
+
+@app.route('/admin/model/reload', methods=['POST'])
+def admin_model_reload():
+    # {"version": "<bundle version>"} loads that version (default: CURRENT); {"build": true} first
+    # runs build_bundle.py. Loads in the background and swaps once ready; poll GET /admin/model
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    data = request.get_json(silent=True) or {}
+    if not model_store.reload_async(version=data.get('version'), build=bool(data.get('build'))):
+        return jsonify({"error": "A reload is already running", **model_store.status()}), 409
+    return jsonify(model_store.status()), 202
+
 @app.route("/explore")
 def explore():
+    # Optional ?genres=Action,Science Fiction picks the genre sections (any catalog genre, case-insensitive)
+    payload = get_explore_payload()
+    genres = request.args.get('genres')
+    selected = [g.strip() for g in genres.split(',') if g.strip()] if genres else EXPLORE_GENRES
+
+    by_lower = {name.lower(): name for name in payload["genres"]}
+    genre_sections = {}
+    for genre in selected:
+        name = by_lower.get(genre.lower())
+        genre_sections[name or genre] = payload["genres"][name] if name else []
+
     return jsonify({
-        "popular": get_top_10_by_popularity(),   # ✅ no argument
-        "top_rated": get_top_10_by_rating(),     # ✅
-        "genres": get_top_10_by_genre()          # ✅
+        "popular": payload["popular"],
+        "top_rated": payload["top_rated"],
+        "genres": genre_sections
     })
 
 @app.route('/movie_details', methods=['GET'])
@@ -297,29 +519,29 @@ def movie_details():
     query = query.strip().lower()
     results = []
 
-    for key, details in MOVIE_DATASET.items():
-        if query in key:
-            results.append({
-                "title": details.get('title', ''),
-                "overview": details.get('overview', ''),
-                "genres": details.get('genres', ''),
-                "writers": details.get('writers', ''),
-                "directors": details.get('directors', ''),
-                "cast": details.get('cast', []),
-                "poster_path": details.get('poster_path', 'NA'),  # default placeholder
-                # ADD THESE FIELDS:
-                "release_date": details.get('release_date', 'N/A'),
-                "runtime": details.get('runtime', 'N/A'),
-                "original_title": details.get('original_title', 'N/A'),
-                "adult": details.get('adult', False),
-                "spoken_languages": details.get('spoken_languages', 'N/A'),
-                "production_countries": details.get('production_countries', 'N/A'),
-                "budget": details.get('budget', 'N/A'),
-                "revenue": details.get('revenue', 'N/A'),
-                "vote_count": details.get('vote_count', 'N/A'),
-                "vote_average": details.get('vote_average', 'N/A'),
-                "production_companies": details.get('production_companies', 'N/A')
-            })
+    for key in TITLE_INDEX.search(query, limit=get_limit_arg()):
+        details = MOVIE_DATASET[key]
+        results.append({
+            "title": details.get('title', ''),
+            "overview": details.get('overview', ''),
+            "genres": details.get('genres', ''),
+            "writers": details.get('writers', ''),
+            "directors": details.get('directors', ''),
+            "cast": details.get('cast', []),
+            "poster_path": details.get('poster_path', 'NA'),  # default placeholder
+            # ADD THESE FIELDS:
+            "release_date": details.get('release_date', 'N/A'),
+            "runtime": details.get('runtime', 'N/A'),
+            "original_title": details.get('original_title', 'N/A'),
+            "adult": details.get('adult', False),
+            "spoken_languages": details.get('spoken_languages', 'N/A'),
+            "production_countries": details.get('production_countries', 'N/A'),
+            "budget": details.get('budget', 'N/A'),
+            "revenue": details.get('revenue', 'N/A'),
+            "vote_count": details.get('vote_count', 'N/A'),
+            "vote_average": details.get('vote_average', 'N/A'),
+            "production_companies": details.get('production_companies', 'N/A')
+        })
 
     if not results:
         return jsonify({"message": "No movies found for your search."}), 404
@@ -487,19 +709,14 @@ def recommend_from_watchlist():
     entries = Watchlist.query.filter_by(user_id=user.id).all()
     movie_titles = [e.movie_title for e in entries]
 
-    all_recs = []
-    for title in movie_titles:
-        recs = get_recommendations(title)
-        all_recs.extend(recs)
-
-    seen = set()
-    unique_recs = []
-    for rec in all_recs:
-        if rec['title'] not in seen:
-            seen.add(rec['title'])
-            unique_recs.append(rec)
+    # The whole watchlist is scored in one pass (see watchlist_recommender.multi_seed_recommend)
+    try:
+        recs = multi_seed_recommend(movie_titles, get_model(), top_n=20)
+    except Exception as e:
+        print("Error in recommend_from_watchlist:", e)
+        return jsonify({'recommendations': []})
 
-    return jsonify({'recommendations': unique_recs[:20]})
+    return jsonify({'recommendations': [enrich_movie(rec) for rec in recs.to_dict(orient='records')]})
 
 @app.route('/user/stats', methods=['GET'])
 def user_stats():
@@ -570,10 +787,18 @@ responses = {
     "default": "Sorry, I didn't quite get that. Could you rephrase?"
 }
 
+# /chat answers these and catalog questions ("who directed X") itself, see chat_router.py
+chat_router.set_intents(responses)
+chat_router.set_catalog(find_movie)
+
 
 # --------------------- App Initialization ---------------------
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
         load_movie_dataset()
+    if os.getenv('WARMUP_ON_START', '1') == '1':
+        warmup()
+        prewarm_result_cache()
+        get_explore_payload()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,49 @@
+import argparse
+import os
+
+# ----------------- Offline Model Build --------------------------
+# Runs the full training pipeline (mrs.py) once and writes the result as a new
+# versioned model bundle. The API server only ever loads bundles.
+#
+#   cd backend
+#   python build_bundle.py                # writes model_bundle/<version>, updates CURRENT
+#   python build_bundle.py --k 100 --out /srv/bundles --no-activate
+#   python build_bundle.py --if-requested # only when ingest.py asked for a refit (e.g. from cron)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the recommender and write a versioned model bundle.')
+    parser.add_argument('--out', default=None, help='bundle root directory (default: MODEL_BUNDLE_DIR or backend/model_bundle)')
+    parser.add_argument('--k', type=int, default=None, help='neighbors kept per movie in the TF-IDF table')
+    parser.add_argument('--no-activate', action='store_true', help='write the bundle without pointing CURRENT at it')
+    parser.add_argument('--if-requested', action='store_true', help='build only if ingest.py requested a refit')
+    args = parser.parse_args()
+
+    from model_bundle import DEFAULT_BUNDLE_ROOT
+    from ingest import REFIT_FILE, refit_requested
+
+    root = args.out or DEFAULT_BUNDLE_ROOT
+    request = refit_requested(root)
+    if args.if_requested and request is None:
+        print("No refit requested.")
+        return
+    if request is not None:
+        print(f"Refit requested at {request['requested_at']}: {request['reason']}")
+
+    # mrs.py reads its build parameters from the environment at import time
+    if args.k is not None:
+        os.environ['TFIDF_NEIGHBOR_K'] = str(args.k)
+
+    import mrs
+    from model_bundle import write_bundle
+
+    os.makedirs(root, exist_ok=True)
+    version = write_bundle(mrs.model, root, params=mrs.BUILD_PARAMS, make_current=not args.no_activate)
+    print(f"Model bundle {version} written to {os.path.join(root, version)}")
+    if request is not None and refit_requested(root) == request:
+        # Movies ingested during the build are not in it; their newer request stays
+        os.remove(os.path.join(root, REFIT_FILE))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+# ----------------- Columnar Catalog Cache -----------------------
+# TMDB_IMDB_movies.csv is parsed once per data release and stored as one file per column:
+#
+#   catalog_cache/
+#     movies/                  the CSV as pd.read_csv() types it, plus derived columns
+#       manifest.json          source size / mtime, row count, column kinds
+#       <col>.npy              numeric and bool columns
+#       <col>.blob, <col>.offsets.npy, [<col>.null.npy]
+#                              text columns: UTF-8 bytes of all values and n+1 byte offsets
+#       <col>.raw.blob, <col>.raw.offsets.npy
+#                              exact CSV text (what csv.DictReader gave) of the columns pandas
+#                              changed: numbers, and text with 'NA'-like values read as missing
+#       <col>.items.blob, <col>.items.offsets.npy, <col>.rows.npy
+#                              list columns: all items, and n+1 item offsets per row
+#     processed/               new_df of mrs.py, including tags (written by the offline build)
+#
+# Derived columns of the movies table:
+#   cast_list   the cast as a list, JSON-decoded when it is a JSON list, else split on commas
+#
+# The cache is rebuilt when the CSV's size or modification time changes. Text columns are
+# decoded with one bytes.decode() when the blob is ASCII and per value otherwise.
+#
+#   python catalog_cache.py                  # (re)build the cache for TMDB_IMDB_movies.csv
+
+CACHE_FORMAT = 1
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.join(BASE_DIR, 'TMDB_IMDB_movies.csv')
+DEFAULT_CACHE_DIR = os.getenv('CATALOG_CACHE_DIR', os.path.join(BASE_DIR, 'catalog_cache'))
+MANIFEST_FILE = 'manifest.json'
+
+
+def parse_cast(value):
+    # load_movie_dataset()'s rule: a JSON list of names, otherwise comma-separated names
+    try:
+        cast = json.loads(value)
+        if isinstance(cast, list):
+            return [str(member) for member in cast]
+    except Exception:
+        pass
+    return [member.strip() for member in str(value).split(',')]
+
+
+# --- column encoding ---
+
+def _write_strings(out_dir, name, values):
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in encoded], out=offsets[1:])
+    with open(os.path.join(out_dir, f'{name}.blob'), 'wb') as f:
+        f.write(b''.join(encoded))
+    np.save(os.path.join(out_dir, f'{name}.offsets.npy'), offsets)
+
+
+def _read_strings(table_dir, name):
+    with open(os.path.join(table_dir, f'{name}.blob'), 'rb') as f:
+        blob = f.read()
+    offsets = np.load(os.path.join(table_dir, f'{name}.offsets.npy')).tolist()
+    if blob.isascii():
+        # One character per byte: slice the decoded text directly
+        text = blob.decode('ascii')
+        return [text[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+    return [blob[a:b].decode('utf-8') for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def write_table(df, out_dir, raw=None, lists=None):
+    # df: the table; raw: column -> exact text values; lists: column -> list of lists per row
+    tmp_dir = f'{out_dir}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    columns = []
+    for name in df.columns:
+        values = df[name]
+        if pd.api.types.is_numeric_dtype(values.dtype):  # includes bool
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), values.to_numpy())
+            kind = 'numeric'
+        else:
+            null = values.isna().to_numpy()
+            _write_strings(tmp_dir, name, ['' if n else str(v) for v, n in zip(values.tolist(), null)])
+            if null.any():
+                np.save(os.path.join(tmp_dir, f'{name}.null.npy'), null)
+            kind = 'text'
+        columns.append({'name': str(name), 'kind': kind, 'raw': name in (raw or {})})
+    for name, values in (raw or {}).items():
+        _write_strings(tmp_dir, f'{name}.raw', values)
+    for name, rows in (lists or {}).items():
+        _write_strings(tmp_dir, f'{name}.items', [item for row in rows for item in row])
+        np.save(os.path.join(tmp_dir, f'{name}.rows.npy'), np.cumsum([0] + [len(row) for row in rows], dtype=np.int64))
+        columns.append({'name': name, 'kind': 'list', 'raw': False})
+
+    manifest = {'format': CACHE_FORMAT, 'rows': len(df), 'columns': columns,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+
+
+def read_manifest(table_dir):
+    path = os.path.join(table_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest if manifest.get('format') == CACHE_FORMAT else None
+
+
+def read_columns(table_dir, columns=None, raw=False, missing=None):
+    # {column: values}. Text columns are lists of str (`missing` where pandas saw no value),
+    # numeric columns NumPy arrays. raw=True with missing='' gives the CSV text of every column.
+    manifest = read_manifest(table_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No catalog cache table in '{table_dir}'")
+    kinds = {c['name']: c for c in manifest['columns']}
+    out = {}
+    for name in (columns if columns is not None else list(kinds)):
+        column = kinds[name]
+        if column['kind'] == 'list':
+            items = _read_strings(table_dir, f'{name}.items')
+            rows = np.load(os.path.join(table_dir, f'{name}.rows.npy')).tolist()
+            out[name] = [items[a:b] for a, b in zip(rows[:-1], rows[1:])]
+        elif raw and column['raw']:
+            out[name] = _read_strings(table_dir, f'{name}.raw')
+        elif column['kind'] == 'numeric':
+            out[name] = np.load(os.path.join(table_dir, f'{name}.npy'))
+        else:
+            values = _read_strings(table_dir, name)
+            null_path = os.path.join(table_dir, f'{name}.null.npy')
+            if os.path.exists(null_path):
+                for i in np.flatnonzero(np.load(null_path)):
+                    values[i] = missing
+            out[name] = values
+    return out
+
+
+def read_text_storage(table_dir, name, raw=False):
+    # (UTF-8 blob, n+1 offsets) of a text column without decoding it, '' where empty.
+    # raw=True gives the CSV text when the column has a raw variant
+    column = {c['name']: c for c in read_manifest(table_dir)['columns']}[name]
+    if column['kind'] != 'text' and not (raw and column['raw']):
+        raise ValueError(f"Column '{name}' is not stored as text")
+    return _read_blob(table_dir, f'{name}.raw' if raw and column['raw'] else name)
+
+
+def read_list_storage(table_dir, name):
+    # (UTF-8 blob and offsets of all items, n+1 item offsets per row) of a list column
+    blob, offsets = _read_blob(table_dir, f'{name}.items')
+    return blob, offsets, np.load(os.path.join(table_dir, f'{name}.rows.npy'))
+
+
+def _read_blob(table_dir, stem):
+    with open(os.path.join(table_dir, f'{stem}.blob'), 'rb') as f:
+        blob = f.read()
+    return blob, np.load(os.path.join(table_dir, f'{stem}.offsets.npy'))
+
+
+def read_table(table_dir, columns=None):
+    # The table as a DataFrame, typed as pd.read_csv() typed the CSV (missing text is NaN)
+    return pd.DataFrame(read_columns(table_dir, columns, missing=np.nan))
+
+
+# --- movies table ---
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def build_movies_cache(csv_path=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR):
+    start = time.perf_counter()
+    typed = pd.read_csv(csv_path)
+    text = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    # Exact text wherever pandas changed it: numbers, and markers such as 'NA' read as missing
+    raw = {}
+    for name in typed.columns:
+        parsed = typed[name]
+        if pd.api.types.is_numeric_dtype(parsed.dtype) or (text[name][parsed.isna()] != '').any():
+            raw[name] = text[name].tolist()
+    lists = {'cast_list': [parse_cast(value) for value in text['cast'].tolist()]} if 'cast' in text else {}
+
+    table_dir = os.path.join(cache_dir, 'movies')
+    os.makedirs(cache_dir, exist_ok=True)
+    write_table(typed, table_dir, raw=raw, lists=lists)
+    with open(os.path.join(table_dir, 'source.json'), 'w') as f:
+        json.dump(_source_signature(csv_path), f)
+    print(f"Catalog cache built from {os.path.basename(csv_path)}: {len(typed)} rows in {time.perf_counter() - start:.2f}s.")
+    return table_dir
+
+
+def movies_table(csv_path=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR):
+    # Directory of an up-to-date movies table, converting the CSV first if needed
+    table_dir = os.path.join(cache_dir, 'movies')
+    source_path = os.path.join(table_dir, 'source.json')
+    if read_manifest(table_dir) is not None and os.path.exists(source_path):
+        with open(source_path) as f:
+            if json.load(f) == _source_signature(csv_path):
+                return table_dir
+    return build_movies_cache(csv_path, cache_dir)
+
+
+def load_movies(csv_path=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR, columns=None):
+    # Same DataFrame as pd.read_csv(csv_path), from the cache
+    return read_table(movies_table(csv_path, cache_dir), columns)
+
+
+# --- processed table ---
+
+def save_processed(df, cache_dir=DEFAULT_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    write_table(df.reset_index(drop=True), os.path.join(cache_dir, 'processed'))
+
+
+def load_processed(cache_dir=DEFAULT_CACHE_DIR, columns=None):
+    return read_table(os.path.join(cache_dir, 'processed'), columns)
+
+
+if __name__ == '__main__':
+    build_movies_cache()
@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+
+# ----------------- Compact Collaborative-Filtering Matrix --------
+# MovieLens movieId / userId values are sparse (up to ~200k with most unused), so a
+# csr_matrix indexed by them directly has max(movieId) rows, nearly all empty, and the
+# brute-force kNN scores every one of them. Here every movie and user that actually has a
+# rating gets a dense row / column number instead:
+#
+#   cf_matrix        float32 CSR, n_movies x n_users
+#   movies.ids[row]  -> MovieLens movieId       movies.rows[movieId] -> row (or -1)
+#   users.ids[col]   -> MovieLens userId        users.rows[userId]   -> col (or -1)
+
+
+class IdMap:
+    # Bidirectional map between external integer ids and contiguous positions 0..n-1
+
+    def __init__(self, ids):
+        self.ids = np.asarray(ids, dtype=np.int32)  # sorted, unique
+        size = int(self.ids.max()) + 1 if len(self.ids) else 0
+        self.rows = np.full(size, -1, dtype=np.int32)
+        self.rows[self.ids] = np.arange(len(self.ids), dtype=np.int32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_values(cls, values):
+        return cls(np.unique(np.asarray(values)))
+
+    def to_rows(self, ids):
+        # Positions for an array of ids; unknown ids map to -1
+        ids = np.asarray(ids, dtype=np.int64)
+        known = (ids >= 0) & (ids < len(self.rows))
+        out = np.full(ids.shape, -1, dtype=np.int32)
+        out[known] = self.rows[ids[known]]
+        return out
+
+    def to_ids(self, rows):
+        return self.ids[np.asarray(rows)]
+
+
+def build_cf_matrix(movie_ids, user_ids, ratings):
+    # (cf_matrix, movie IdMap, user IdMap). Repeated (movie, user) pairs are summed, as
+    # csr_matrix((rating, (movieId, userId))) did.
+    movie_ids = np.asarray(movie_ids)
+    user_ids = np.asarray(user_ids)
+    movies = IdMap.from_values(movie_ids)
+    users = IdMap.from_values(user_ids)
+    matrix = coo_matrix(
+        (np.asarray(ratings, dtype=np.float32), (movies.to_rows(movie_ids), users.to_rows(user_ids))),
+        shape=(len(movies), len(users)),
+    ).tocsr()
+    matrix.sum_duplicates()
+    return matrix, movies, users
+
+
+# ----------------- Streaming Ratings Ingestion --------------------
+# MovieLens ratings.csv read in chunks with compact dtypes and only the three needed
+# columns, instead of one int64/float64 DataFrame of the whole file:
+#
+#   pass 1   ratings per user (bincount per chunk)
+#   pass 2   ratings of active users only, kept as int32 / int32 / float32 arrays
+#   then     movie activity filter on those arrays, optional sample, build_cf_matrix()
+#
+# The filters and the sample give the same rows as the DataFrame version did (value_counts
+# filters, then df.sample(frac, random_state)).
+
+RATINGS_DTYPES = {'userId': np.int32, 'movieId': np.int32, 'rating': np.float32}
+RATINGS_CHUNK_ROWS = int(os.getenv('RATINGS_CHUNK_ROWS', 5_000_000))
+
+
+def _rating_chunks(path, chunk_rows):
+    return pd.read_csv(path, usecols=list(RATINGS_DTYPES), dtype=RATINGS_DTYPES, chunksize=chunk_rows)
+
+
+def _add_counts(counts, ids):
+    chunk = np.bincount(ids, minlength=len(counts))
+    chunk[:len(counts)] += counts
+    return chunk
+
+
+def stream_ratings_matrix(path, min_user_ratings=1, min_movie_ratings=1, sample_frac=None, seed=42,
+                          movie_ids=None, chunk_rows=RATINGS_CHUNK_ROWS):
+    # (cf_matrix, movie IdMap, user IdMap) from a ratings CSV. movie_ids: keep only these movies
+    # (applied after the filters and the sample, as the merge with movies.csv was)
+    user_counts = np.zeros(0, dtype=np.int64)
+    for chunk in _rating_chunks(path, chunk_rows):
+        user_counts = _add_counts(user_counts, chunk['userId'].to_numpy())
+    active_users = user_counts >= min_user_ratings
+
+    users, movies, ratings = [], [], []
+    for chunk in _rating_chunks(path, chunk_rows):
+        user = chunk['userId'].to_numpy()
+        keep = active_users[user]
+        users.append(user[keep])
+        movies.append(chunk['movieId'].to_numpy()[keep])
+        ratings.append(chunk['rating'].to_numpy()[keep])
+    users = np.concatenate(users) if users else np.empty(0, dtype=np.int32)
+    movies = np.concatenate(movies) if movies else np.empty(0, dtype=np.int32)
+    ratings = np.concatenate(ratings) if ratings else np.empty(0, dtype=np.float32)
+
+    # Movie activity is counted among the active users' ratings only
+    keep = np.bincount(movies)[movies] >= min_movie_ratings if len(movies) else np.zeros(0, dtype=bool)
+    users, movies, ratings = users[keep], movies[keep], ratings[keep]
+
+    if sample_frac is not None:
+        # The draw DataFrame.sample(frac=sample_frac, random_state=seed) makes
+        pick = np.random.RandomState(seed).choice(len(users), size=round(sample_frac * len(users)), replace=False)
+        users, movies, ratings = users[pick], movies[pick], ratings[pick]
+
+    if movie_ids is not None:
+        keep = np.isin(movies, np.asarray(movie_ids))
+        users, movies, ratings = users[keep], movies[keep], ratings[keep]
+
+    # Exact duplicate (user, movie, rating) rows count once, as after drop_duplicates()
+    order = np.lexsort((ratings, movies, users))
+    users, movies, ratings = users[order], movies[order], ratings[order]
+    first = np.ones(len(users), dtype=bool)
+    first[1:] = (users[1:] != users[:-1]) | (movies[1:] != movies[:-1]) | (ratings[1:] != ratings[:-1])
+    return build_cf_matrix(movies[first], users[first], ratings[first])
@@ -0,0 +1,237 @@
+import os
+import re
+import threading
+
+from result_cache import ResultCache
+
+# ----------------- Chat Router ----------------------------------
+# Answers what it can before /chat goes to the LLM:
+#
+#   1. canned intents    the normalized message is a key of the intent table (Appt's `responses`)
+#   2. catalog questions "who directed X", "when was X released", "who starred in X", ... are
+#                        matched by pattern, X is looked up in the movie dataset and the reply
+#                        is built from its fields
+#   3. reply cache       LLM replies by normalized message (LRU with a TTL), so a repeated
+#                        question is not paid for twice
+#
+# Anything else, including a catalog question about a title that is not in the catalog or
+# a field the catalog has no value for, goes to the LLM. So do follow-ups that refer to an
+# earlier message ("what is it about", "how long is that one"): pronouns are never titles.
+# The loose forms ("how long is X", "how good is X", "who is in X") read just as well as
+# ordinary sentences ("who is in love"), so they are only answered when X is marked as a
+# title: quoted, or introduced by "the movie" / "the film".
+#
+# python chat_router.py runs the routing checks against a small stub catalog.
+
+CHAT_CACHE_SIZE = int(os.getenv('CHAT_CACHE_SIZE', 1024))
+CHAT_CACHE_TTL = float(os.getenv('CHAT_CACHE_TTL', 24 * 3600))
+MAX_CAST = 5
+
+_CONTRACTIONS = {"what's": 'what is', "who's": 'who is', "how's": 'how is', "when's": 'when is'}
+_QUOTES = '"\'`‘’“”'
+
+# Words that refer back to the conversation rather than name a movie
+VAGUE_TITLES = {'it', 'this', 'that', 'these', 'those', 'them', 'they', 'he', 'she', 'him', 'her',
+                'you', 'me', 'us', 'one', 'this one', 'that one', 'the movie', 'the film', 'this movie',
+                'that movie', 'this film', 'that film', 'the first one', 'the last one', 'the other one'}
+
+# (field, pattern, loose); the pattern must match the whole normalized message.
+# Loose patterns only answer for a marked title (see above)
+CATALOG_QUESTIONS = [
+    ('directors', r"(?:who (?:directed|was the director of|is the director of|made)|(?:the )?directors? of) (?P<title>.+)", False),
+    ('writers', r"(?:who (?:wrote|was the writer of|is the writer of)|(?:the )?writers? of) (?P<title>.+)", False),
+    ('cast', r"(?:who (?:starred|stars|acted|acts) in|who (?:is|was) in the cast of|(?:the )?(?:cast|actors|stars) (?:of|in)) (?P<title>.+)", False),
+    ('cast', r"who (?:is|was) in (?P<title>.+)", True),
+    ('release_date', r"(?:when|what year) (?:was|did) (?P<title>.+?) (?:released|come out|release)", False),
+    ('release_date', r"(?:the )?release (?:date|year) of (?P<title>.+)", False),
+    ('genres', r"what (?:genre|kind of (?:movie|film)) is (?P<title>.+)", False),
+    ('genres', r"(?:the )?genres? of (?P<title>.+)", False),
+    ('runtime', r"(?:the )?(?:runtime|length) of (?P<title>.+)", False),
+    ('runtime', r"how long is (?P<title>.+)", True),
+    ('vote_average', r"(?:what is the rating of|(?:the )?rating of) (?P<title>.+)", False),
+    ('vote_average', r"how is (?P<title>.+) rated", False),
+    ('vote_average', r"how good is (?P<title>.+)", True),
+    ('overview', r"what is (?P<title>.+) about", False),
+    ('overview', r"(?:the )?(?:plot|story|synopsis) of (?P<title>.+)", False),
+]
+CATALOG_QUESTIONS = [(field, re.compile(pattern), loose) for field, pattern, loose in CATALOG_QUESTIONS]
+
+
+def normalize_prompt(text):
+    # Lowercase, single spaces, no trailing punctuation, common contractions spelled out
+    text = ' '.join(str(text).lower().replace('’', "'").split())
+    for short, full in _CONTRACTIONS.items():
+        text = text.replace(short, full)
+    text = text.rstrip(' ?!.')
+    if len(text) > 1 and text[0] in _QUOTES and text[-1] in _QUOTES:
+        text = text[1:-1].rstrip(' ?!.').strip()  # the whole message quoted
+    return text
+
+
+def _clean_title(title):
+    # (title, marked): marked when it was quoted or introduced by "the movie" / "the film"
+    title = title.strip()
+    marked = False
+    for prefix in ('the movie ', 'the film ', 'movie ', 'film '):
+        if title.startswith(prefix):
+            title, marked = title[len(prefix):].strip(), True
+            break
+    if len(title) > 2 and title[0] in _QUOTES and title[-1] in _QUOTES:
+        marked = True
+    return title.strip(_QUOTES + ' '), marked
+
+
+def _has_value(value):
+    return value is not None and value != '' and value != 'NA' and value != []
+
+
+def _join(names):
+    names = list(names)
+    return names[0] if len(names) == 1 else ', '.join(names[:-1]) + ' and ' + names[-1]
+
+
+def _split(value):
+    return [v.strip() for v in value.split(',') if v.strip()] if isinstance(value, str) else list(value)
+
+
+def format_answer(field, movie):
+    # Reply for `field` of `movie`, or None when the catalog has no value for it
+    value = movie.get(field)
+    if not _has_value(value):
+        return None
+    title = f"'{movie.get('title')}'"
+    if field == 'directors':
+        return f"{title} was directed by {_join(_split(value))}."
+    if field == 'writers':
+        return f"{title} was written by {_join(_split(value))}."
+    if field == 'cast':
+        names = _split(value)[:MAX_CAST]
+        return f"{title} stars {_join(names)}." if names else None
+    if field == 'release_date':
+        return f"{title} was released on {value}."
+    if field == 'genres':
+        return f"{title} is a {_join(_split(value))} movie."
+    if field == 'runtime':
+        return f"{title} runs {int(value)} minutes." if value else None
+    if field == 'vote_average':
+        votes = movie.get('vote_count')
+        return f"{title} is rated {float(value):.1f}/10 on TMDB from {int(votes):,} votes." if votes else None
+    return str(value)
+
+
+class ChatRouter:
+
+    def __init__(self, cache_size=CHAT_CACHE_SIZE, cache_ttl=CHAT_CACHE_TTL):
+        self.intents = {}
+        self.default_reply = None
+        self.find_movie = None
+        self.cache = ResultCache(maxsize=cache_size, ttl=cache_ttl)
+        self.counts = {'intent': 0, 'catalog': 0, 'cache': 0, 'llm': 0}
+        self._lock = threading.Lock()
+
+    def set_intents(self, table):
+        # table: message -> reply; its "default" entry answers an empty message
+        self.default_reply = table.get('default')
+        self.intents = {normalize_prompt(k): v for k, v in table.items() if k != 'default'}
+
+    def set_catalog(self, find_movie):
+        # find_movie(title) -> movie record (with .get(field)) or None
+        self.find_movie = find_movie
+
+    def _count(self, source):
+        with self._lock:
+            self.counts[source] += 1
+
+    def catalog_answer(self, prompt):
+        if self.find_movie is None:
+            return None
+        for field, pattern, loose in CATALOG_QUESTIONS:
+            match = pattern.fullmatch(prompt)
+            if match is None:
+                continue
+            title, marked = _clean_title(match.group('title'))
+            if not title or (loose and not marked) or (title in VAGUE_TITLES and not marked):
+                return None
+            movie = self.find_movie(title)
+            # The first pattern that matches decides the field; an unknown title goes to the LLM
+            return format_answer(field, movie) if movie is not None else None
+        return None
+
+    def answer(self, message):
+        # (reply, source) when the message can be answered without the LLM, else (None, None)
+        prompt = normalize_prompt(message)
+        if not prompt:
+            self._count('intent')
+            return self.default_reply, 'intent'
+
+        reply = self.intents.get(prompt)
+        source = 'intent'
+        if reply is None:
+            reply, source = self.catalog_answer(prompt), 'catalog'
+        if reply is None:
+            reply, source = self.cache.get(('chat', prompt)), 'cache'
+        if reply is None:
+            self._count('llm')
+            return None, None
+        self._count(source)
+        return reply, source
+
+    def remember(self, message, reply):
+        # Caches an LLM reply for later identical (normalized) questions
+        prompt = normalize_prompt(message)
+        if prompt and reply:
+            self.cache.put(('chat', prompt), reply)
+
+    def stats(self):
+        with self._lock:
+            answered = dict(self.counts)
+        return {'answered': answered, 'reply_cache': self.cache.stats()}
+
+
+# ----- Routing checks -----
+
+def main():
+    # Runs the router against a stub catalog; exits non-zero on the first wrong route
+    catalog = {
+        'inception': {'title': 'Inception', 'directors': 'Christopher Nolan', 'cast': ['Leonardo DiCaprio'],
+                      'runtime': 148, 'vote_average': 8.4, 'vote_count': 35000, 'overview': 'Dreams within dreams.'},
+        'it': {'title': 'It', 'directors': 'Andy Muschietti', 'cast': ['Bill Skarsgard'], 'runtime': 135,
+               'vote_average': 7.2, 'vote_count': 17000, 'overview': 'A clown.'},
+        'love': {'title': 'Love', 'directors': 'Gaspar Noe', 'cast': ['Karl Glusman'], 'runtime': 135,
+                 'vote_average': 6.0, 'vote_count': 2000, 'overview': 'A couple.'},
+    }
+    router = ChatRouter(cache_size=16, cache_ttl=60)
+    router.set_intents({'hi': 'Hi there!', 'default': 'Sorry?'})
+    router.set_catalog(lambda title: catalog.get(title))
+
+    cases = [
+        ('Hi!', 'intent'),
+        ('', 'intent'),
+        ('Who directed Inception?', 'catalog'),
+        ("what's inception about", 'catalog'),
+        ('who starred in inception', 'catalog'),
+        ('how long is the movie inception', 'catalog'),
+        ('how good is "inception"', 'catalog'),
+        ('what is "it" about', 'catalog'),
+        ('who directed the movie it', 'catalog'),
+        # follow-ups and ordinary sentences go to the LLM
+        ('What is it about?', None),
+        ('How good is it?', None),
+        ('how long is it', None),
+        ('how long is inception', None),
+        ('who is in love', None),
+        ('who directed that one', None),
+        ('who directed some unknown film', None),
+    ]
+    failures = 0
+    for message, expected in cases:
+        reply, source = router.answer(message)
+        ok = source == expected
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {message!r:40} -> {source}: {reply}")
+    print(f"{len(cases) - failures}/{len(cases)} routed as expected")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
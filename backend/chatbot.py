@@ -1,48 +1,107 @@
-import os
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from dotenv import load_dotenv
-import requests
 
 load_dotenv()
 
+# Imported after load_dotenv() so the client picks up OPENROUTER_* / CHAT_* settings from .env
+from openrouter_client import OpenRouterClient, ChatError, ChatUnavailable  # noqa: E402
+from chat_router import ChatRouter  # noqa: E402
+
 chatbot_bp = Blueprint('chatbot', __name__)
-API_KEY = os.getenv("OPENROUTER_API_KEY")
-API_URL = "https://openrouter.ai/api/v1/chat/completions"
 
-HEADERS = {
-    "Authorization": f"Bearer {API_KEY}",
-    "Content-Type": "application/json"
-}
+SYSTEM_PROMPT = "You are a helpful movie assistant who recommends movies and answers questions about cinema.Give crisp answers. No need to elaborate. Answers need to be to the point. Respond in 4 lines."
+BUSY_REPLY = "The assistant is busy right now. Please try again in a moment."
+
+# One pooled client per process: keep-alive connections, timeouts, bounded concurrency, circuit breaker
+client = OpenRouterClient()
+# Canned intents, catalog questions and repeated questions are answered without the LLM.
+# Appt registers the intent table and the catalog lookup (set_intents / set_catalog)
+router = ChatRouter()
+
+
+def build_messages(user_message):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_message}
+    ]
+
+
+def wants_stream(data):
+    return request.args.get("stream") in ("1", "true") or bool(data.get("stream"))
+
+
+def sse(event):
+    return f"data: {json.dumps(event)}\n\n"
+
 
 @chatbot_bp.route("/chat", methods=["POST"])
 def chat():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     user_message = data.get("message", "")
+    if wants_stream(data):
+        return chat_stream()
 
-    payload = {
-        "model": "mistralai/mistral-7b-instruct",  # You can try "openai/gpt-3.5-turbo" too
-        "messages": [
-            {"role": "system", "content": "You are a helpful movie assistant who recommends movies and answers questions about cinema.Give crisp answers. No need to elaborate. Answers need to be to the point. Respond in 4 lines."},
-            {"role": "user", "content": user_message}
-        ]
-    }
+    reply, source = router.answer(user_message)
+    if reply is not None:
+        return jsonify({"reply": reply, "source": source})
 
     try:
-        response = requests.post(API_URL, headers=HEADERS, json=payload)
-        response_data = response.json()
-        print(response_data)
-
-        # Debug: Print full response
-        print("OpenRouter response:", response_data)
-
-        if "choices" in response_data:
-            reply = response_data["choices"][0]["message"]["content"]
-            return jsonify({"reply": reply})
-        elif "error" in response_data:
-            return jsonify({"reply": f"Error: {response_data['error']['message']}"})
-        else:
-            return jsonify({"reply": "Something went wrong. No reply from assistant."})
-
+        reply = client.complete(build_messages(user_message))
+        router.remember(user_message, reply)
+        return jsonify({"reply": reply, "source": "llm"})
+    except ChatUnavailable as e:
+        print(f"[WARNING] Chat request turned away: {e}")
+        return jsonify({"reply": BUSY_REPLY}), 503
+    except ChatError as e:
+        print(f"[ERROR] OpenRouter error: {e}")
+        return jsonify({"reply": f"Error: {e}"})
     except Exception as e:
         print("OpenRouter error:", e)
         return jsonify({"reply": "Sorry, something went wrong while contacting the assistant."})
+
+
+@chatbot_bp.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    # Server-sent events: {"delta": ...} per fragment, then {"done": true} or {"error": ...}
+    data = request.get_json(silent=True) or {}
+    user_message = data.get("message", "")
+
+    reply, source = router.answer(user_message)
+    if reply is not None:
+        # Answered locally: the whole reply in one event
+        body = sse({"delta": reply}) + sse({"done": True, "source": source})
+        return Response(body, mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    try:
+        fragments = client.stream(build_messages(user_message))
+    except ChatUnavailable as e:
+        print(f"[WARNING] Chat request turned away: {e}")
+        return jsonify({"reply": BUSY_REPLY}), 503
+    except ChatError as e:
+        print(f"[ERROR] OpenRouter error: {e}")
+        return jsonify({"reply": f"Error: {e}"}), 502
+
+    def generate():
+        parts = []
+        try:
+            for fragment in fragments:
+                parts.append(fragment)
+                yield sse({"delta": fragment})
+            router.remember(user_message, "".join(parts))
+            yield sse({"done": True, "source": "llm"})
+        except ChatError as e:
+            print(f"[ERROR] OpenRouter stream error: {e}")
+            yield sse({"error": "Sorry, something went wrong while contacting the assistant."})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+    # Frees the upstream slot even if the response is closed before its first chunk
+    response.call_on_close(fragments.close)
+    return response
+
+
+@chatbot_bp.route("/chat/stats", methods=["GET"])
+def chat_stats():
+    # How many messages were answered locally vs. sent to the LLM, reply cache and breaker state
+    return jsonify(dict(router.stats(), upstream=client.stats()))
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# ----------------- Explore Index --------------------------------
+# The /explore sections, computed once per model instead of per request:
+#
+#   popular      catalog rows by popularity, highest first
+#   top_rated    catalog rows by vote_average, highest first
+#   by_genre     for every genre of the person/genre index (comma-separated genres, see
+#                person_index.py), its movies by vote_average, highest first
+#
+# All lists are top_n catalog positions. Ties keep catalog order and missing values sort last.
+
+EXPLORE_TOP_N = int(os.getenv('EXPLORE_TOP_N', 10))
+
+
+def _descending(values):
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+    return np.argsort(-np.nan_to_num(values, nan=-np.inf), kind='stable')
+
+
+class ExploreIndex:
+
+    def __init__(self, catalog, person_index, top_n=EXPLORE_TOP_N):
+        self.top_n = top_n
+        self.popular = _descending(catalog['popularity'])[:top_n]
+        rating_order = _descending(catalog['vote_average'])
+        self.top_rated = rating_order[:top_n]
+
+        # Rank of every movie by rating, so a genre's posting list sorts with one argsort
+        rating_rank = np.empty(len(rating_order), dtype=np.int64)
+        rating_rank[rating_order] = np.arange(len(rating_order))
+        postings = person_index.postings['genres']
+        self.by_genre = {}  # lowercased genre -> (genre name, positions)
+        for i, name in enumerate(person_index.genre_names):
+            movies = postings.indices[postings.indptr[i]:postings.indptr[i + 1]]
+            self.by_genre[name.lower()] = (name, movies[np.argsort(rating_rank[movies])][:top_n])
+
+    @property
+    def genres(self):
+        return [name for name, _ in self.by_genre.values()]
+
+    def genre(self, name):
+        # (genre name as in the catalog, positions), or None for an unknown genre
+        return self.by_genre.get(str(name).strip().lower())
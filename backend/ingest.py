@@ -0,0 +1,361 @@
+import argparse
+import csv
+import json
+import os
+import time
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import vstack
+
+from catalog_cache import DEFAULT_CSV
+from feature_builder import build_features, catalog_rows
+from model_bundle import DEFAULT_BUNDLE_ROOT, RecommenderModel, load_bundle, write_bundle
+from similarity import topk_similarity_rows
+from text_clean import iter_clean_texts
+from title_resolver import normalize_title
+from title_similarity import title_neighbors_for_rows
+
+# ----------------- Incremental Catalog Ingestion ----------------
+# Appends new movies to the current model bundle without rerunning mrs.py:
+#
+#   1. the movies go through the catalog filter and feature build of mrs.py (feature_builder.py,
+#      text_clean.py); titles already in the catalog are skipped
+#   2. their tags are transformed with the bundle's fitted vocabulary and idf (stable vocabulary,
+#      no refit) and appended as new rows of tfidf_matrix
+#   3. neighbor tables: new rows get their top-K; an existing row only changes when a new movie
+#      beats its K-th neighbor. The TF-IDF LSH index and the person/genre index are extended
+#   4. the result is written as a new bundle version, the movies are appended to the source CSV
+#      (so the next full build includes them) and the new version is served
+#
+# Words outside the fitted vocabulary are dropped by the transform. The share of such tokens in
+# everything ingested since the last full fit is compared with the share in the fitted catalog;
+# when it is INGEST_DRIFT_THRESHOLD higher, or the appended rows exceed INGEST_MAX_APPENDED of the
+# fitted catalog, a full refit is requested: model_bundle/REFIT_REQUESTED, consumed by
+# `python build_bundle.py --if-requested`.
+#
+# Collaborative filtering and /mood pick up the new movies at that refit (no ratings yet, and
+# the mood labels come from the full pipeline).
+#
+#   python ingest.py new_movies.csv          # or a .json list of movies; CSV columns as TMDB_IMDB_movies.csv
+
+INGEST_DRIFT_THRESHOLD = float(os.getenv('INGEST_DRIFT_THRESHOLD', 0.10))
+INGEST_MAX_APPENDED = float(os.getenv('INGEST_MAX_APPENDED', 0.20))
+REFIT_FILE = 'REFIT_REQUESTED'
+
+FEATURE_COLUMNS = ['id', 'title', 'genres', 'directors', 'writers', 'cast', 'overview', 'keywords']
+NUMERIC_COLUMNS = ['popularity', 'vote_average', 'vote_count']
+# Columns of the catalog (new_df in mrs.py)
+CATALOG_COLUMNS = ['id', 'title', 'keywords', 'cast', 'directors', 'writers', 'genres', 'combined_features',
+                   'popularity', 'vote_average']
+
+
+# --- catalog rows ---
+
+def _normalize(movie):
+    # JSON input may give lists of names; the CSV has comma-separated text
+    return {key: ', '.join(str(v) for v in value) if isinstance(value, list) else value
+            for key, value in movie.items()}
+
+
+def prepare_movies(movies, catalog, known_titles=None):
+    # (catalog rows with tags, the accepted input records, skip counts), filtered as mrs.py filters the CSV.
+    # Duplicates are found on the normalized title, the key of the title resolver and MOVIE_DATASET;
+    # known_titles (e.g. model.title_resolver.exact) saves normalizing the whole catalog
+    records = [_normalize(movie) for movie in movies]
+    df = pd.DataFrame(records, columns=list(dict.fromkeys(FEATURE_COLUMNS + NUMERIC_COLUMNS
+                                                          + [c for r in records for c in r])))
+    for column in NUMERIC_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    df = catalog_rows(df.dropna(subset=['popularity']))
+    filtered = len(records) - len(df)
+
+    if known_titles is None:
+        known_titles = set(catalog['title'].map(normalize_title))
+    keys = df['title'].map(normalize_title)
+    unique = df[~keys.duplicated(keep='first') & ~keys.isin(known_titles)].copy()
+    duplicates = len(df) - len(unique)
+
+    for feature in FEATURE_COLUMNS:
+        unique[feature] = unique[feature].fillna('')
+    build_features(unique)
+    unique['combined_features'] = list(iter_clean_texts(unique['combined_features']))
+
+    rows = unique[CATALOG_COLUMNS].rename(columns={'combined_features': 'tags'}).reset_index(drop=True)
+    rows['title_lower'] = rows['title'].str.lower()
+    for column in rows.columns:
+        # Same dtypes as the catalog, so the appended catalog pickles like a built one
+        if column in catalog and pd.api.types.is_numeric_dtype(catalog[column].dtype):
+            rows[column] = pd.to_numeric(rows[column], errors='coerce')
+    accepted = [records[i] for i in unique.index]
+    return rows[[c for c in catalog.columns if c in rows]], accepted, {'filtered': filtered, 'duplicates': duplicates}
+
+
+# --- TF-IDF ---
+
+def tfidf_vectorizer(model):
+    # The bundle's fitted TfidfVectorizer, rebuilt from its vocabulary and idf
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    if model.vocabulary is None or model.idf is None:
+        raise ValueError("The model bundle has no fitted TF-IDF vocabulary; run a full build (build_bundle.py)")
+    stop_words = model.manifest.get('params', {}).get('tfidf_stop_words', 'english')
+    vectorizer = TfidfVectorizer(vocabulary=model.vocabulary, stop_words=stop_words)
+    vectorizer.idf_ = np.asarray(model.idf, dtype=np.float64)
+    return vectorizer
+
+
+def oov_counts(vectorizer, texts):
+    # (tokens, tokens outside the fitted vocabulary) after the vectorizer's own tokenizing
+    analyzer = vectorizer.build_analyzer()
+    vocabulary = vectorizer.vocabulary_
+    tokens = oov = 0
+    for text in texts:
+        words = analyzer(text)
+        tokens += len(words)
+        oov += sum(word not in vocabulary for word in words)
+    return tokens, oov
+
+
+# --- neighbor tables ---
+
+def _pad(idx, scores, width):
+    # Rows of a table narrower than `width` (catalog smaller than K + 1) padded with -1 / 0.0
+    out_idx = np.full((len(idx), width), -1, dtype=np.int32)
+    out_scores = np.zeros((len(idx), width), dtype=np.float32)
+    out_idx[:, :idx.shape[1]] = idx
+    out_scores[:, :scores.shape[1]] = scores
+    return out_idx, out_scores
+
+
+def _kth_scores(neighbor_idx, neighbor_scores):
+    # Score a candidate must beat to enter each row (-inf while the row has free slots)
+    kth = neighbor_scores[:, -1].astype(np.float32)
+    kth[neighbor_idx[:, -1] < 0] = -np.inf
+    return kth
+
+
+def _merge_candidates(neighbor_idx, neighbor_scores, rows, cands, scores):
+    # Inserts (row, candidate, score) triples into the tables in place. Candidates are new rows
+    # (higher indexes), so they go after every existing entry with an equal or higher score,
+    # and the existing entries keep the order of the full build
+    if len(rows) == 0:
+        return 0
+    width = neighbor_idx.shape[1]
+    order = np.lexsort((cands, -scores, rows))
+    rows, cands, scores = rows[order], cands[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    for start, stop in zip(starts, np.r_[starts[1:], len(rows)]):
+        row = rows[start]
+        keep = neighbor_idx[row] >= 0
+        at = np.searchsorted(-neighbor_scores[row][keep], -scores[start:stop], side='right')
+        idx = np.insert(neighbor_idx[row][keep], at, cands[start:stop])[:width]
+        top = np.insert(neighbor_scores[row][keep], at, scores[start:stop])[:width]
+        neighbor_idx[row] = -1
+        neighbor_scores[row] = 0.0
+        neighbor_idx[row, :len(idx)] = idx
+        neighbor_scores[row, :len(top)] = top
+    return len(starts)
+
+
+def append_neighbors(neighbor_idx, neighbor_scores, matrix, first_new):
+    # TF-IDF neighbor table for `matrix` whose rows from first_new on are new; (idx, scores, rows updated)
+    width = neighbor_idx.shape[1]
+    new = np.arange(first_new, matrix.shape[0])
+    idx, scores = _pad(*topk_similarity_rows(matrix, new, width), width)
+    neighbor_idx = np.vstack([np.asarray(neighbor_idx, dtype=np.int32), idx])
+    neighbor_scores = np.vstack([np.asarray(neighbor_scores, dtype=np.float32), scores])
+    if width == 0 or first_new == 0:
+        return neighbor_idx, neighbor_scores, 0
+
+    sims = (matrix[new] @ matrix[:first_new].T).tocoo()
+    sim = sims.data.astype(np.float32)
+    beats = sim > _kth_scores(neighbor_idx[:first_new], neighbor_scores[:first_new])[sims.col]
+    updated = _merge_candidates(neighbor_idx, neighbor_scores, sims.col[beats].astype(np.int64),
+                                (first_new + sims.row[beats]).astype(np.int32), sim[beats])
+    return neighbor_idx, neighbor_scores, updated
+
+
+def append_title_neighbors(neighbor_idx, neighbor_scores, titles, first_new):
+    # Title table for `titles` whose entries from first_new on are new. An existing title is only
+    # re-scored against the new titles that had it among their cosine candidates
+    width = neighbor_idx.shape[1]
+    titles = [str(t).lower() for t in titles]
+    new = np.arange(first_new, len(titles))
+    idx, scores, cand_idx = title_neighbors_for_rows(titles, new, k=width)
+    idx, scores = _pad(idx, scores, width)
+    neighbor_idx = np.vstack([np.asarray(neighbor_idx, dtype=np.int32), idx])
+    neighbor_scores = np.vstack([np.asarray(neighbor_scores, dtype=np.float32), scores])
+    if width == 0 or first_new == 0:
+        return neighbor_idx, neighbor_scores, 0
+
+    kth = _kth_scores(neighbor_idx[:first_new], neighbor_scores[:first_new])
+    rows, cands, ratios = [], [], []
+    matcher = SequenceMatcher(None)
+    for pos, row in zip(new, cand_idx):
+        matcher.set_seq1(titles[pos])
+        for other in row[(row >= 0) & (row < first_new)]:
+            matcher.set_seq2(titles[other])
+            ratio = np.float32(matcher.ratio())
+            if ratio > kth[other]:
+                rows.append(other)
+                cands.append(pos)
+                ratios.append(ratio)
+    updated = _merge_candidates(neighbor_idx, neighbor_scores, np.asarray(rows, dtype=np.int64),
+                                np.asarray(cands, dtype=np.int32), np.asarray(ratios, dtype=np.float32))
+    return neighbor_idx, neighbor_scores, updated
+
+
+# --- ingestion ---
+
+def _drift_state(model, vectorizer, state):
+    # Counters since the last full fit, carried from bundle to bundle in params['ingest']
+    if state.get('base_version') is None:
+        tokens, oov = oov_counts(vectorizer, model.catalog['tags'].fillna('').astype(str))
+        state = {'base_version': model.version, 'base_rows': len(model.catalog),
+                 'baseline_oov_rate': oov / max(tokens, 1), 'rows_appended': 0, 'tokens': 0, 'oov_tokens': 0}
+    return dict(state)
+
+
+def ingest_movies(model, movies):
+    # (new RecommenderModel or None when nothing was accepted, report)
+    start = time.perf_counter()
+    rows, accepted, skipped = prepare_movies(movies, model.catalog, model.title_resolver.exact)
+    vectorizer = tfidf_vectorizer(model)
+    state = _drift_state(model, vectorizer, model.manifest.get('params', {}).get('ingest') or {})
+    report = {'received': len(movies), 'ingested': len(rows), 'titles': rows['title'].tolist(),
+              'skipped': skipped, 'movies': accepted, 'parent_version': model.version}
+    if rows.empty:
+        report.update(state=state, refit_due=False, refit_reason=None)
+        return None, report
+
+    first_new = len(model.catalog)
+    catalog = pd.concat([model.catalog, rows], ignore_index=True)
+    new_matrix = vectorizer.transform(rows['tags']).astype(model.tfidf_matrix.dtype)
+    tfidf_matrix = vstack([model.tfidf_matrix, new_matrix], format='csr')
+    neighbor_idx, neighbor_scores, updated = append_neighbors(model.neighbor_idx, model.neighbor_scores,
+                                                              tfidf_matrix, first_new)
+    title_idx, title_scores, title_updated = model.title_neighbor_idx, model.title_neighbor_scores, 0
+    if title_idx is not None:
+        title_idx, title_scores, title_updated = append_title_neighbors(title_idx, title_scores,
+                                                                        catalog['title'].tolist(), first_new)
+    indices = pd.concat([model.indices, pd.Series(np.arange(first_new, len(catalog)), index=rows['title'].values)])
+
+    tokens, oov = oov_counts(vectorizer, rows['tags'])
+    state['rows_appended'] += len(rows)
+    state['tokens'] += tokens
+    state['oov_tokens'] += oov
+    oov_rate = state['oov_tokens'] / max(state['tokens'], 1)
+    drift = oov_rate - state['baseline_oov_rate']
+    appended = state['rows_appended'] / max(state['base_rows'], 1)
+    reason = None
+    if drift > INGEST_DRIFT_THRESHOLD:
+        reason = f"out-of-vocabulary share {oov_rate:.3f} vs {state['baseline_oov_rate']:.3f} at the last fit"
+    elif appended > INGEST_MAX_APPENDED:
+        reason = f"{state['rows_appended']} rows appended since the last fit ({appended:.1%} of the catalog)"
+
+    new_model = RecommenderModel(
+        catalog=catalog,
+        tfidf_matrix=tfidf_matrix,
+        indices=indices,
+        neighbor_idx=neighbor_idx,
+        neighbor_scores=neighbor_scores,
+        cf_matrix=model.cf_matrix,
+        movie_to_idx=model.movie_to_idx,
+        cf_movie_ids=model.cf_movie_ids,
+        cf_user_ids=model.cf_user_ids,
+        vocabulary=model.vocabulary,
+        idf=model.idf,
+        title_neighbor_idx=title_idx,
+        title_neighbor_scores=title_scores,
+        person_index=model.person_index.extended(rows),
+        tfidf_ann=model.tfidf_ann.extended(new_matrix) if model.tfidf_ann is not None else None,
+        cf_ann=model.cf_ann,
+        mf=model.mf,
+        mood_df=model.mood_df,
+        mood_index=model.mood_index,
+    )
+    report.update(state=state, neighbor_rows_updated=updated, title_rows_updated=title_updated,
+                  oov_rate=oov_rate, drift=drift, appended_fraction=appended,
+                  refit_due=reason is not None, refit_reason=reason,
+                  seconds=time.perf_counter() - start)
+    return new_model, report
+
+
+def append_to_csv(csv_path, movies):
+    # Appends the movies under the CSV's own header (missing fields empty, unknown ones dropped)
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f))
+    with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=header, restval='', extrasaction='ignore')
+        for movie in movies:
+            writer.writerow({key: '' if value is None else value for key, value in movie.items()})
+
+
+def request_refit(root, report):
+    tmp = os.path.join(root, f'{REFIT_FILE}.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'requested_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'version': report.get('version'),
+                   'reason': report['refit_reason']}, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(root, REFIT_FILE))
+
+
+def refit_requested(root=DEFAULT_BUNDLE_ROOT):
+    # The pending refit request, or None
+    path = os.path.join(root, REFIT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def ingest_and_publish(movies, model, root=DEFAULT_BUNDLE_ROOT, csv_path=DEFAULT_CSV, make_current=True):
+    # Ingests, writes the new bundle version and returns (the model loaded from it or None, report)
+    new_model, report = ingest_movies(model, movies)
+    if new_model is None:
+        return None, report
+
+    params = dict(model.manifest.get('params', {}), ingest=report['state'])
+    version = write_bundle(new_model, root, params=params, make_current=make_current)
+    report['version'] = version
+    if csv_path and os.path.exists(csv_path):
+        append_to_csv(csv_path, report['movies'])
+    if report['refit_due']:
+        request_refit(root, report)
+    return load_bundle(root, version), report
+
+
+def _read_movies(path):
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return data['movies'] if isinstance(data, dict) else data
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Append new movies to the current model bundle without a refit.')
+    parser.add_argument('movies', help='CSV (columns as TMDB_IMDB_movies.csv) or JSON list of movies')
+    parser.add_argument('--root', default=DEFAULT_BUNDLE_ROOT, help='bundle root directory')
+    parser.add_argument('--csv', default=DEFAULT_CSV, help='source CSV the movies are appended to')
+    parser.add_argument('--no-csv', action='store_true', help='leave the source CSV unchanged')
+    parser.add_argument('--no-activate', action='store_true', help='write the bundle without pointing CURRENT at it')
+    args = parser.parse_args()
+
+    model = load_bundle(args.root)
+    _, report = ingest_and_publish(_read_movies(args.movies), model, args.root,
+                                   csv_path=None if args.no_csv else args.csv, make_current=not args.no_activate)
+    print(f"received: {report['received']}  ingested: {report['ingested']}  skipped: {report['skipped']}")
+    if report['ingested']:
+        print(f"bundle {report['version']} (from {report['parent_version']}) in {report['seconds']:.2f}s; "
+              f"neighbor rows updated: {report['neighbor_rows_updated']}, title rows: {report['title_rows_updated']}")
+        print(f"out-of-vocabulary share {report['oov_rate']:.3f} (drift {report['drift']:+.3f}), "
+              f"appended since the last fit: {report['appended_fraction']:.1%}")
+    if report['refit_due']:
+        print(f"[WARNING] Full refit requested: {report['refit_reason']}")
+
+
+if __name__ == '__main__':
+    main()
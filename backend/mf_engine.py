@@ -0,0 +1,175 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# ----------------- Matrix-Factorization CF Engine ---------------
+# Alternative to the brute-force cosine kNN over the sparse movie x user matrix.
+# The ratings matrix R (movies x users, see cf_index.py) is factorised into
+#
+#   item_factors  float32, n_movies x f
+#   user_factors  float32, n_users  x f      with  R ~ mean + item_factors @ user_factors.T
+#
+# trained with ALS (alternating least squares, weighted-lambda regularisation) on the
+# observed ratings only. Each half-step solves one small f x f system per row. Rows go in
+# chunks of at most MF_CHUNK_ROWS: a chunk's Gram matrices are stacked into one (rows, f, f)
+# array, its right-hand sides come from one sparse product, and all of its systems are solved
+# by a single batched np.linalg.solve. That solve is most of the work and runs without the GIL.
+# Chunks are spread over MF_N_JOBS threads; the per-row Gram products still take the GIL
+# in turn, so measure what extra threads buy on a given machine with
+#   python mf_engine.py --bench --jobs 1 4
+#
+# Serving is one dense matmul against the item factors:
+#   similar_items(row)      item-to-item cosine between item embeddings
+#   recommend_for_user(col) predicted rating of every movie for a MovieLens user
+
+DEFAULT_FACTORS = int(os.getenv('MF_FACTORS', 64))
+DEFAULT_REG = float(os.getenv('MF_REG', 0.05))
+DEFAULT_ITERATIONS = int(os.getenv('MF_ITERATIONS', 10))
+DEFAULT_N_JOBS = int(os.getenv('MF_N_JOBS', 0))  # <= 0: all cores
+CHUNK_ROWS = int(os.getenv('MF_CHUNK_ROWS', 512))  # bounds the (rows, f, f) stack: 512 x 64 x 64 float64 = 16 MB
+
+
+def _solve_rows(matrix, fixed, reg, start, stop, out):
+    # For every row r in [start, stop): (Y_r^T Y_r + reg * n_r * I) x_r = Y_r^T ratings_r,
+    # all in one batched solve. An empty row gets I x = 0, so its factors are 0
+    f = fixed.shape[1]
+    indptr = matrix.indptr[start:stop + 1]
+    counts = np.diff(indptr)
+    y = fixed[matrix.indices[indptr[0]:indptr[-1]]]  # one gather per chunk
+    offsets = indptr - indptr[0]
+    a = np.empty((stop - start, f, f), dtype=np.float64)
+    a[counts == 0] = 0.0
+    for k in np.flatnonzero(counts):
+        rows = y[offsets[k]:offsets[k + 1]]
+        np.matmul(rows.T, rows, out=a[k])
+    diag = np.arange(f)
+    a[:, diag, diag] += np.where(counts > 0, reg * counts, 1.0)[:, None]
+    b = matrix[start:stop] @ fixed  # Y_r^T ratings_r for every row at once
+    out[start:stop] = np.linalg.solve(a, b[:, :, None])[:, :, 0]
+
+
+def _half_step(matrix, fixed, reg, n_jobs):
+    out = np.empty((matrix.shape[0], fixed.shape[1]), dtype=np.float32)
+    fixed = np.asarray(fixed, dtype=np.float64)  # the systems are built and solved in float64
+    workers = n_jobs if n_jobs > 0 else (os.cpu_count() or 1)
+    chunks = max(workers * 4, -(-matrix.shape[0] // CHUNK_ROWS))
+    bounds = np.linspace(0, matrix.shape[0], chunks + 1, dtype=int)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda b: _solve_rows(matrix, fixed, reg, b[0], b[1], out), zip(bounds[:-1], bounds[1:])))
+    return out
+
+
+class MFModel:
+
+    def __init__(self, item_factors, user_factors, global_mean=0.0):
+        self.item_factors = item_factors
+        self.user_factors = user_factors
+        self.global_mean = float(global_mean)
+        norms = np.linalg.norm(item_factors, axis=1)
+        self.item_norms = np.where(norms > 0, norms, 1.0).astype(np.float32)
+
+    def __len__(self):
+        return len(self.item_factors)
+
+    @classmethod
+    def train(cls, matrix, factors=DEFAULT_FACTORS, reg=DEFAULT_REG, iterations=DEFAULT_ITERATIONS,
+              n_jobs=DEFAULT_N_JOBS, seed=42, verbose=False):
+        # matrix: movies x users ratings (CSR); only stored entries count as observed
+        items = csr_matrix(matrix, dtype=np.float64)
+        items.sum_duplicates()
+        global_mean = float(items.data.mean()) if items.nnz else 0.0
+        items.data -= global_mean
+        users = items.T.tocsr()
+
+        rng = np.random.default_rng(seed)
+        item_factors = (rng.standard_normal((items.shape[0], factors)) * 0.01).astype(np.float32)
+        user_factors = np.zeros((items.shape[1], factors), dtype=np.float32)
+        for it in range(iterations):
+            user_factors = _half_step(users, item_factors, reg, n_jobs)
+            item_factors = _half_step(items, user_factors, reg, n_jobs)
+            if verbose:
+                print(f"[MF] iteration {it + 1}/{iterations}: train RMSE {cls._rmse(items, item_factors, user_factors):.4f}")
+        return cls(item_factors, user_factors, global_mean)
+
+    @staticmethod
+    def _rmse(items, item_factors, user_factors):
+        coo = items.tocoo()
+        pred = np.einsum('ij,ij->i', item_factors[coo.row], user_factors[coo.col])
+        return float(np.sqrt(np.mean((coo.data - pred) ** 2)))
+
+    # --- serving ---
+
+    def similar_items(self, row, k=10):
+        # k most similar movies to CF row `row` by embedding cosine (itself excluded)
+        scores = (self.item_factors @ self.item_factors[row]) / (self.item_norms * self.item_norms[row])
+        scores[row] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        return top.astype(np.int32), scores[top].astype(np.float32)
+
+    def recommend_for_user(self, col, k=10, exclude=None):
+        # k movies with the highest predicted rating for CF column `col`; `exclude` = CF rows already rated
+        scores = self.global_mean + self.item_factors @ self.user_factors[col]
+        if exclude is not None and len(exclude):
+            scores[np.asarray(exclude)] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        return top.astype(np.int32), scores[top].astype(np.float32)
+
+    # --- persistence ---
+
+    def save(self, out_dir, prefix='mf'):
+        np.save(os.path.join(out_dir, f'{prefix}_item_factors.npy'), np.ascontiguousarray(self.item_factors, dtype=np.float32))
+        np.save(os.path.join(out_dir, f'{prefix}_user_factors.npy'), np.ascontiguousarray(self.user_factors, dtype=np.float32))
+        np.save(os.path.join(out_dir, f'{prefix}_global_mean.npy'), np.array(self.global_mean, dtype=np.float64))
+
+    @classmethod
+    def load(cls, path, prefix='mf', mmap_mode='r'):
+        # None if the bundle was built without the MF engine
+        item_path = os.path.join(path, f'{prefix}_item_factors.npy')
+        if not os.path.exists(item_path):
+            return None
+        return cls(np.load(item_path, mmap_mode=mmap_mode),
+                   np.load(os.path.join(path, f'{prefix}_user_factors.npy'), mmap_mode=mmap_mode),
+                   float(np.load(os.path.join(path, f'{prefix}_global_mean.npy'))))
+
+
+# ----- Benchmark -----
+
+def bench(n_movies, n_users, per_user, factors, iterations, jobs):
+    # Trains on random ratings once per thread count in `jobs` and prints the wall time
+    import time
+    from scipy.sparse import random as sparse_random
+
+    rng = np.random.default_rng(0)
+    matrix = sparse_random(n_movies, n_users, density=per_user / n_movies, format='csr', random_state=rng)
+    matrix.data = np.ceil(matrix.data * 5)
+    print(f"{n_movies} movies x {n_users} users, {matrix.nnz} ratings, f={factors}, {iterations} iterations, "
+          f"{os.cpu_count()} cores")
+    for n_jobs in jobs:
+        start = time.perf_counter()
+        MFModel.train(matrix, factors=factors, iterations=iterations, n_jobs=n_jobs)
+        print(f"  {n_jobs} thread(s): {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='ALS training benchmark')
+    parser.add_argument('--bench', action='store_true', help='time training on random ratings')
+    parser.add_argument('--movies', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--per-user', type=int, default=40, help='ratings per user on average')
+    parser.add_argument('--factors', type=int, default=DEFAULT_FACTORS)
+    parser.add_argument('--iterations', type=int, default=2)
+    parser.add_argument('--jobs', type=int, nargs='+', default=sorted({1, os.cpu_count() or 1}))
+    args = parser.parse_args()
+    if not args.bench:
+        parser.error('nothing to do; pass --bench')
+    bench(args.movies, args.users, args.per_user, args.factors, args.iterations, args.jobs)
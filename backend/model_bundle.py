@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from sklearn.neighbors import NearestNeighbors
+
+from ann_index import LSHIndex
+from mf_engine import MFModel
+from mood_index import MoodIndex
+from person_index import PersonIndex, ROLES as PERSON_INDEX_ROLES
+from title_resolver import TitleResolver, normalize_title
+
+# ----------------- Versioned Model Bundle -----------------------
+# Layout on disk:
+#
+#   model_bundle/
+#     CURRENT                  name of the active version
+#     <version>/
+#       manifest.json          format, shapes, build params and a sha256 per file
+#       tfidf_vocabulary.json  fitted TfidfVectorizer vocabulary (term -> column)
+#       tfidf_idf.npy          fitted idf weights
+#       tfidf_{data,indices,indptr}.npy    CSR arrays of tfidf_matrix
+#       neighbor_{idx,scores}.npy          top-K TF-IDF neighbor table
+#       title_neighbor_{idx,scores}.npy    top-K similar-title table (see title_similarity.py)
+#       cf_{data,indices,indptr}.npy       CSR arrays of the movie x user ratings matrix
+#       cf_movie_ids.npy, cf_user_ids.npy  MovieLens movieId / userId of each CF row / column
+#       ann_{tfidf,cf}_*.npy, ann_{tfidf,cf}_params.json
+#                              LSH indexes over the TF-IDF / CF rows (large catalogs only, see ann_index.py)
+#       mf_{item,user}_factors.npy, mf_global_mean.npy
+#                              matrix-factorization CF embeddings (CF_ENGINE=mf builds only, see mf_engine.py)
+#       indices.json           catalog title -> tfidf_matrix row
+#       movie_to_idx.json      MovieLens title -> CF matrix row
+#       catalog.pkl            content catalog (new_df)
+#       mood.pkl               mood-labelled catalog (n_df) with its VADER scores
+#       mood_index.json, mood_index_order_{popularity,rating,recency}.npy
+#                              per-mood rows presorted by each key (see mood_index.py)
+#       person_names.json, genre_names.json, person_<role>_{data,indices,indptr}.npy
+#                              person/genre inverted index (see person_index.py)
+#
+# All .npy arrays are opened with np.load(mmap_mode='r'), so a cold start only maps
+# the files and every worker process shares the same page cache.
+
+BUNDLE_FORMAT = 1
+DEFAULT_BUNDLE_ROOT = os.getenv('MODEL_BUNDLE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_bundle'))
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+
+
+class RecommenderModel:
+    # Everything the API needs to serve recommendations, whether just trained or loaded from disk
+
+    def __init__(self, catalog, tfidf_matrix, indices, neighbor_idx, neighbor_scores,
+                 cf_matrix, movie_to_idx, mood_df=None, vocabulary=None, idf=None,
+                 person_index=None, title_neighbor_idx=None, title_neighbor_scores=None,
+                 cf_movie_ids=None, cf_user_ids=None, tfidf_ann=None, cf_ann=None, mf=None,
+                 mood_index=None, version='in-memory', path=None, manifest=None):
+        self.catalog = catalog
+        self.tfidf_matrix = tfidf_matrix
+        self.indices = indices
+        self.neighbor_idx = neighbor_idx
+        self.neighbor_scores = neighbor_scores
+        self.cf_matrix = cf_matrix
+        self.movie_to_idx = movie_to_idx
+        # Compact CF ids (see cf_index.py); None for bundles whose CF rows are raw movieIds
+        self.cf_movie_ids = cf_movie_ids
+        self.cf_user_ids = cf_user_ids
+        self.tfidf_ann = tfidf_ann
+        self.cf_ann = cf_ann
+        self.mf = mf  # MFModel over the same CF rows, used instead of model_knn when present
+        self.mood_df = mood_df
+        # Bundles written before the mood index existed get it built here
+        if mood_index is None and mood_df is not None:
+            mood_index = MoodIndex.build(mood_df)
+        self.mood_index = mood_index
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.title_neighbor_idx = title_neighbor_idx  # None for bundles built before the table existed
+        self.title_neighbor_scores = title_neighbor_scores
+        self.version = version
+        self.path = path
+        self.manifest = manifest or {}
+
+        # Fuzzy title -> catalog row, and MovieLens title -> CF row (see title_resolver.py).
+        # title_to_pos is the exact part: lowercased title -> first catalog row
+        self.title_resolver = TitleResolver(catalog['title'])
+        self.title_to_pos = self.title_resolver.exact
+        self.cf_resolver = TitleResolver(movie_to_idx.index, values=movie_to_idx.values)
+
+        # CF row -> MovieLens title, so kNN results are mapped back without rebuilding a dict per request
+        self.cf_row_titles = np.full(cf_matrix.shape[0], None, dtype=object)
+        self.cf_row_titles[movie_to_idx.values[::-1]] = movie_to_idx.index[::-1]  # first title wins
+
+        # Bundles written before the index existed get it built here
+        self.person_index = person_index if person_index is not None else PersonIndex.from_catalog(catalog)
+
+        # Brute-force cosine kNN only keeps a reference to the matrix, so fitting on load is cheap
+        self.model_knn = NearestNeighbors(metric='cosine', algorithm='brute')
+        self.model_knn.fit(cf_matrix)
+        self._cf_catalog_pos = None
+        self._cf_row_norms = None
+        self._id_to_title = None
+
+    @property
+    def id_to_title(self):
+        # TMDB id (as a string) -> catalog title, for lookups by id; built on first use
+        if self._id_to_title is None:
+            self._id_to_title = dict(zip(self.catalog['id'].astype(str), self.catalog['title']))
+        return self._id_to_title
+
+    @property
+    def cf_row_norms(self):
+        # L2 norm of every CF row (1.0 for empty rows), computed once per bundle instead of per request
+        if self._cf_row_norms is None:
+            matrix = csr_matrix(self.cf_matrix)
+            squares = np.bincount(np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr)),
+                                  weights=np.square(matrix.data, dtype=np.float64), minlength=matrix.shape[0])
+            norms = np.sqrt(squares).astype(np.float32)
+            norms[norms == 0] = 1.0
+            self._cf_row_norms = norms
+        return self._cf_row_norms
+
+    @property
+    def cf_catalog_pos(self):
+        # CF row -> catalog row (-1 if the cleaned MovieLens title is not in the catalog), built on first use
+        if self._cf_catalog_pos is None:
+            from recommender import clean_movie_title
+
+            exact = self.title_resolver.exact
+            self._cf_catalog_pos = np.array(
+                [exact.get(normalize_title(clean_movie_title(t)), -1) if t else -1 for t in self.cf_row_titles],
+                dtype=np.int32)
+        return self._cf_catalog_pos
+
+
+# ----------------- Writing ----------------------------------------
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _save_csr(out_dir, prefix, matrix):
+    matrix = csr_matrix(matrix)
+    matrix.sort_indices()
+    np.save(os.path.join(out_dir, f'{prefix}_data.npy'), matrix.data)
+    np.save(os.path.join(out_dir, f'{prefix}_indices.npy'), matrix.indices)
+    np.save(os.path.join(out_dir, f'{prefix}_indptr.npy'), matrix.indptr)
+    return list(matrix.shape)
+
+
+def _save_json(out_dir, name, obj):
+    with open(os.path.join(out_dir, name), 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False)
+
+
+def write_bundle(model, root=DEFAULT_BUNDLE_ROOT, params=None, make_current=True):
+    # Writes the model as a new version under root and returns the version name
+    staging = os.path.join(root, f'.staging-{os.getpid()}-{int(time.time() * 1000)}')
+    os.makedirs(staging)
+
+    shapes = {
+        'tfidf_matrix': _save_csr(staging, 'tfidf', model.tfidf_matrix),
+        'cf_matrix': _save_csr(staging, 'cf', model.cf_matrix),
+    }
+    if model.tfidf_ann is not None:
+        model.tfidf_ann.save(staging, 'ann_tfidf')
+    if model.cf_ann is not None:
+        model.cf_ann.save(staging, 'ann_cf')
+    if model.mf is not None:
+        model.mf.save(staging, 'mf')
+    if model.cf_movie_ids is not None:
+        np.save(os.path.join(staging, 'cf_movie_ids.npy'), np.asarray(model.cf_movie_ids, dtype=np.int32))
+        np.save(os.path.join(staging, 'cf_user_ids.npy'), np.asarray(model.cf_user_ids, dtype=np.int32))
+    np.save(os.path.join(staging, 'neighbor_idx.npy'), np.ascontiguousarray(model.neighbor_idx, dtype=np.int32))
+    np.save(os.path.join(staging, 'neighbor_scores.npy'), np.ascontiguousarray(model.neighbor_scores, dtype=np.float32))
+    shapes['neighbor_idx'] = list(model.neighbor_idx.shape)
+    if model.title_neighbor_idx is not None:
+        np.save(os.path.join(staging, 'title_neighbor_idx.npy'), np.ascontiguousarray(model.title_neighbor_idx, dtype=np.int32))
+        np.save(os.path.join(staging, 'title_neighbor_scores.npy'), np.ascontiguousarray(model.title_neighbor_scores, dtype=np.float32))
+        shapes['title_neighbor_idx'] = list(model.title_neighbor_idx.shape)
+
+    if model.idf is not None:
+        np.save(os.path.join(staging, 'tfidf_idf.npy'), np.asarray(model.idf, dtype=np.float64))
+    if model.vocabulary is not None:
+        _save_json(staging, 'tfidf_vocabulary.json', {term: int(col) for term, col in model.vocabulary.items()})
+    _save_json(staging, 'indices.json', {str(title): int(pos) for title, pos in model.indices.items()})
+    _save_json(staging, 'movie_to_idx.json', {str(title): int(row) for title, row in model.movie_to_idx.items()})
+
+    _save_json(staging, 'person_names.json', model.person_index.person_names)
+    _save_json(staging, 'genre_names.json', model.person_index.genre_names)
+    for role in PERSON_INDEX_ROLES:
+        shapes[f'person_{role}'] = _save_csr(staging, f'person_{role}', model.person_index.incidence[role])
+
+    model.catalog.reset_index(drop=True).to_pickle(os.path.join(staging, 'catalog.pkl'))
+    if model.mood_df is not None:
+        model.mood_df.reset_index(drop=True).to_pickle(os.path.join(staging, 'mood.pkl'))
+        (model.mood_index or MoodIndex.build(model.mood_df)).save(staging, 'mood_index')
+
+    files = {}
+    for name in sorted(os.listdir(staging)):
+        path = os.path.join(staging, name)
+        files[name] = {'sha256': _sha256(path), 'bytes': os.path.getsize(path)}
+
+    # The version is the build time plus a digest of the contents
+    digest = hashlib.sha256(''.join(f['sha256'] for f in files.values()).encode()).hexdigest()[:10]
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{digest}"
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'shapes': shapes,
+        'params': params or {},
+        'files': files,
+    }
+    _save_json(staging, MANIFEST_FILE, manifest)
+
+    final_dir = os.path.join(root, version)
+    os.replace(staging, final_dir)
+    if make_current:
+        set_current_version(version, root)
+    return version
+
+
+def set_current_version(version, root=DEFAULT_BUNDLE_ROOT):
+    # Atomic pointer update: write a temp file, then rename over CURRENT
+    tmp = os.path.join(root, f'{CURRENT_FILE}.tmp')
+    with open(tmp, 'w') as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+
+
+# ----------------- Loading ----------------------------------------
+
+def current_version(root=DEFAULT_BUNDLE_ROOT):
+    with open(os.path.join(root, CURRENT_FILE)) as f:
+        return f.read().strip()
+
+
+def verify_bundle(path):
+    # Re-hashes every file against the manifest; returns the list of mismatching files
+    manifest = read_manifest(path)
+    return [name for name, meta in manifest['files'].items()
+            if not os.path.exists(os.path.join(path, name)) or _sha256(os.path.join(path, name)) != meta['sha256']]
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _load_csr(path, prefix, shape, mmap_mode):
+    data = np.load(os.path.join(path, f'{prefix}_data.npy'), mmap_mode=mmap_mode)
+    indices = np.load(os.path.join(path, f'{prefix}_indices.npy'), mmap_mode=mmap_mode)
+    indptr = np.load(os.path.join(path, f'{prefix}_indptr.npy'), mmap_mode=mmap_mode)
+    return csr_matrix((data, indices, indptr), shape=tuple(shape), copy=False)
+
+
+def _load_json(path, name):
+    with open(os.path.join(path, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_bundle(root=DEFAULT_BUNDLE_ROOT, version=None, mmap=True, verify=False):
+    version = version or current_version(root)
+    path = os.path.join(root, version)
+    manifest = read_manifest(path)
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported model bundle format {manifest.get('format')} in {path}")
+    if verify:
+        bad = verify_bundle(path)
+        if bad:
+            raise ValueError(f"Model bundle {version} failed hash check: {', '.join(bad)}")
+
+    mmap_mode = 'r' if mmap else None
+    shapes = manifest['shapes']
+
+    idf_path = os.path.join(path, 'tfidf_idf.npy')
+    vocab_path = os.path.join(path, 'tfidf_vocabulary.json')
+    mood_path = os.path.join(path, 'mood.pkl')
+    title_idx_path = os.path.join(path, 'title_neighbor_idx.npy')
+    has_title_table = os.path.exists(title_idx_path)
+    cf_ids_path = os.path.join(path, 'cf_movie_ids.npy')
+    has_cf_ids = os.path.exists(cf_ids_path)
+
+    person_index = None
+    if os.path.exists(os.path.join(path, 'person_names.json')):
+        person_names = _load_json(path, 'person_names.json')
+        genre_names = _load_json(path, 'genre_names.json')
+        person_index = PersonIndex(person_names, genre_names, {
+            role: _load_csr(path, f'person_{role}', shapes[f'person_{role}'], mmap_mode)
+            for role in PERSON_INDEX_ROLES
+        })
+
+    return RecommenderModel(
+        catalog=pd.read_pickle(os.path.join(path, 'catalog.pkl')),
+        tfidf_matrix=_load_csr(path, 'tfidf', shapes['tfidf_matrix'], mmap_mode),
+        indices=pd.Series(_load_json(path, 'indices.json'), dtype='int64'),
+        neighbor_idx=np.load(os.path.join(path, 'neighbor_idx.npy'), mmap_mode=mmap_mode),
+        neighbor_scores=np.load(os.path.join(path, 'neighbor_scores.npy'), mmap_mode=mmap_mode),
+        cf_matrix=_load_csr(path, 'cf', shapes['cf_matrix'], mmap_mode),
+        movie_to_idx=pd.Series(_load_json(path, 'movie_to_idx.json'), dtype='int64'),
+        cf_movie_ids=np.load(cf_ids_path, mmap_mode=mmap_mode) if has_cf_ids else None,
+        cf_user_ids=np.load(os.path.join(path, 'cf_user_ids.npy'), mmap_mode=mmap_mode) if has_cf_ids else None,
+        tfidf_ann=LSHIndex.load(path, 'ann_tfidf', mmap_mode),
+        cf_ann=LSHIndex.load(path, 'ann_cf', mmap_mode),
+        mf=MFModel.load(path, 'mf', mmap_mode),
+        mood_index=MoodIndex.load(path, 'mood_index', mmap_mode),
+        mood_df=pd.read_pickle(mood_path) if os.path.exists(mood_path) else None,
+        vocabulary=_load_json(path, 'tfidf_vocabulary.json') if os.path.exists(vocab_path) else None,
+        idf=np.load(idf_path, mmap_mode=mmap_mode) if os.path.exists(idf_path) else None,
+        person_index=person_index,
+        title_neighbor_idx=np.load(title_idx_path, mmap_mode=mmap_mode) if has_title_table else None,
+        title_neighbor_scores=np.load(os.path.join(path, 'title_neighbor_scores.npy'), mmap_mode=mmap_mode) if has_title_table else None,
+        version=version,
+        path=path,
+        manifest=manifest,
+    )
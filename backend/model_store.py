@@ -0,0 +1,277 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# ----------------- Model Registry -------------------------------
+# Importing this module is cheap: no numpy/pandas/sklearn import, no file access.
+# The model bundle is loaded on the first get_model() call, or up front through
+# warmup() (called from Appt's __main__ block, or from a WSGI server's post-fork hook).
+#
+# The served model is one reference that is replaced, never mutated. A request takes it once
+# (get_model()) and keeps using that object, so requests in flight when a new version is
+# swapped in finish on the old one, which is freed once the last of them returns.
+#
+# reload_async() loads a bundle version (or first runs build_bundle.py in a subprocess) in a
+# background thread, pages in its hot arrays, runs the warmup hooks against it (e.g. the /explore
+# payload) and only then swaps it in. One reload runs at a time; status() reports the active
+# version, its load time and memory, and the last reload. A reload whose starting point was
+# replaced meanwhile (an ingestion published a newer model) is dropped instead of swapped in.
+# In-process updates such as /admin/ingest hold the same lock (exclusive_update()) and publish
+# through publish(), which runs the same page-in and warmup hooks before the swap.
+#
+# MODEL_WATCH_SECONDS > 0 starts a watcher that reloads whenever model_bundle/CURRENT changes,
+# e.g. after build_bundle.py or ingest.py ran on the same machine.
+
+MODEL_WATCH_SECONDS = float(os.getenv('MODEL_WATCH_SECONDS', 0))
+BUILD_TIMEOUT_S = int(os.getenv('MODEL_BUILD_TIMEOUT_S', 6 * 3600))
+
+_model = None
+_lock = threading.Lock()          # first load and swaps
+_reload_lock = threading.Lock()   # one background reload at a time
+_load_seconds = None
+_info = {}                        # details of the active model, see _activate()
+_job = {'state': 'idle'}          # last background reload
+_warmup_hooks = []
+_watcher = None
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                from model_bundle import load_bundle
+
+                start = time.perf_counter()
+                model = load_bundle()
+                _activate(model, time.perf_counter() - start, source='startup')
+    return _model
+
+
+def _activate(model, load_seconds, source):
+    # Swaps the served reference; callers hold _lock or run before any model is served
+    global _model, _load_seconds, _info
+    previous = _info.get('version')
+    _load_seconds = load_seconds
+    _info = {
+        'version': model.version,
+        'path': model.path,
+        'source': source,
+        'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'load_seconds': round(load_seconds, 3),
+        'previous_version': previous,
+        'memory': model_memory(model),
+    }
+    _model = model
+    print(f"Model bundle {model.version} loaded in {load_seconds:.2f}s ({source}).")
+
+
+def set_model(model, source='set_model', load_seconds=0.0):
+    # Serves `model` from now on, as is (no page-in, no warmup hooks; see publish())
+    with _lock:
+        _activate(model, load_seconds, source)
+
+
+def _prepare(model):
+    _page_in(model)
+    for hook in _warmup_hooks:
+        hook(model)
+
+
+def publish(model, source='publish'):
+    # Pages in `model`, runs the warmup hooks against it and serves it from now on
+    # (e.g. after an incremental ingestion wrote a new bundle version)
+    start = time.perf_counter()
+    _prepare(model)
+    set_model(model, source=source, load_seconds=time.perf_counter() - start)
+
+
+@contextmanager
+def exclusive_update():
+    # Yields True while holding the reload lock, so no background reload runs meanwhile;
+    # False (lock not taken) when a reload is already running
+    acquired = _reload_lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _reload_lock.release()
+
+
+def is_loaded():
+    return _model is not None
+
+
+def add_warmup_hook(hook):
+    # hook(model) runs on every newly loaded model before it is swapped in
+    _warmup_hooks.append(hook)
+
+
+def _page_in(model):
+    # Pulls the hot arrays into the page cache before the model serves its first request
+    for arr in (model.neighbor_idx, model.neighbor_scores, model.tfidf_matrix.indptr, model.cf_matrix.indptr):
+        int(arr.sum())
+
+
+def warmup():
+    # Loads the bundle and pulls the hot arrays into the page cache before the first request
+    model = get_model()
+    _page_in(model)
+
+    # Import the request-path libraries now rather than inside the first request
+    import recommender  # noqa: F401
+    if MODEL_WATCH_SECONDS > 0:
+        start_watcher(MODEL_WATCH_SECONDS)
+    return model
+
+
+# --- background reload ---
+
+def _build_bundle(root):
+    # The training pipeline runs in its own process: mrs.py trains at import time, once per interpreter
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    cmd = [sys.executable, os.path.join(backend_dir, 'build_bundle.py'), '--out', root]
+    proc = subprocess.run(cmd, cwd=backend_dir, capture_output=True, text=True, timeout=BUILD_TIMEOUT_S)
+    if proc.returncode != 0:
+        tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+        raise RuntimeError(f"build_bundle.py exited with {proc.returncode}: {' | '.join(tail)}")
+
+
+def _reload(version, build, root):
+    from model_bundle import DEFAULT_BUNDLE_ROOT, current_version, load_bundle
+
+    root = root or DEFAULT_BUNDLE_ROOT
+    started_from = _info.get('version')
+    try:
+        if build:
+            _job['state'] = 'building'
+            _build_bundle(root)
+            version = None  # the build just made its bundle CURRENT
+        _job['state'] = 'loading'
+        version = version or current_version(root)
+        _job['target'] = version
+
+        start = time.perf_counter()
+        model = load_bundle(root, version)
+        _prepare(model)
+        load_seconds = time.perf_counter() - start
+
+        with _lock:
+            served = _info.get('version')
+            if served != started_from:
+                # Something else published a model while this one loaded; keep serving that
+                print(f"[WARNING] Model reload to {version} dropped: {served} was published meanwhile.")
+                _job.update(state='superseded', served=served, finished_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+                return
+            _activate(model, load_seconds, source='build' if build else 'reload')
+        _job.update(state='done', finished_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    except Exception as e:
+        print(f"[ERROR] Model reload failed, still serving {_info.get('version')}: {e}")
+        _job.update(state='failed', error=str(e), finished_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    finally:
+        _reload_lock.release()
+
+
+def reload_async(version=None, build=False, root=None):
+    # Starts a background reload; False if one is already running
+    global _job
+    if not _reload_lock.acquire(blocking=False):
+        return False
+    _job = {'state': 'starting', 'target': version, 'build': build,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    threading.Thread(target=_reload, args=(version, build, root), name='model-reload', daemon=True).start()
+    return True
+
+
+def is_reloading():
+    return _reload_lock.locked()
+
+
+def _watch(interval, root):
+    from model_bundle import DEFAULT_BUNDLE_ROOT, current_version
+
+    root = root or DEFAULT_BUNDLE_ROOT
+    while True:
+        time.sleep(interval)
+        try:
+            version = current_version(root)
+        except OSError:
+            continue
+        if _model is not None and version != _model.version and not is_reloading():
+            reload_async(version, root=root)
+
+
+def start_watcher(interval=MODEL_WATCH_SECONDS, root=None):
+    global _watcher
+    if _watcher is None:
+        _watcher = threading.Thread(target=_watch, args=(interval, root), name='model-watcher', daemon=True)
+        _watcher.start()
+
+
+# --- reporting ---
+
+def _is_mapped(arr):
+    import mmap
+    import numpy as np
+
+    while arr is not None:
+        if isinstance(arr, (np.memmap, mmap.mmap)):
+            return True
+        arr = getattr(arr, 'base', None)
+    return False
+
+
+def model_memory(model):
+    # Bytes held by the model: arrays mapped from the bundle files (shared between workers,
+    # paged in on use) vs. arrays and DataFrames on this process's heap, plus the process RSS
+    import numpy as np
+    import pandas as pd
+    from scipy.sparse import issparse
+
+    seen = set()
+    totals = {'mapped_bytes': 0, 'heap_bytes': 0}
+
+    def add(value, depth=0):
+        if value is None or id(value) in seen or depth > 3:
+            return
+        seen.add(id(value))
+        if isinstance(value, np.ndarray):
+            totals['mapped_bytes' if _is_mapped(value) else 'heap_bytes'] += value.nbytes
+        elif issparse(value):
+            for arr in (value.data, getattr(value, 'indices', None), getattr(value, 'indptr', None)):
+                add(arr, depth + 1)
+        elif isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+            usage = value.memory_usage(deep=True)
+            totals['heap_bytes'] += int(usage.sum() if hasattr(usage, 'sum') else usage)
+        elif isinstance(value, dict):
+            for item in value.values():
+                add(item, depth + 1)
+        elif hasattr(value, '__dict__') and not isinstance(value, type):
+            for item in vars(value).values():
+                add(item, depth + 1)
+
+    for value in vars(model).values():
+        add(value)
+    totals['process_rss_bytes'] = _process_rss()
+    return totals
+
+
+def _process_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, in KiB on Linux
+
+
+def status():
+    # Active version, load time and memory, and the last background reload
+    info = dict(_info)
+    if info:
+        info['memory'] = dict(info['memory'], process_rss_bytes=_process_rss())
+    return {'active': info or None, 'reload': dict(_job), 'reloading': is_reloading()}
@@ -0,0 +1,95 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# ----------------- Per-Mood Ranked Index ------------------------
+# /mood used to filter the mood-labelled catalog and re-sort it on every call. Here the
+# rows of every mood are sorted once per sort key, at build time:
+#
+#   mood_index_order_<key>.npy  int32 row positions into mood_df, grouped by mood, each group sorted
+#   mood_index.json             mood -> [start, stop) of its group (the same for every key)
+#
+#   popularity  popularity, highest first
+#   rating      vote_average, highest first, then popularity
+#   recency     release_date, newest first, then popularity
+#
+# Missing values sort last and remaining ties keep mood_df order, so a page is a slice.
+
+SORT_KEYS = ('popularity', 'rating', 'recency')
+_SORT_COLUMNS = {'popularity': 'popularity', 'rating': 'vote_average', 'recency': 'release_date'}
+
+
+def _sort_values(mood_df, key):
+    # Descending sort key for every row (-inf when missing or the column is absent)
+    column = _SORT_COLUMNS[key]
+    if column not in mood_df.columns:
+        return np.full(len(mood_df), -np.inf)
+    if key == 'recency':
+        dates = pd.to_datetime(mood_df[column], errors='coerce')
+        values = dates.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+        values[dates.isna().to_numpy()] = np.nan
+    else:
+        values = pd.to_numeric(mood_df[column], errors='coerce').to_numpy(dtype=np.float64)
+    return np.nan_to_num(values, nan=-np.inf)
+
+
+class MoodIndex:
+
+    def __init__(self, bounds, orders):
+        self.bounds = {mood: (int(start), int(stop)) for mood, (start, stop) in bounds.items()}
+        self.orders = orders  # sort key -> int32 positions into mood_df
+
+    @classmethod
+    def build(cls, mood_df):
+        moods = mood_df['mood'].astype(str).to_numpy()
+        labels, codes = np.unique(moods, return_inverse=True)
+        popularity = _sort_values(mood_df, 'popularity')
+        positions = np.arange(len(mood_df))
+
+        orders = {}
+        for key in SORT_KEYS:
+            # lexsort: last key is primary -> mood group, then the sort key, then popularity, then row
+            primary = _sort_values(mood_df, key)
+            order = np.lexsort((positions, -popularity, -primary, codes))
+            orders[key] = order.astype(np.int32)
+
+        stops = np.cumsum(np.bincount(codes, minlength=len(labels)))
+        starts = stops - np.bincount(codes, minlength=len(labels))
+        bounds = {label: (start, stop) for label, start, stop in zip(labels, starts, stops)}
+        return cls(bounds, orders)
+
+    def __contains__(self, mood):
+        return mood in self.bounds
+
+    def count(self, mood):
+        start, stop = self.bounds.get(mood, (0, 0))
+        return stop - start
+
+    def page(self, mood, sort='popularity', offset=0, limit=15):
+        # Row positions into mood_df for one page; empty for an unknown mood
+        if sort not in self.orders:
+            raise ValueError(f"Unknown sort key '{sort}', expected one of {', '.join(SORT_KEYS)}")
+        start, stop = self.bounds.get(mood, (0, 0))
+        lo = min(start + max(offset, 0), stop)
+        return self.orders[sort][lo:min(lo + max(limit, 0), stop)]
+
+    # --- persistence ---
+
+    def save(self, out_dir, prefix='mood_index'):
+        for key, order in self.orders.items():
+            np.save(os.path.join(out_dir, f'{prefix}_order_{key}.npy'), np.ascontiguousarray(order, dtype=np.int32))
+        with open(os.path.join(out_dir, f'{prefix}.json'), 'w', encoding='utf-8') as f:
+            json.dump({mood: [start, stop] for mood, (start, stop) in self.bounds.items()}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, prefix='mood_index', mmap_mode='r'):
+        # None if the bundle was built before the index existed
+        bounds_path = os.path.join(path, f'{prefix}.json')
+        if not os.path.exists(bounds_path):
+            return None
+        with open(bounds_path, encoding='utf-8') as f:
+            bounds = json.load(f)
+        orders = {key: np.load(os.path.join(path, f'{prefix}_order_{key}.npy'), mmap_mode=mmap_mode) for key in SORT_KEYS}
+        return cls(bounds, orders)
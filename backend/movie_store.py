@@ -0,0 +1,366 @@
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from catalog_cache import (DEFAULT_CACHE_DIR, DEFAULT_CSV, movies_table, parse_cast, read_columns, read_manifest,
+                           read_list_storage, read_text_storage)
+
+# ----------------- Compact Movie Store --------------------------
+# MOVIE_DATASET of Appt.py, held as columns instead of one dict of ~20 strings per movie:
+#
+#   text        title, overview, ...    one UTF-8 blob + int64 offsets, decoded per access
+#   category    genres, languages,      int32 code per movie into a list of the distinct values
+#               countries
+#   number      popularity, budget, ... float64 (NaN when missing), ints come back as int
+#   flag        adult                   bool
+#   list        cast                    all names as one text column + int64 row offsets
+#
+# Keys are the lowercased, stripped titles (last row wins, as with the dict). store.get(key)
+# returns a MovieRecord, a __slots__ view with the dict's .get(field, default); a missing
+# number counts as an absent field. record.to_dict() gives a fresh dict for JSON responses.
+#
+# Texts keep the exact CSV text (what csv.DictReader gave), read straight from the
+# columnar catalog cache (catalog_cache.py) without creating a string per value.
+#
+#   python movie_store.py            # memory of the store vs. the dict of dicts it replaces
+
+TEXT_FIELDS = ('title', 'release_date', 'original_title', 'overview', 'poster_path', 'tagline', 'directors', 'writers')
+CATEGORY_FIELDS = ('genres', 'spoken_languages', 'production_countries')
+FLOAT_FIELDS = ('popularity', 'vote_average')
+INT_FIELDS = ('runtime', 'revenue', 'budget', 'vote_count')
+FLAG_FIELDS = ('adult',)
+LIST_FIELDS = {'cast': 'cast_list'}  # field -> list column of the cache
+
+# Field order of the dicts load_movie_dataset() used to build
+FIELDS = ('title', 'release_date', 'runtime', 'original_title', 'spoken_languages', 'revenue', 'budget',
+          'production_countries', 'vote_count', 'adult', 'overview', 'poster_path', 'tagline', 'genres',
+          'directors', 'writers', 'cast', 'popularity', 'vote_average')
+
+
+# --- columns ---
+
+class TextColumn:
+    __slots__ = ('blob', 'offsets')
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [str(v).encode('utf-8') for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(v) for v in encoded], out=offsets[1:])
+        return cls(b''.join(encoded), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.blob[self.offsets[row]:self.offsets[row + 1]].decode('utf-8')
+
+    def slice(self, start, stop):
+        return [self[i] for i in range(start, stop)]
+
+    def extended(self, values):
+        other = TextColumn.from_strings('' if v is None else v for v in values)
+        return TextColumn(self.blob + other.blob, np.concatenate([self.offsets, other.offsets[1:] + self.offsets[-1]]))
+
+    @property
+    def nbytes(self):
+        return len(self.blob) + self.offsets.nbytes
+
+
+class CategoryColumn:
+    __slots__ = ('labels', 'codes')
+
+    def __init__(self, labels, codes):
+        self.labels = labels
+        self.codes = codes
+
+    @classmethod
+    def from_strings(cls, values):
+        label_ids = {}
+        codes = np.fromiter((label_ids.setdefault(v, len(label_ids)) for v in values), dtype=np.int32)
+        return cls(list(label_ids), codes)
+
+    def __getitem__(self, row):
+        return self.labels[self.codes[row]]
+
+    def extended(self, values):
+        labels = list(self.labels)
+        label_ids = {label: i for i, label in enumerate(labels)}
+        codes = np.fromiter((label_ids.setdefault('' if v is None else str(v), len(label_ids)) for v in values), dtype=np.int32)
+        labels.extend(list(label_ids)[len(labels):])
+        return CategoryColumn(labels, np.concatenate([self.codes, codes]))
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(sys.getsizeof(label) for label in self.labels)
+
+
+class NumberColumn:
+    __slots__ = ('values', 'integer')
+
+    def __init__(self, values, integer=False):
+        self.values = values
+        self.integer = integer
+
+    def __getitem__(self, row):
+        value = self.values[row]
+        if np.isnan(value):
+            return None
+        return int(value) if self.integer else float(value)
+
+    def extended(self, values):
+        return NumberColumn(np.concatenate([self.values, _parse_numbers(values)]), self.integer)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+
+class FlagColumn:
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+    def __getitem__(self, row):
+        return bool(self.values[row])
+
+    def extended(self, values):
+        return FlagColumn(np.concatenate([self.values, _parse_flags(values)]))
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+
+class ListColumn:
+    __slots__ = ('items', 'rows')
+
+    def __init__(self, items, rows):
+        self.items = items
+        self.rows = rows
+
+    def __getitem__(self, row):
+        return self.items.slice(self.rows[row], self.rows[row + 1])
+
+    def extended(self, values):
+        lists = [v if isinstance(v, list) else parse_cast('' if v is None else v) for v in values]
+        counts = np.cumsum([len(items) for items in lists], dtype=np.int64)
+        return ListColumn(self.items.extended(item for items in lists for item in items),
+                          np.concatenate([self.rows, counts + self.rows[-1]]))
+
+    @property
+    def nbytes(self):
+        return self.items.nbytes + self.rows.nbytes
+
+
+# --- records ---
+
+class MovieRecord:
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def get(self, field, default=None):
+        column = self.store.columns.get(field)
+        if column is None:
+            return default
+        value = column[self.row]
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        value = self.get(field)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __contains__(self, field):
+        return self.get(field) is not None
+
+    def keys(self):
+        return [field for field in self.store.columns if field in self]
+
+    def to_dict(self):
+        return {field: column[self.row] for field, column in self.store.columns.items()}
+
+    def __repr__(self):
+        return f"MovieRecord({self.get('title', '')!r})"
+
+
+# --- store ---
+
+def _parse_numbers(values):
+    # Parse what parses, NaN otherwise
+    return pd.to_numeric(pd.Series(list(values), dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _parse_flags(values):
+    values = list(values)
+    return np.fromiter((str(v).strip().lower() in ('true', '1') for v in values), dtype=bool, count=len(values))
+
+
+def _numbers(table_dir, kinds, name):
+    if kinds.get(name) == 'numeric':
+        return np.asarray(read_columns(table_dir, [name])[name], dtype=np.float64)
+    # Text in the CSV (or absent)
+    return _parse_numbers(read_columns(table_dir, [name], raw=True, missing='')[name] if name in kinds else [])
+
+
+def _flags(table_dir, kinds, name):
+    if kinds.get(name) == 'numeric':
+        return np.asarray(read_columns(table_dir, [name])[name], dtype=bool)
+    return _parse_flags(read_columns(table_dir, [name], raw=True, missing='')[name] if name in kinds else [])
+
+
+class MovieStore:
+
+    def __init__(self, columns, rows_by_key):
+        self.columns = columns          # field -> column, in FIELDS order
+        self.rows_by_key = rows_by_key  # lowercased title -> row
+
+    @classmethod
+    def from_cache(cls, table_dir):
+        manifest = read_manifest(table_dir)
+        if manifest is None:
+            raise FileNotFoundError(f"No catalog cache table in '{table_dir}'")
+        kinds = {c['name']: c['kind'] for c in manifest['columns']}
+        rows = manifest['rows']
+
+        def text(name):
+            if name not in kinds:
+                return TextColumn(b'', np.zeros(rows + 1, dtype=np.int64))
+            return TextColumn(*read_text_storage(table_dir, name, raw=True))
+
+        columns = {}
+        for field in FIELDS:
+            if field in TEXT_FIELDS:
+                columns[field] = text(field)
+            elif field in CATEGORY_FIELDS:
+                strings = text(field)
+                columns[field] = CategoryColumn.from_strings(strings[i] for i in range(rows))
+            elif field in FLOAT_FIELDS or field in INT_FIELDS:
+                values = _numbers(table_dir, kinds, field)
+                columns[field] = NumberColumn(values if len(values) else np.full(rows, np.nan), field in INT_FIELDS)
+            elif field in FLAG_FIELDS:
+                values = _flags(table_dir, kinds, field)
+                columns[field] = FlagColumn(values if len(values) else np.zeros(rows, dtype=bool))
+            elif LIST_FIELDS.get(field) in kinds:
+                blob, offsets, item_rows = read_list_storage(table_dir, LIST_FIELDS[field])
+                columns[field] = ListColumn(TextColumn(blob, offsets), item_rows)
+
+        rows_by_key = {}
+        for row, title in enumerate(columns['title'].slice(0, rows)):
+            rows_by_key[title.strip().lower()] = row
+        return cls(columns, rows_by_key)
+
+    def extended(self, movies):
+        # A new store with `movies` (dicts of CSV fields, e.g. just ingested) appended; the
+        # columns are concatenated, so existing records keep reading the old store
+        columns = {field: column.extended([movie.get(field) for movie in movies])
+                   for field, column in self.columns.items()}
+        rows_by_key = dict(self.rows_by_key)
+        first = len(self.columns['title'])
+        for row, movie in enumerate(movies, start=first):
+            rows_by_key[str(movie.get('title') or '').strip().lower()] = row
+        return MovieStore(columns, rows_by_key)
+
+    @classmethod
+    def from_csv(cls, csv_path=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR):
+        return cls.from_cache(movies_table(csv_path, cache_dir))
+
+    # --- mapping interface (what Appt.py used of the dict) ---
+
+    def get(self, key, default=None):
+        row = self.rows_by_key.get(key)
+        return default if row is None else MovieRecord(self, row)
+
+    def __getitem__(self, key):
+        return MovieRecord(self, self.rows_by_key[key])
+
+    def __contains__(self, key):
+        return key in self.rows_by_key
+
+    def __len__(self):
+        return len(self.rows_by_key)
+
+    def __iter__(self):
+        return iter(self.rows_by_key)
+
+    def keys(self):
+        return self.rows_by_key.keys()
+
+    def items(self):
+        for key, row in self.rows_by_key.items():
+            yield key, MovieRecord(self, row)
+
+    @property
+    def nbytes(self):
+        # Column storage only; rows_by_key is shared with what the title index needs anyway
+        return sum(column.nbytes for column in self.columns.values())
+
+
+# ----------------- Memory Comparison ------------------------------
+
+def build_dict_dataset(table_dir):
+    # The dict of dicts load_movie_dataset() used to build, from the same cache
+    columns = read_columns(table_dir, raw=True, missing='')
+    dataset = {}
+    for i, title in enumerate(columns['title']):
+        movie = {}
+        for field in FIELDS:
+            source = LIST_FIELDS.get(field, field)
+            default = 0 if field in FLOAT_FIELDS else ''
+            movie[field] = columns[source][i] if source in columns else default
+        dataset[title.strip().lower()] = movie
+    return dataset
+
+
+def _traced(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the memory of MovieStore with the dict of dicts.')
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    table_dir = movies_table(args.csv, args.cache_dir)
+    dataset, dict_bytes, dict_s = _traced(lambda: build_dict_dataset(table_dir))
+    store, store_bytes, store_s = _traced(lambda: MovieStore.from_cache(table_dir))
+
+    mismatches = 0
+    for key, movie in dataset.items():
+        record = store[key].to_dict()
+        for field in ('title', 'overview', 'genres', 'poster_path', 'cast', 'spoken_languages'):
+            mismatches += movie[field] != record[field]
+    print(f"movies: {len(store)}")
+    print(f"dict of dicts: {dict_bytes / 2**20:.1f} MiB in {dict_s:.2f}s")
+    print(f"MovieStore:    {store_bytes / 2**20:.1f} MiB in {store_s:.2f}s "
+          f"(columns {store.nbytes / 2**20:.1f} MiB, {dict_bytes / max(store_bytes, 1):.1f}x smaller)")
+    print(f"mismatching text fields: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
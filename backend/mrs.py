@@ -7,12 +7,29 @@ Original file is located at
     https://colab.research.google.com/drive/1mSLWk_Lde5smnbmfiZ1-s3eawu7RQKoX
 """
 
+import os
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import linear_kernel
-
-# Load dataset
-df = pd.read_csv("TMDB_IMDB_movies.csv")
+from neighbors import build_topk_neighbors, matrix_fingerprint, save_neighbors, NEIGHBORS_FILE, DEFAULT_K
+from title_similarity import build_title_neighbors, DEFAULT_TITLE_K
+from ann_index import LSHIndex, ANN_MIN_ROWS, DEFAULT_TABLES, DEFAULT_BITS
+from mf_engine import MFModel, DEFAULT_FACTORS, DEFAULT_REG, DEFAULT_ITERATIONS
+from model_bundle import RecommenderModel
+from mood_index import MoodIndex
+from feature_builder import build_features, catalog_rows
+from catalog_cache import load_movies, save_processed
+from recommender import (get_title_similar_movies, get_movies_with_similar_genre, get_movies_by_same_director,
+                         get_movies_with_same_cast, get_movies_by_same_writer, remove_duplicates,
+                         get_tfidf_similar_movies, clean_movie_title, fuzzy_matching, clean_collaborative_output,
+                         get_collaborative_recommendations, hybrid_recommendation, recommend_by_mood)
+
+# This file is the offline training pipeline (run through build_bundle.py); the API never imports it.
+# Set MRS_SHOW_EXAMPLES=1 to print the sample rows and recommendations from the notebook.
+SHOW_EXAMPLES = os.getenv('MRS_SHOW_EXAMPLES') == '1'
+
+# Load dataset (columnar cache of the CSV, converted on the first run after a data release)
+df = load_movies("TMDB_IMDB_movies.csv")
 
 # test = pd.read_csv("TMDB_IMDB_movies.csv")
 # test.shape
@@ -21,8 +38,8 @@ df = pd.read_csv("TMDB_IMDB_movies.csv")
 df['popularity'] = pd.to_numeric(df['popularity'], errors='coerce')
 df.dropna(subset=['popularity'], inplace=True)
 
-# Filter movies based on your conditions
-df = df[(df['popularity'] >= 10) & (df['vote_average'] >= 6.5) & (df['vote_count'] >= 100)]
+# Filter movies based on your conditions (thresholds in feature_builder.py, shared with ingest.py)
+df = catalog_rows(df)
 
 df.shape
 
@@ -35,144 +52,43 @@ df = df.drop_duplicates(subset='title', keep='first')
 for feature in ['id', 'title', 'genres', 'directors', 'writers', 'cast', 'overview', 'keywords']:
     df[feature] = df[feature].fillna('')
 
-def format_and_limit_names(title_names):
-    # Split names by commas
-    title_list = title_names.split(',')
-
-    # Format each name to camel case (remove spaces between first and last name)
-    formatted_title_list = [name.strip().replace(' ', '') for name in title_list]
-
-    # Join the names with a space
-    return ' '.join(formatted_title_list)
-
-df['formatted_title'] = df['title'].apply(format_and_limit_names)
-
-df['formatted_title'] = df['formatted_title'].str.lower().str.strip()
-
-# movie_title = "Pride & Prejudice"  # make sure it's lowercase and stripped
-# movie_row = df[df['formatted_title'] == movie_title]
-
-# if not movie_row.empty:
-#     print("Title found:", movie_row['title'].values[0])
-# else:
-#     print("Movie not found.")
-
-movie_title = "Pride & Prejudice"
-movie_row = df[df['title'] == movie_title]
-print("Title:", movie_row['formatted_title'].values[0])
-
-df.head(1)
-
-def format_and_limit_names(cast_names, limit=2):
-    # Split names by commas
-    cast_list = cast_names.split(',')
-
-    # Format each name to camel case (remove spaces between first and last name)
-    formatted_cast_list = [name.strip().replace(' ', '') for name in cast_list]
-
-    # Limit to the first 3 to 5 names (you can adjust this as needed)
-    formatted_cast_list = formatted_cast_list[:limit]
+# formatted_title / _directors / _writers / _cast / _genres, cleaned keywords and overview, and
+# combined_features, all built with column-wise string operations (see feature_builder.py)
+build_features(df)
 
-    # Join the names with a space
-    return ' '.join(formatted_cast_list)
-
-# Apply the function to 'directors', 'writers', and 'cast' columns
-df['formatted_directors'] = df['directors'].apply(format_and_limit_names).str.lower()
-df['formatted_writers'] = df['writers'].apply(format_and_limit_names).str.lower()
-df['formatted_cast'] = df['cast'].apply(format_and_limit_names).str.lower()
+if SHOW_EXAMPLES:
+    movie_title = "Pride & Prejudice"
+    movie_row = df[df['title'] == movie_title]
+    print("Title:", movie_row['formatted_title'].values[0])
 
+    movie_title = "Snowpiercer"
+    movie_row = df[df['title'] == movie_title]
+    print("Directors:", movie_row['formatted_directors'].values[0])
+    print("Writers:", movie_row['formatted_writers'].values[0])
+    print("Cast:", movie_row['formatted_cast'].values[0])
 
 # Check the result for a specific movie
-movie_title = "Snowpiercer"
-movie_row = df[df['title'] == movie_title]
-print("Directors:", movie_row['formatted_directors'].values[0])
-print("Writers:", movie_row['formatted_writers'].values[0])
-print("Cast:", movie_row['formatted_cast'].values[0])
-
-# def format_and_limit_keywords(keywords, limit=5):
-#     # Split keywords by commas
-#     keyword_list = keywords.split(',')
-
-#     # Strip any unnecessary spaces around each keyword
-#     formatted_keyword_list = [keyword.strip().replace(' ', '') for keyword in keyword_list]
-
-#     # Limit to the first 3 to 5 keywords
-#     formatted_keyword_list = formatted_keyword_list[:limit]
-
-#     # Join the keywords with a space
-#     return ' '.join(formatted_keyword_list)
-
-# # Apply the function to the 'keywords' column
-# df['formatted_keywords'] = df['keywords'].apply(format_and_limit_keywords)
-
-# # Check the result for a specific movie
-# # movie_title = "Pride & Prejudice"
-# # movie_row = df[df['title'] == movie_title]
-# # # print("Keywords:", movie_row['formatted_keywords'].values[0])
-
-def format_and_limit_genres(genres_string, limit=3):
-    # Split genres by commas
-    genres_list = genres_string.split(',')
-
-    # Format each genre (remove spaces inside if you want compactness)
-    formatted_genres_list = [genre.strip().replace(' ', '') for genre in genres_list]
-
-    # Limit to first 'limit' genres
-    formatted_genres_list = formatted_genres_list[:limit]
-
-    # Join the genres with a space
-    return ' '.join(formatted_genres_list)
-
-df['formatted_genres'] = df['genres'].apply(format_and_limit_genres).str.lower()
-
-# Check the result for a specific movie
-# movie_title = "Pride & Prejudice"
-# movie_row = df[df['title'] == movie_title]
-# print("Genres:", movie_row['formatted_genres'].values[0])
-
-for feature in ['keywords', 'overview']:
-    df[feature] = df[feature].fillna('').str.lower().str.replace(r'[^\w\s]', '', regex=True)
-
-df.head(1)
-
-def create_combined_features(row):
-    return (
-        str(row['formatted_title']) + " " +
-        str(row['formatted_cast']) + " " +
-        str(row['formatted_directors']) + " " +
-        str(row['formatted_writers']) + " " +
-        str(row['formatted_genres']) + " " +
-        str(row['overview']) + " " +
-        str(row['keywords'])
-    )
-
-df['combined_features'] = df.apply(create_combined_features, axis=1)
-
-# Check the result for a specific movie
-movie_title = "Pride & Prejudice"
-movie_row = df[df['title'] == movie_title]
-print("combined_features:", movie_row['combined_features'].values[0])
+if SHOW_EXAMPLES:
+    movie_title = "Pride & Prejudice"
+    movie_row = df[df['title'] == movie_title]
+    print("combined_features:", movie_row['combined_features'].values[0])
 
 import nltk
-import re
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-
-nltk.download('stopwords')
-nltk.download('wordnet')
+from text_clean import iter_clean_texts
 
-stop_words = set(stopwords.words('english'))
-lemmatizer = WordNetLemmatizer()
+def ensure_nltk_data(*resources):
+    # Only hits the network when a corpus is missing locally
+    for path, package in resources:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(package, quiet=True)
 
-def clean_text(text):
-    if pd.isna(text):
-        return ''
-    text = re.sub(r'[^a-zA-Z]', ' ', text.lower())
-    words = text.split()
-    words = [lemmatizer.lemmatize(word) for word in words if word not in stop_words]
-    return ' '.join(words)
+ensure_nltk_data(('corpora/stopwords', 'stopwords'), ('corpora/wordnet', 'wordnet'))
 
-df['combined_features'] = df['combined_features'].apply(clean_text)
+# Stopword removal + WordNet lemmas, sharded over CLEAN_N_JOBS processes with one lemma per
+# distinct word (see text_clean.py); rows come back in order, identical to the per-row apply
+df['combined_features'] = list(iter_clean_texts(df['combined_features']))
 
 df.head(1)
 
@@ -201,7 +117,8 @@ req_col = ['id',
                     'overview',
                     'combined_features',
                     'popularity',
-                    'vote_average']
+                    'vote_average',
+                    'release_date']
 
 # Create a new dataframe with only these columns
 n_df = df[req_col].copy()
@@ -222,6 +139,7 @@ n_df['title_lower'] = n_df['title'].str.lower()
 new_df.head(3)
 
 new_df.to_csv('processed_movies_dataset.csv', index=False)
+save_processed(new_df)  # same table in the columnar cache, read by watchlost_test.py
 
 new_df.shape
 
@@ -233,77 +151,26 @@ new_df.head(1)
 tfidf = TfidfVectorizer(max_features=5000, stop_words='english')
 tfidf_matrix = tfidf.fit_transform(new_df['tags'])  # 'tags' contains combined features
 
-# Compute similarity matrix
-sim_matrix = linear_kernel(tfidf_matrix, tfidf_matrix)
-
-from difflib import SequenceMatcher
-
-# Title Similarity (Updated to handle case-insensitivity)
-def get_title_similar_movies(title, new_df, top_n=5):
-    # Convert the input title to lowercase for comparison
-    title = title.lower()
+# Precompute every movie's top-K TF-IDF neighbors. This is rebuilt on every refit of the
+# vectorizer above and saved next to the processed dataset, tagged with the matrix fingerprint.
+# The similarity is computed in row blocks under SIM_MAX_MEMORY_MB (across SIM_N_JOBS cores),
+# so the dense N x N similarity matrix is never built.
+NEIGHBOR_K = int(os.getenv('TFIDF_NEIGHBOR_K', DEFAULT_K))
+tfidf_neighbor_idx, tfidf_neighbor_scores = build_topk_neighbors(tfidf_matrix, k=NEIGHBOR_K)
+save_neighbors(NEIGHBORS_FILE, tfidf_neighbor_idx, tfidf_neighbor_scores, matrix_fingerprint(tfidf_matrix))
 
-    # Apply case-insensitive comparison
-    new_df['title_score'] = new_df['title'].apply(lambda x: SequenceMatcher(None, title, x.lower()).ratio())
-    top_titles = new_df.sort_values(by='title_score', ascending=False)
+# Top-K similar titles per movie: char n-gram candidates re-scored with SequenceMatcher
+title_neighbor_idx, title_neighbor_scores = build_title_neighbors(new_df['title'], k=DEFAULT_TITLE_K)
 
-    return top_titles[['title']].head(top_n).assign(reason='Similar Title')
-
-# Genre Matching (Ensure no case sensitivity issue)
-def get_movies_with_similar_genre(title, new_df, top_n=10):
-    # Get the genre of the input title (case-insensitive)
-    target_genres = new_df[new_df['title'].str.lower() == title.lower()]['genres'].values[0]
-    genre_match = new_df[new_df['genres'] == target_genres]
-    return genre_match[['title']].drop_duplicates().head(top_n).assign(reason='Same Genre')
-
-# Same Director (Handle case insensitivity)
-def get_movies_by_same_director(title, new_df, top_n=10):
-    # Get the director name for the input title
-    director = new_df[new_df['title'].str.lower() == title.lower()]['directors'].values[0]
-    same_director = new_df[new_df['directors'] == director]
-    return same_director[['title']].drop_duplicates().head(top_n).assign(reason='Same Director')
-
-# Same Cast (Handle case insensitivity)
-def get_movies_with_same_cast(title, new_df, top_n=10):
-    # Get the cast for the input title
-    target_cast = set(new_df[new_df['title'].str.lower() == title.lower()]['cast'].values[0].split(", "))
-
-    def cast_overlap(cast):
-        return len(target_cast.intersection(set(cast.split(", "))))
-
-    new_df['cast_score'] = new_df['cast'].apply(cast_overlap)
-    return new_df.sort_values(by='cast_score', ascending=False)[['title']].head(top_n).assign(reason='Similar Cast')
-
-# Same Writer (Handle case insensitivity)
-def get_movies_by_same_writer(title, new_df, top_n=10):
-    writer = new_df[new_df['title'].str.lower() == title.lower()]['writers'].values[0]
-    same_writer = new_df[new_df['writers'] == writer]
-    return same_writer[['title']].drop_duplicates().head(top_n).assign(reason='Same Writer')
-
-# Remove duplicates
-def remove_duplicates(df, movie_title):
-    df = df[df['title'] != movie_title]
-    return df.drop_duplicates(subset='title')
-
-indices = pd.Series(df.index, index=df['title'])
-
-def get_tfidf_similar_movies(title, df, tfidf_matrix, indices, top_n=10):
-    if title not in indices:
-        return pd.DataFrame(columns=['title', 'reason'])  # empty if title not found
-
-    idx = indices[title]
-    cosine_sim = linear_kernel(tfidf_matrix[idx], tfidf_matrix).flatten()
-    sim_scores = list(enumerate(cosine_sim))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)[1:top_n+1]
-    movie_indices = [i[0] for i in sim_scores]
-
-    return df.iloc[movie_indices][['title']].assign(reason='Same Genre')
+# Row positions in tfidf_matrix (df keeps its original CSV labels after filtering)
+indices = pd.Series(range(len(df)), index=df['title'])
 
 def hybrid_recommend(title, new_df):
     part1 = get_movies_with_same_cast(title, new_df, top_n=10)  # Increase top_n here
     part2 = get_movies_by_same_director(title, new_df, top_n=10)
     part3 = get_movies_with_similar_genre(title, new_df, top_n=10)
-    part4 = get_tfidf_similar_movies(title, df, tfidf_matrix, indices)
+    part4 = get_tfidf_similar_movies(title, df, tfidf_matrix, indices,
+                                     neighbor_idx=tfidf_neighbor_idx)
     part5 = get_movies_by_same_writer(title, new_df, top_n=10)
     part6 = get_title_similar_movies(title, new_df, top_n=5)
 
@@ -318,210 +185,91 @@ def hybrid_recommend(title, new_df):
     # Return top 45 unique movies
     return clean.head(45)
 
-recommendations = hybrid_recommend("Snowpiercer", df)
-print(recommendations.to_string(index=False))
+if SHOW_EXAMPLES:
+    recommendations = hybrid_recommend("Snowpiercer", df)
+    print(recommendations.to_string(index=False))
 
 """Collaborative Filtering"""
 
 import numpy as np
 from sklearn.neighbors import NearestNeighbors
 from scipy.sparse import csr_matrix
-from fuzzywuzzy import process
 import pandas as pd
 import re
 
-# Step 1: Load your ratings data
-ratings_df = pd.read_csv('ratings.csv')
-
 movies_df = pd.read_csv('movies.csv')  # The movies dataset
 
-# Define the title cleaning function
-def clean_movie_title(title):
-    # Move articles like ", The" to the front and remove year
-    match = re.match(r"(.+),\s(The|An|A)\s*\((\d{4})\)", title)
-    if match:
-        title_cleaned = f"{match.group(2)} {match.group(1)}"
-    else:
-        # Remove year in parentheses
-        title_cleaned = re.sub(r"\s*\(\d{4}\)", "", title)
-
-        # Handle "Title, The" format without year
-        article_match = re.match(r"(.+),\s(The|An|A|La)$", title_cleaned)
-        if article_match:
-            title_cleaned = f"{article_match.group(2)} {article_match.group(1)}"
-
-    return title_cleaned.strip()
-
 # Apply the cleaning function
 movies_df['title'] = movies_df['title'].apply(clean_movie_title)
 
 # Optional: Remove duplicates based on cleaned titles
 movies_df = movies_df.drop_duplicates(subset='title')
 
-# Save back to the same CSV (or choose a new name like 'movies_cleaned.csv')
-movies_df.to_csv('movies.csv', index=False)
+# Save to a separate file so the raw MovieLens movies.csv is never rewritten in place
+movies_df.to_csv('movies_cleaned.csv', index=False)
 
-print("🎉 Movie titles cleaned and saved to movies.csv!")
+if SHOW_EXAMPLES:
+    print("🎉 Movie titles cleaned and saved to movies_cleaned.csv!")
 
-print(movies_df.shape)
+    print(movies_df.shape)
 movies_df.head(2)
 
-ratings_df = ratings_df.drop('timestamp', axis=1)
-
-ratings_df.head(2)
-
-# Step 1: Filter the ratings dataset
-
-# Keep only users who rated at least 100 movies
-user_counts = ratings_df['userId'].value_counts()
-active_users = user_counts[user_counts >= 100].index
-ratings_df = ratings_df[ratings_df['userId'].isin(active_users)]
-
-# Keep only movies that received at least 500 ratings
-movie_counts = ratings_df['movieId'].value_counts()
-popular_movies = movie_counts[movie_counts >= 500].index
-ratings_df = ratings_df[ratings_df['movieId'].isin(popular_movies)]
-
-ratings_df.head(1)
-
-ratings_df[ratings_df['userId'] == 2].shape[0]
-
-# Step 2: Optionally, sample a fraction of the data (e.g., 20% of the data)
-ratings_df = ratings_df.sample(frac=0.20, random_state=42)
-
-ratings_df.shape
-
-ratings_df.head(1)
-
-# Filter the row with movieId 89745
-movie_row = movies_df[movies_df['movieId'] == 8533]
-
-# Display the row
-print(movie_row)
-
-# #I noticed that a movie name which should have been The Avenger (2012) is written as Avengers,The (2012)
-# #hence I am manually changing it and storing it to the original dataset.
-
-# # Find the row where movieId is 89745 and update the title
-# movies_df.loc[movies_df['movieId'] == 89745, 'title'] = 'The Avengers (2012)'
-
-# # Save the updated dataframe to the same CSV file
-# movies_df.to_csv('movies.csv', index=False)
-
-links_df=pd.read_csv('links.csv')
-
-links_df.head(1)
-
-# Merge on 'movieId'
-merged_df = pd.merge(ratings_df, movies_df, on='movieId')
-
-movie_links_merged = pd.merge(merged_df, links_df, on='movieId', how='left')
-
-movies_df.head(1)
-
-# # Creating a shallow copy of df
-# df_copy = df.copy()
-
-# df_copy.rename(columns={'id': 'tmdbId'}, inplace=True)
+# Filter the ratings dataset
 
-# # Merge on tmdbId from step1 and id from tmdb
-# Hybrid_df = pd.merge(movie_links_merged, df_copy, on='tmdbId', how='left')
+# CF_ENGINE=knn (default): sparse cosine kNN, which only scales on a heavily reduced matrix.
+# CF_ENGINE=mf: ALS embeddings (mf_engine.py), trained on far more of the ratings.
+CF_ENGINE = os.getenv('CF_ENGINE', 'knn')
+MIN_USER_RATINGS = 100 if CF_ENGINE == 'knn' else 5
+MIN_MOVIE_RATINGS = 500 if CF_ENGINE == 'knn' else 20
 
-# Hybrid_df.head(5)
+if SHOW_EXAMPLES:
+    # Filter the row with movieId 89745
+    movie_row = movies_df[movies_df['movieId'] == 8533]
 
-# final_hybrid_df = Hybrid_df[[
-#     'userId', 'movieId', 'rating', 'title_y', 'tmdbId',
-#     'overview', 'genres', 'directors', 'cast', 'writers', 'production_companies', 'tagline',
-#     'vote_average', 'vote_count', 'runtime', 'adult', 'release_date', 'poster_path'
-# ]]
+    # Display the row
+    print(movie_row)
 
-# # Optional: rename columns for clarity
-# final_hybrid_df = final_hybrid_df.rename(columns={
-#     'title_y': 'title'
-# })
+from cf_index import stream_ratings_matrix
 
-ratings_df.head(1)
+# ratings.csv is streamed in chunks (int32 ids, float32 ratings, no timestamp) and never held as a
+# DataFrame: users with at least MIN_USER_RATINGS ratings, then movies with at least
+# MIN_MOVIE_RATINGS ratings from them, then a 20% sample for kNN, then only movies in movies_df.
+# Rows / columns are contiguous positions of the movies / users that have ratings, not the raw
+# MovieLens ids, so the matrix has no empty rows for kneighbors to score (see cf_index.py)
+movie_user_mat_sparse, cf_movies, cf_users = stream_ratings_matrix(
+    'ratings.csv', min_user_ratings=MIN_USER_RATINGS, min_movie_ratings=MIN_MOVIE_RATINGS,
+    sample_frac=0.20 if CF_ENGINE == 'knn' else None, seed=42, movie_ids=movies_df['movieId'].to_numpy())
 
-#final_hybrid_df.head(1)
-
-merged_df.sort_values(by=['userId', 'rating'], ascending=[True, True], inplace=True)
-
-merged_df.head(5)
-
-# Remove duplicates based on all columns
-merged_df = merged_df.drop_duplicates()
-
-# If you want to remove duplicates based on specific columns (e.g., userId and movieId)
-# merged_df_no_duplicates = merged_df.drop_duplicates(subset=['userId', 'movieId'])
-
-# Preview the first few rows
-merged_df.head()
-
-merged_df.shape
-
-from scipy.sparse import csr_matrix
-
-movie_user_mat_sparse = csr_matrix((merged_df['rating'], (merged_df['movieId'], merged_df['userId'])))
+if SHOW_EXAMPLES:
+    print(f"CF matrix: {movie_user_mat_sparse.shape[0]} movies x {movie_user_mat_sparse.shape[1]} users, "
+          f"{movie_user_mat_sparse.nnz} ratings")
 
 model_knn = NearestNeighbors(metric='cosine', algorithm='brute')
 model_knn.fit(movie_user_mat_sparse)
 
-#Step 5: Create a mapping of movie titles to indices
-# Create a dictionary to map movie titles to their movieId
-movie_to_idx = pd.Series(merged_df.movieId.values, index=merged_df.title).drop_duplicates()
-
-#Step 6: Define a fuzzy matching function to get the closest movie title match
-# Define fuzzy matching function
-def fuzzy_matching(mapper, fav_movie):
-    match = process.extractOne(fav_movie, mapper.index)
-    if match:
-        return mapper[match[0]]
-    else:
-        return None
-
-# Function to clean up collaborative filtering output from merged_df
-def clean_collaborative_output(merged_df):
-    # Keep only title column and add a reason column
-    merged_df = merged_df[['title']].copy()
-    merged_df['reason'] = 'Collaborative Filtering'
-    return merged_df
-
-#Step 7: Make Recommendations
-# Define the collaborative recommendation function
-def get_collaborative_recommendations(model_knn, data, mapper, fav_movie, n_recommendations):
-    idx = fuzzy_matching(mapper, fav_movie)
-    if idx is None:
-        return pd.DataFrame(columns=['title', 'reason'])
+# Latent factors over the same rows, served instead of model_knn (see mf_engine.py)
+mf_model = MFModel.train(movie_user_mat_sparse, verbose=SHOW_EXAMPLES) if CF_ENGINE == 'mf' else None
 
-    distances, indices = model_knn.kneighbors(data[idx], n_neighbors=n_recommendations + 1)
-
-    reverse_mapper = {v: k for k, v in mapper.items()}
-
-    recommendations = []
-    for i in range(1, len(distances.flatten())):  # skip the first item (itself)
-        movie_id = indices.flatten()[i]
-        movie_title = reverse_mapper.get(movie_id)
-        if movie_title:
-            cleaned_title = clean_movie_title(movie_title)
-            recommendations.append({'title': cleaned_title, 'reason': 'Others also watched these'})
-
-    # Convert recommendations to DataFrame and return
-    return pd.DataFrame(recommendations)
+#Step 5: Create a mapping of movie titles to indices
+# Create a dictionary to map movie titles to their CF matrix row
+movie_titles = movies_df.set_index('movieId')['title']
+movie_to_idx = pd.Series(np.arange(len(cf_movies)), index=movie_titles.loc[cf_movies.ids].values).drop_duplicates()
 
-# Sample test
-query_movie = "Pride & Prejudice"  # Your query movie title
-recommendations = get_collaborative_recommendations(model_knn, movie_user_mat_sparse, movie_to_idx, query_movie, 10)
+if SHOW_EXAMPLES:
+    # Sample test
+    query_movie = "Pride & Prejudice"  # Your query movie title
+    recommendations = get_collaborative_recommendations(model_knn, movie_user_mat_sparse, movie_to_idx, query_movie, 10)
 
-# Set width for the columns for better alignment
-title_width = 30 # Set the width for the movie titles column
-reason_width = 20  # Set the width for the reason column
+    # Set width for the columns for better alignment
+    title_width = 30 # Set the width for the movie titles column
+    reason_width = 20  # Set the width for the reason column
 
-# Print headers with the appropriate alignment
-print(f"{'title'.rjust(title_width)}        {'reason'.rjust(reason_width)}")
+    # Print headers with the appropriate alignment
+    print(f"{'title'.rjust(title_width)}        {'reason'.rjust(reason_width)}")
 
-# Print each recommendation
-for index, row in recommendations.iterrows():
-    print(f"{row['title'].rjust(title_width)}   {row['reason'].rjust(reason_width)}")
+    # Print each recommendation
+    for index, row in recommendations.iterrows():
+        print(f"{row['title'].rjust(title_width)}   {row['reason'].rjust(reason_width)}")
 
 """Forming the final dataset"""
 
@@ -535,39 +283,41 @@ for index, row in recommendations.iterrows():
 
 """Hybrid Recommendation"""
 
-def hybrid_recommendation(title, content_df, tfidf_matrix, indices, model_knn, movie_user_mat_sparse, movie_to_idx, top_n=50):
-    # --- Content-Based Parts ---
-    part1 = get_movies_with_same_cast(title, content_df, top_n=10)
-    part2 = get_movies_by_same_director(title, content_df, top_n=10)
-    part3 = get_movies_with_similar_genre(title, content_df, top_n=10)
-    part4 = get_tfidf_similar_movies(title, df, tfidf_matrix, indices, top_n=10)
-    part5 = get_movies_by_same_writer(title, content_df, top_n=10)
-    part6 = get_title_similar_movies(title, content_df, top_n=5)
-
-    # Combine all content-based recommendations
-    content_based_df = pd.concat([part1, part2, part3, part4, part5, part6], ignore_index=True)
-
-    # --- Collaborative Part ---
-    collab_df = get_collaborative_recommendations(model_knn, movie_user_mat_sparse, movie_to_idx, title, n_recommendations=10)
-
-    # --- Combine both ---
-    all_recs = pd.concat([content_based_df, collab_df], ignore_index=True)
-
-    # --- Clean Up ---
-    all_recs = all_recs[all_recs['title'].str.lower() != title.lower()]  # remove the queried title
-    all_recs = all_recs.drop_duplicates(subset='title')  # remove duplicates
-    final_recs = all_recs.head(top_n)  # take top N
-
-    return final_recs
-
-query = "Kung Fu PAnda"
-final_recommendations = hybrid_recommendation(query, new_df, tfidf_matrix, indices, model_knn, movie_user_mat_sparse, movie_to_idx)
-
-# Nicely print the recommendations
-print(f"{'title'.ljust(40)}{'reason'}")
-print("-" * 60)
-for index, row in final_recommendations.iterrows():
-    print(f"{row['title'].ljust(40)}{row['reason']}")
+# Everything the API serves, in one object (written to disk by build_bundle.py)
+model = RecommenderModel(
+    catalog=new_df,
+    tfidf_matrix=tfidf_matrix,
+    indices=indices,
+    neighbor_idx=tfidf_neighbor_idx,
+    neighbor_scores=tfidf_neighbor_scores,
+    cf_matrix=movie_user_mat_sparse,
+    movie_to_idx=movie_to_idx,
+    cf_movie_ids=cf_movies.ids,
+    cf_user_ids=cf_users.ids,
+    vocabulary=tfidf.vocabulary_,
+    idf=tfidf.idf_,
+    title_neighbor_idx=title_neighbor_idx,
+    title_neighbor_scores=title_neighbor_scores,
+    # LSH indexes for approximate search, only worth building for large matrices
+    tfidf_ann=LSHIndex.build(tfidf_matrix) if tfidf_matrix.shape[0] >= ANN_MIN_ROWS else None,
+    cf_ann=LSHIndex.build(movie_user_mat_sparse) if movie_user_mat_sparse.shape[0] >= ANN_MIN_ROWS else None,
+    mf=mf_model,
+)
+BUILD_PARAMS = {'tfidf_max_features': 5000, 'tfidf_stop_words': 'english', 'neighbor_k': NEIGHBOR_K,
+                'title_neighbor_k': DEFAULT_TITLE_K, 'ann_tables': DEFAULT_TABLES, 'ann_bits': DEFAULT_BITS,
+                'cf_engine': CF_ENGINE, 'min_user_ratings': MIN_USER_RATINGS, 'min_movie_ratings': MIN_MOVIE_RATINGS}
+if CF_ENGINE == 'mf':
+    BUILD_PARAMS.update({'mf_factors': DEFAULT_FACTORS, 'mf_reg': DEFAULT_REG, 'mf_iterations': DEFAULT_ITERATIONS})
+
+if SHOW_EXAMPLES:
+    query = "Kung Fu PAnda"
+    final_recommendations = hybrid_recommendation(query, model)
+
+    # Nicely print the recommendations
+    print(f"{'title'.ljust(40)}{'reason'}")
+    print("-" * 60)
+    for index, row in final_recommendations.iterrows():
+        print(f"{row['title'].ljust(40)}{row['reason']}")
 
 import pandas as pd
 import nltk
@@ -577,7 +327,7 @@ from sklearn.preprocessing import MultiLabelBinarizer
 from scipy.sparse import hstack
 
 # Setup
-nltk.download('vader_lexicon')
+ensure_nltk_data(('sentiment/vader_lexicon.zip', 'vader_lexicon'))
 
 # Clean genres
 n_df['genres'] = n_df['genres'].apply(lambda x: x.split(',') if isinstance(x, str) else [])
@@ -585,9 +335,11 @@ n_df['genres'] = n_df['genres'].apply(lambda x: x.split(',') if isinstance(x, st
 # Initialize VADER
 sia = SentimentIntensityAnalyzer()
 
-def map_mood(overview):
+def map_mood(overview, scores=None):
+    # scores: VADER polarity scores of the lowercased overview, computed here if not given
     text = overview.lower()
-    scores = sia.polarity_scores(text)
+    if scores is None:
+        scores = sia.polarity_scores(text)
 
     if any(word in text for word in ['love', 'relationship', 'wedding', 'couple', 'romance', 'kiss', 'marriage']) \
        and not any(word in text for word in ['death', 'revenge', 'war', 'murder','erotic', 'lust', 'seduce', 'nudity', 'explicit', 'porn', 'sex', 'strip']):
@@ -622,45 +374,43 @@ def map_mood(overview):
     else:
         return 'unknown'
 
-# Assign moods
-n_df['mood'] = n_df['overview'].fillna("").apply(map_mood)
+# Assign moods; VADER runs once per overview and its scores are kept in the bundle with the labels
+overviews = n_df['overview'].fillna("").tolist()
+vader_scores = [sia.polarity_scores(text.lower()) for text in overviews]
+n_df['mood'] = [map_mood(text, scores) for text, scores in zip(overviews, vader_scores)]
+for part in ('neg', 'neu', 'pos', 'compound'):
+    n_df[f'mood_{part}'] = np.array([scores[part] for scores in vader_scores], dtype=np.float32)
 
 # TF-IDF on overview
-tfidf = TfidfVectorizer(max_features=3000)
-overview_vecs = tfidf.fit_transform(n_df['overview'].fillna(""))
+overview_tfidf = TfidfVectorizer(max_features=3000)
+overview_vecs = overview_tfidf.fit_transform(n_df['overview'].fillna(""))
 
 n_df['genres'] = n_df['genres'].apply(lambda g: [x.strip().capitalize() for x in g] if isinstance(g, list) else [])
 
-def is_mood_genre_compatible(row):
-    mood = row['mood']
-    genres = [g.strip().capitalize() for g in row['genres']] if isinstance(row['genres'], list) else []
-
-    mood_genre_map = {
-        'Happy': {'Animation', 'Comedy', 'Family', 'Adventure', 'Fantasy', 'Music'},
-        'Sad': {'Drama', 'Romance', 'Biography', 'History'},
-        'Angry': {'Action', 'War', 'Crime', 'Thriller'},
-        'Romantic': {'Romance', 'Drama', 'Comedy'},
-        'Excited': {'Action', 'Adventure', 'Science Fiction', 'Fantasy'},
-        'Chill': {'Documentary', 'Family', 'Animation', 'Music'},
-        'Anxious': {'Horror', 'Thriller', 'Mystery'},
-        'Inspired': {'Drama', 'Biography', 'History', 'Adventure'},
-    }
-
+mood_genre_map = {
+    'Happy': {'Animation', 'Comedy', 'Family', 'Adventure', 'Fantasy', 'Music'},
+    'Sad': {'Drama', 'Romance', 'Biography', 'History'},
+    'Angry': {'Action', 'War', 'Crime', 'Thriller'},
+    'Romantic': {'Romance', 'Drama', 'Comedy'},
+    'Excited': {'Action', 'Adventure', 'Science Fiction', 'Fantasy'},
+    'Chill': {'Documentary', 'Family', 'Animation', 'Music'},
+    'Anxious': {'Horror', 'Thriller', 'Mystery'},
+    'Inspired': {'Drama', 'Biography', 'History', 'Adventure'},
+}
+
+def is_mood_genre_compatible(mood, genres):
+    genres = [g.strip().capitalize() for g in genres] if isinstance(genres, list) else []
     valid_genres = mood_genre_map.get(mood, set())
     return any(g in valid_genres for g in genres)
-n_df = n_df[n_df.apply(is_mood_genre_compatible, axis=1)]
-
-def recommend_by_mood(mood, top_n=15):
-    filtered = n_df[n_df['mood'] == mood]
-    if filtered.empty:
-        return f"No movies found for mood: {mood}"
-    # Sort by popularity descending if column exists
-    if 'popularity' in filtered.columns:
-        filtered = filtered.sort_values(by='popularity', ascending=False)
-    return filtered[['title', 'mood', 'popularity']].head(top_n)
-
-# Try example
-mood_input = 'Romantic'
-results = recommend_by_mood(mood_input)
-print(f"🎬 Recommendations for mood: {mood_input}\n")
-print(results)
\ No newline at end of file
+n_df = n_df[[is_mood_genre_compatible(mood, genres) for mood, genres in zip(n_df['mood'], n_df['genres'])]]
+
+model.mood_df = n_df[['title', 'mood', 'popularity', 'genres', 'vote_average', 'release_date',
+                      'mood_neg', 'mood_neu', 'mood_pos', 'mood_compound']].copy().reset_index(drop=True)
+model.mood_index = MoodIndex.build(model.mood_df)
+
+if SHOW_EXAMPLES:
+    # Try example
+    mood_input = 'Romantic'
+    results = recommend_by_mood(mood_input, model.mood_df)
+    print(f"🎬 Recommendations for mood: {mood_input}\n")
+    print(results)
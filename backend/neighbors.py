@@ -0,0 +1,64 @@
+import hashlib
+import os
+
+import numpy as np
+
+from similarity import topk_similarity, DEFAULT_MAX_MEMORY_MB, DEFAULT_N_JOBS
+
+# ----------------- Precomputed Top-K Neighbor Table -------------
+# For every movie we keep its K most similar movies (by TF-IDF cosine) as
+# two compact arrays: neighbor_idx (int32, N x K) and neighbor_scores
+# (float32, N x K). Serving a request is then a row slice of the table.
+
+DEFAULT_K = 50
+NEIGHBORS_FILE = 'tfidf_neighbors.npz'
+
+
+def matrix_fingerprint(matrix) -> str:
+    # Identifies the fitted TF-IDF matrix, so a table built for an older fit is never served
+    matrix = matrix.tocsr()
+    h = hashlib.sha1()
+    h.update(np.asarray(matrix.shape, dtype=np.int64).tobytes())
+    for arr in (matrix.indptr, matrix.indices, matrix.data):
+        h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+
+def build_topk_neighbors(tfidf_matrix, k: int = DEFAULT_K,
+                         max_memory_mb: int = DEFAULT_MAX_MEMORY_MB, n_jobs: int = DEFAULT_N_JOBS):
+    # Row blocks under a memory cap, optionally across several cores (see similarity.py)
+    return topk_similarity(tfidf_matrix, k, max_memory_mb=max_memory_mb, n_jobs=n_jobs)
+
+
+def save_neighbors(path: str, neighbor_idx, neighbor_scores, fingerprint: str):
+    np.savez(path, neighbor_idx=neighbor_idx, neighbor_scores=neighbor_scores,
+             fingerprint=np.array(fingerprint))
+
+
+def load_neighbors(path: str, fingerprint: str = None):
+    # Returns (neighbor_idx, neighbor_scores), or None if missing or built for a different fit
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if fingerprint is not None and str(data['fingerprint']) != fingerprint:
+            print(f"[WARNING] Neighbor table '{path}' was built for a different TF-IDF fit; ignoring it.")
+            return None
+        return data['neighbor_idx'], data['neighbor_scores']
+
+
+def load_or_build_neighbors(tfidf_matrix, path: str = NEIGHBORS_FILE, k: int = DEFAULT_K):
+    fingerprint = matrix_fingerprint(tfidf_matrix)
+    table = load_neighbors(path, fingerprint)
+    if table is not None and table[0].shape[1] >= min(k, tfidf_matrix.shape[0] - 1):
+        return table[0][:, :k], table[1][:, :k]
+
+    neighbor_idx, neighbor_scores = build_topk_neighbors(tfidf_matrix, k=k)
+    save_neighbors(path, neighbor_idx, neighbor_scores, fingerprint)
+    return neighbor_idx, neighbor_scores
+
+
+def top_neighbors(neighbor_idx, neighbor_scores, idx: int, top_n: int = 10):
+    # O(1) lookup: the first top_n entries of the movie's row, without empty (-1) slots
+    row = neighbor_idx[idx, :top_n]
+    keep = row >= 0
+    return row[keep], neighbor_scores[idx, :top_n][keep]
@@ -0,0 +1,292 @@
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ----------------- OpenRouter Client ----------------------------
+# One pooled keep-alive session shared by every /chat request:
+#
+#   timeouts     CHAT_CONNECT_TIMEOUT_S to connect, CHAT_READ_TIMEOUT_S between bytes received
+#   retries      connection errors and 429/502/503/504 (honouring Retry-After), CHAT_RETRIES times,
+#                before any token has been returned
+#   concurrency  at most CHAT_MAX_CONCURRENCY upstream calls; a request waits CHAT_QUEUE_TIMEOUT_S
+#                for a slot and is then turned away instead of tying up a worker
+#   breaker      after CHAT_BREAKER_FAILURES failures in a row, calls fail fast for
+#                CHAT_BREAKER_RESET_S, then one trial call decides whether it closes again.
+#                Only the upstream's own failures count: connection errors, timeouts, 5xx and
+#                429. Other 4xx (e.g. one user's over-long prompt) and malformed replies only
+#                fail that request: its slot is released and the breaker is left alone
+#
+# stream() returns the reply as it is generated (OpenRouter's server-sent events), so the first
+# tokens reach the browser before the whole answer exists. OPENROUTER_API_URL points the client
+# at a local stand-in (see openrouter_stub.py) for tests and benchmarks.
+
+API_URL = os.getenv('OPENROUTER_API_URL', 'https://openrouter.ai/api/v1/chat/completions')
+MODEL = os.getenv('OPENROUTER_MODEL', 'mistralai/mistral-7b-instruct')
+CONNECT_TIMEOUT_S = float(os.getenv('CHAT_CONNECT_TIMEOUT_S', 3.05))
+READ_TIMEOUT_S = float(os.getenv('CHAT_READ_TIMEOUT_S', 30))
+RETRIES = int(os.getenv('CHAT_RETRIES', 2))
+MAX_CONCURRENCY = int(os.getenv('CHAT_MAX_CONCURRENCY', 8))
+QUEUE_TIMEOUT_S = float(os.getenv('CHAT_QUEUE_TIMEOUT_S', 2))
+BREAKER_FAILURES = int(os.getenv('CHAT_BREAKER_FAILURES', 5))
+BREAKER_RESET_S = float(os.getenv('CHAT_BREAKER_RESET_S', 30))
+
+
+class ChatUnavailable(Exception):
+    # The call was not attempted: breaker open, or no free slot in time
+    pass
+
+
+class ChatError(Exception):
+    # The upstream call failed or returned an error; upstream_fault says whether it counts
+    # against the circuit breaker
+
+    def __init__(self, message, upstream_fault=True):
+        super().__init__(message)
+        self.upstream_fault = upstream_fault
+
+
+def _is_upstream_fault(status):
+    return status == 429 or status >= 500
+
+
+class CircuitBreaker:
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_s=BREAKER_RESET_S):
+        self.max_failures = failures
+        self.reset_s = reset_s
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_s else 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def release_trial(self):
+        # Gives a half-open trial back without an outcome (the call was never made, or was
+        # abandoned by the caller), so the next allow() can start one
+        with self._lock:
+            self.trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.max_failures:
+                self.opened_at = time.monotonic()  # (re)open: a failed trial waits another reset_s
+
+
+def _make_session(pool_size, retries):
+    retry = Retry(total=retries, connect=retries, read=0, backoff_factor=0.3,
+                  status_forcelist=(429, 502, 503, 504), allowed_methods=frozenset(['POST']),
+                  respect_retry_after_header=True, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class OpenRouterClient:
+
+    def __init__(self, api_url=API_URL, api_key=None, model=MODEL, max_concurrency=MAX_CONCURRENCY,
+                 connect_timeout=CONNECT_TIMEOUT_S, read_timeout=READ_TIMEOUT_S, retries=RETRIES,
+                 queue_timeout=QUEUE_TIMEOUT_S, breaker=None):
+        self.api_url = api_url
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.session = _make_session(max_concurrency, retries)
+        self.session.headers.update({
+            'Authorization': f"Bearer {api_key if api_key is not None else os.getenv('OPENROUTER_API_KEY')}",
+            'Content-Type': 'application/json',
+        })
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _acquire(self):
+        if not self.breaker.allow():
+            raise ChatUnavailable('assistant temporarily unavailable')
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            # Not the upstream's fault: give a half-open trial back
+            self.breaker.release_trial()
+            raise ChatUnavailable('assistant busy')
+
+    def _post(self, messages, stream):
+        payload = {'model': self.model, 'messages': messages}
+        if stream:
+            payload['stream'] = True
+        try:
+            response = self.session.post(self.api_url, json=payload, timeout=self.timeout, stream=stream)
+        except requests.RequestException as e:
+            raise ChatError(f'request failed: {e.__class__.__name__}') from e
+        if response.status_code >= 400:
+            message = _error_message(response)
+            response.close()
+            raise ChatError(message, upstream_fault=_is_upstream_fault(response.status_code))
+        return response
+
+    def _record_error(self, error):
+        if error.upstream_fault:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_trial()
+
+    def complete(self, messages):
+        # The whole reply as one string
+        self._acquire()
+        try:
+            with self._post(messages, stream=False) as response:
+                data = response.json()
+            if 'choices' not in data:
+                raise _error_event(data.get('error') or {}, 'No reply from assistant.')
+            reply = data['choices'][0]['message']['content']
+        except ChatError as e:
+            self._record_error(e)
+            raise
+        except requests.RequestException as e:
+            error = ChatError(f'request failed: {e.__class__.__name__}')
+            self._record_error(error)
+            raise error from e
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            error = ChatError(f'bad response: {e.__class__.__name__}', upstream_fault=False)
+            self._record_error(error)
+            raise error from e
+        finally:
+            self._slots.release()
+        self.breaker.record_success()
+        return reply
+
+    def stream(self, messages):
+        # ChatStream of reply fragments as they arrive. Raises ChatUnavailable / ChatError
+        # before the first fragment, ChatError if the stream breaks off later
+        self._acquire()
+        try:
+            response = self._post(messages, stream=True)
+        except ChatError as e:
+            self._slots.release()
+            self._record_error(e)
+            raise
+        return ChatStream(self, response)
+
+    def stats(self):
+        return {'breaker': self.breaker.state, 'consecutive_failures': self.breaker.failures}
+
+
+class ChatStream:
+    # One streamed reply. It holds a concurrency slot (and possibly the breaker's half-open trial)
+    # until it is exhausted, fails or is closed, also when it is never iterated: close() it, or
+    # register close() with whatever sends it (Flask's Response.call_on_close). Dropping it
+    # closes it too; the generator only references the lease, so there is no cycle to wait for
+
+    def __init__(self, client, response):
+        self._lease = _StreamLease(client, response)
+        self._fragments = _iter_fragments(self._lease)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._fragments)
+
+    def close(self):
+        self._fragments.close()  # runs the generator's cleanup if it had started
+        self._lease.release(None)
+
+    def __del__(self):
+        self.close()
+
+
+class _StreamLease:
+
+    def __init__(self, client, response):
+        self.client = client
+        self.response = response
+        self.released = False
+
+    def release(self, ok):
+        # ok: True / False counts for the breaker, None (closed by the caller) does not
+        if self.released:
+            return
+        self.released = True
+        self.response.close()
+        self.client._slots.release()
+        breaker = self.client.breaker
+        if ok is True:
+            breaker.record_success()
+        elif ok is False:
+            breaker.record_failure()
+        else:
+            breaker.release_trial()
+
+
+def _iter_fragments(lease):
+    ok = False
+    try:
+        for line in lease.response.iter_lines(decode_unicode=True):
+            # SSE: "data: {...}" events, ": comment" keep-alives, blank separators
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[5:].strip()
+            if data == '[DONE]':
+                break
+            event = json.loads(data)
+            if 'error' in event:
+                raise _error_event(event['error'], 'stream error')
+            delta = (event.get('choices') or [{}])[0].get('delta', {}).get('content')
+            if delta:
+                yield delta
+        ok = True
+    except GeneratorExit:
+        ok = None  # the browser went away; not the upstream's fault
+        raise
+    except ChatError as e:
+        ok = False if e.upstream_fault else None
+        raise
+    except requests.RequestException as e:
+        raise ChatError(f'stream interrupted: {e.__class__.__name__}') from e
+    except ValueError as e:
+        ok = None
+        raise ChatError(f'bad stream event: {e.__class__.__name__}', upstream_fault=False) from e
+    finally:
+        lease.release(ok)
+
+
+def _error_event(error, default):
+    # ChatError for an OpenRouter {"error": {"code": ..., "message": ...}} body or stream event
+    try:
+        fault = _is_upstream_fault(int(error.get('code')))
+    except (TypeError, ValueError):
+        fault = False
+    return ChatError(error.get('message', default), upstream_fault=fault)
+
+
+def _error_message(response):
+    try:
+        return response.json()['error']['message']
+    except (ValueError, KeyError, TypeError):
+        return f'HTTP {response.status_code}'
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ----------------- OpenRouter Stub ------------------------------
+# A local stand-in for the OpenRouter chat completions endpoint, for trying the /chat blueprint
+# and openrouter_client.py without a key or network, and for measuring them under load.
+# Answers POST /api/v1/chat/completions as JSON, or as server-sent events when "stream" is set,
+# after a first-token delay plus a per-token delay; a fraction of requests can fail with 503.
+#
+# Usage:
+#   python openrouter_stub.py --port 8808 --first-token-ms 300 --token-ms 20
+#   OPENROUTER_API_URL=http://127.0.0.1:8808/api/v1/chat/completions python Appt.py
+#
+#   python openrouter_stub.py --bench 64 --concurrency 16
+#       starts the stub in-process and reports latency and time to first token through the client
+
+REPLY = ("Try Inception, Interstellar and The Prestige if you like twisty, cerebral films. "
+         "For something lighter, Paddington 2 and The Grand Budapest Hotel are both charming. "
+         "Arrival is a quiet, moving take on first contact. "
+         "Mad Max: Fury Road if you just want spectacle.")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so the client's connection pool is exercised
+    first_token_s = 0.3
+    token_s = 0.02
+    fail_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': {'message': 'invalid JSON'}})
+        if self.path.rstrip('/') != '/api/v1/chat/completions':
+            return self._send_json(404, {'error': {'message': 'not found'}})
+        if random.random() < self.fail_rate:
+            return self._send_json(503, {'error': {'message': 'stub overloaded'}})
+
+        tokens = [w + ' ' for w in REPLY.split(' ')]
+        time.sleep(self.first_token_s)
+        if not payload.get('stream'):
+            time.sleep(self.token_s * (len(tokens) - 1))
+            return self._send_json(200, {'choices': [{'message': {'role': 'assistant', 'content': REPLY}}]})
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self._chunk(': OPENROUTER PROCESSING\n\n')
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_s)
+            self._chunk('data: ' + json.dumps({'choices': [{'delta': {'content': token}}]}) + '\n\n')
+        self._chunk('data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Pooled clients drop idle keep-alive connections; that is not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_stub(port=0, first_token_ms=300, token_ms=20, fail_rate=0.0):
+    # Serves in a daemon thread; returns (server, completions URL)
+    handler = type('Handler', (StubHandler,), {'first_token_s': first_token_ms / 1000,
+                                               'token_s': token_ms / 1000, 'fail_rate': fail_rate})
+    server = StubServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, name='openrouter-stub', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions'
+
+
+# ----- Benchmark -----
+
+def _one(client, streaming):
+    messages = [{'role': 'user', 'content': 'Recommend a movie'}]
+    start = time.perf_counter()
+    first = None
+    try:
+        if streaming:
+            for _ in client.stream(messages):
+                if first is None:
+                    first = time.perf_counter() - start
+        else:
+            client.complete(messages)
+            first = time.perf_counter() - start
+    except Exception as e:
+        return None, None, e.__class__.__name__
+    return first, time.perf_counter() - start, None
+
+
+def _pct(values, q):
+    return sorted(values)[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+def bench(n, concurrency, url):
+    from openrouter_client import OpenRouterClient
+
+    for streaming in (False, True):
+        client = OpenRouterClient(api_url=url, api_key='stub', max_concurrency=concurrency, queue_timeout=60)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(lambda _: _one(client, streaming), range(n)))
+        wall = time.perf_counter() - start
+        firsts = [r[0] for r in results if r[2] is None]
+        totals = [r[1] for r in results if r[2] is None]
+        errors = [r[2] for r in results if r[2] is not None]
+        if not totals:
+            print(f"{'stream' if streaming else 'json':6s}  all {n} requests failed: {sorted(set(errors))}")
+            continue
+        print(f"{'stream' if streaming else 'json':6s}  {n} requests in {wall:.2f}s  "
+              f"first token p50 {_pct(firsts, 0.5):.0f}ms p95 {_pct(firsts, 0.95):.0f}ms  "
+              f"total p50 {statistics.median(totals) * 1000:.0f}ms  errors {len(errors)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local OpenRouter stand-in')
+    parser.add_argument('--port', type=int, default=int(os.getenv('STUB_PORT', 8808)))
+    parser.add_argument('--first-token-ms', type=float, default=300)
+    parser.add_argument('--token-ms', type=float, default=20)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--bench', type=int, default=0, help='run N requests through the client and exit')
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    server, url = start_stub(0 if args.bench else args.port, args.first_token_ms, args.token_ms, args.fail_rate)
+    if args.bench:
+        bench(args.bench, args.concurrency, url)
+        sys.exit(0)
+    print(f"OpenRouter stub listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
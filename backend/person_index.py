@@ -0,0 +1,178 @@
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+
+# ----------------- Person / Genre Inverted Index ----------------
+# Built once per model. Every distinct person (cast, directors and writers share one
+# id space) and every genre gets an integer id, and each role is a sparse
+# movie x id incidence matrix (CSR, one row per catalog movie). Its transpose gives
+# the posting list of every person / genre.
+#
+#   cast overlap          -> one sparse matrix-vector product
+#   same director/writer  -> union of the posting lists of the movie's directors/writers
+#   same genre            -> the same, ranked by number of shared genres
+#
+# The *_many variants answer a batch of movies with one sparse matrix product.
+
+PERSON_ROLES = ('cast', 'directors', 'writers')
+ROLES = PERSON_ROLES + ('genres',)
+
+
+def split_names(value):
+    if not isinstance(value, str):
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class PersonIndex:
+
+    def __init__(self, person_names, genre_names, incidence):
+        self.person_names = list(person_names)
+        self.genre_names = list(genre_names)
+        self.person_ids = {name: i for i, name in enumerate(self.person_names)}
+        self.genre_ids = {name: i for i, name in enumerate(self.genre_names)}
+        self.incidence = {role: csr_matrix(incidence[role]) for role in ROLES}
+        # Posting lists: row i of the transpose holds the movies of person/genre i
+        self.postings = {role: matrix.T.tocsr() for role, matrix in self.incidence.items()}
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        person_ids, genre_ids = {}, {}
+        n = len(catalog)
+        incidence = {}
+        for role in ROLES:
+            vocab = genre_ids if role == 'genres' else person_ids
+            rows, cols = [], []
+            for pos, value in enumerate(catalog[role].tolist()):
+                for name in dict.fromkeys(split_names(value)):
+                    rows.append(pos)
+                    cols.append(vocab.setdefault(name, len(vocab)))
+            incidence[role] = (np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32))
+
+        matrices = {}
+        for role, (rows, cols) in incidence.items():
+            width = len(genre_ids) if role == 'genres' else len(person_ids)
+            matrices[role] = csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n, width))
+        return cls(person_ids.keys(), genre_ids.keys(), matrices)
+
+    def extended(self, rows):
+        # A new index with the movies of `rows` (catalog columns) appended after the current
+        # ones; known people / genres keep their ids and new ones get the next free ids
+        person_ids, genre_ids = dict(self.person_ids), dict(self.genre_ids)
+        pairs = {}
+        for role in ROLES:
+            vocab = genre_ids if role == 'genres' else person_ids
+            new_rows, cols = [], []
+            for pos, value in enumerate(rows[role].tolist()):
+                for name in dict.fromkeys(split_names(value)):
+                    new_rows.append(pos)
+                    cols.append(vocab.setdefault(name, len(vocab)))
+            pairs[role] = (np.asarray(new_rows, dtype=np.int32), np.asarray(cols, dtype=np.int32))
+
+        matrices = {}
+        for role, (new_rows, cols) in pairs.items():
+            width = len(genre_ids) if role == 'genres' else len(person_ids)
+            old = self.incidence[role]
+            old = csr_matrix((old.data, old.indices, old.indptr), shape=(old.shape[0], width))
+            new = csr_matrix((np.ones(len(new_rows), dtype=np.float32), (new_rows, cols)), shape=(len(rows), width))
+            matrices[role] = vstack([old, new], format='csr')
+        return PersonIndex(person_ids.keys(), genre_ids.keys(), matrices)
+
+    def n_ids(self, role):
+        return len(self.genre_names) if role == 'genres' else len(self.person_names)
+
+    def ids_of(self, role, pos):
+        matrix = self.incidence[role]
+        return matrix.indices[matrix.indptr[pos]:matrix.indptr[pos + 1]]
+
+    def names_of(self, role, pos):
+        names = self.genre_names if role == 'genres' else self.person_names
+        return [names[i] for i in self.ids_of(role, pos)]
+
+    def movies_of(self, role, name):
+        vocab = self.genre_ids if role == 'genres' else self.person_ids
+        i = vocab.get(name)
+        if i is None:
+            return np.empty(0, dtype=np.int32)
+        postings = self.postings[role]
+        return postings.indices[postings.indptr[i]:postings.indptr[i + 1]]
+
+    def overlap_scores(self, role, pos):
+        # Number of shared people/genres between movie `pos` and every movie (dense, length N)
+        query = np.zeros(self.n_ids(role), dtype=np.float32)
+        query[self.ids_of(role, pos)] = 1.0
+        return self.incidence[role] @ query
+
+    def shared_counts(self, role, pos):
+        # Posting-list union: (movie positions, shared count), only for movies sharing at least one id
+        postings = self.postings[role]
+        ids = self.ids_of(role, pos)
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        hits = np.concatenate([postings.indices[postings.indptr[i]:postings.indptr[i + 1]] for i in ids])
+        movies, counts = np.unique(hits, return_counts=True)
+        return movies, counts
+
+    def ranked_matches(self, role, pos, top_n):
+        # Movies sharing any id with `pos`: most shared first, then the closest set size
+        # (so identical director/genre lists rank above supersets), then catalog order
+        movies, counts = self.shared_counts(role, pos)
+        if len(movies) == 0:
+            return movies
+        sizes = np.diff(self.incidence[role].indptr)[movies]
+        extra = np.abs(sizes - len(self.ids_of(role, pos)))
+        order = np.lexsort((movies, extra, -counts))
+        return movies[order[:top_n]]
+
+    def ranked_overlap(self, role, pos, top_n):
+        # Every movie ranked by overlap count (ties in catalog order), always top_n long
+        scores = self.overlap_scores(role, pos)
+        hits = np.flatnonzero(scores)
+        hits = hits[np.lexsort((hits, -scores[hits]))][:top_n]
+        if len(hits) < top_n:
+            hits = np.concatenate([hits, np.flatnonzero(scores == 0)[:top_n - len(hits)]])
+        return hits
+
+    def profile_scores(self, role, positions):
+        # Shared ids of every movie with a whole set of movies, each id weighted by how many of
+        # them have it (dense, length N): one id histogram and one sparse matrix-vector product
+        matrix = self.incidence[role]
+        weights = np.asarray(matrix[np.asarray(positions)].sum(axis=0), dtype=np.float32).ravel()
+        return matrix @ weights
+
+    # --- batches ---
+
+    def overlap_matrix(self, role, positions):
+        # Shared-id counts of every movie with each movie in `positions`: sparse N x len(positions), CSC
+        matrix = self.incidence[role]
+        return (matrix @ matrix[np.asarray(positions)].T).tocsc()
+
+    def _columns(self, counts):
+        for j in range(counts.shape[1]):
+            lo, hi = counts.indptr[j], counts.indptr[j + 1]
+            movies, shared = counts.indices[lo:hi], counts.data[lo:hi]
+            keep = shared > 0
+            yield movies[keep].astype(np.int64), shared[keep]
+
+    def ranked_matches_many(self, role, positions, top_n):
+        # ranked_matches() for every movie in `positions`
+        counts = self.overlap_matrix(role, positions)
+        sizes = np.diff(self.incidence[role].indptr)
+        results = []
+        for pos, (movies, shared) in zip(positions, self._columns(counts)):
+            extra = np.abs(sizes[movies] - sizes[pos])
+            results.append(movies[np.lexsort((movies, extra, -shared))[:top_n]])
+        return results
+
+    def ranked_overlap_many(self, role, positions, top_n):
+        # ranked_overlap() for every movie in `positions`
+        counts = self.overlap_matrix(role, positions)
+        n = self.incidence[role].shape[0]
+        results = []
+        for movies, shared in self._columns(counts):
+            hits = movies[np.lexsort((movies, -shared))][:top_n]
+            if len(hits) < top_n:
+                # Zero-overlap movies in catalog order; only the first top_n + len(movies) can be needed
+                head = np.arange(min(n, top_n + len(movies)))
+                hits = np.concatenate([hits, np.setdiff1d(head, movies, assume_unique=True)[:top_n - len(hits)]])
+            results.append(hits)
+        return results
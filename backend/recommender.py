@@ -0,0 +1,341 @@
+import re
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from title_resolver import TitleResolver
+
+# ----------------- Serving-side Recommender Functions -----------
+# These work on an already-trained model (see model_bundle.RecommenderModel) and
+# never touch the raw CSVs, so the API can import them without retraining.
+# mrs.py imports the same functions for its offline pipeline and examples.
+# Heavier libraries (sklearn, scipy via ann_index) are imported where they are used so that
+# importing this module stays cheap.
+
+# Title Similarity (Updated to handle case-insensitivity)
+def get_title_similar_movies(title, new_df, top_n=5, title_neighbor_idx=None, pos=None):
+    if title_neighbor_idx is not None and pos is not None and top_n <= title_neighbor_idx.shape[1]:
+        # Precomputed similar-title table (see title_similarity.py): a row slice
+        matches = title_neighbor_idx[pos, :top_n]
+        return new_df.iloc[matches[matches >= 0]][['title']].assign(reason='Similar Title')
+
+    # Convert the input title to lowercase for comparison
+    title = title.lower()
+
+    # Apply case-insensitive comparison (scores kept out of new_df, which may be shared)
+    title_score = new_df['title'].apply(lambda x: SequenceMatcher(None, title, x.lower()).ratio())
+    order = title_score.reset_index(drop=True).sort_values(ascending=False, kind='stable').index
+    top_titles = new_df.iloc[order]
+
+    return top_titles[['title']].head(top_n).assign(reason='Similar Title')
+
+# Genre Matching (Ensure no case sensitivity issue)
+def get_movies_with_similar_genre(title, new_df, top_n=10, person_index=None, pos=None):
+    if person_index is not None and pos is not None:
+        # Genre posting lists: any shared genre counts, identical genre lists rank first
+        matches = person_index.ranked_matches('genres', pos, top_n)
+        return new_df.iloc[matches][['title']].assign(reason='Same Genre')
+
+    # Get the genre of the input title (case-insensitive)
+    target_genres = new_df[new_df['title'].str.lower() == title.lower()]['genres'].values[0]
+    genre_match = new_df[new_df['genres'] == target_genres]
+    return genre_match[['title']].drop_duplicates().head(top_n).assign(reason='Same Genre')
+
+# Same Director (Handle case insensitivity)
+def get_movies_by_same_director(title, new_df, top_n=10, person_index=None, pos=None):
+    if person_index is not None and pos is not None:
+        # Posting-list read: every movie sharing at least one director
+        matches = person_index.ranked_matches('directors', pos, top_n)
+        return new_df.iloc[matches][['title']].assign(reason='Same Director')
+
+    # Get the director name for the input title
+    director = new_df[new_df['title'].str.lower() == title.lower()]['directors'].values[0]
+    same_director = new_df[new_df['directors'] == director]
+    return same_director[['title']].drop_duplicates().head(top_n).assign(reason='Same Director')
+
+# Same Cast (Handle case insensitivity)
+def get_movies_with_same_cast(title, new_df, top_n=10, person_index=None, pos=None):
+    if person_index is not None and pos is not None:
+        # One sparse matrix-vector product gives the shared-cast count of every movie
+        matches = person_index.ranked_overlap('cast', pos, top_n)
+        return new_df.iloc[matches][['title']].assign(reason='Similar Cast')
+
+    # Get the cast for the input title
+    target_cast = set(new_df[new_df['title'].str.lower() == title.lower()]['cast'].values[0].split(", "))
+
+    def cast_overlap(cast):
+        return len(target_cast.intersection(set(cast.split(", "))))
+
+    new_df['cast_score'] = new_df['cast'].apply(cast_overlap)
+    return new_df.sort_values(by='cast_score', ascending=False)[['title']].head(top_n).assign(reason='Similar Cast')
+
+# Same Writer (Handle case insensitivity)
+def get_movies_by_same_writer(title, new_df, top_n=10, person_index=None, pos=None):
+    if person_index is not None and pos is not None:
+        matches = person_index.ranked_matches('writers', pos, top_n)
+        return new_df.iloc[matches][['title']].assign(reason='Same Writer')
+
+    writer = new_df[new_df['title'].str.lower() == title.lower()]['writers'].values[0]
+    same_writer = new_df[new_df['writers'] == writer]
+    return same_writer[['title']].drop_duplicates().head(top_n).assign(reason='Same Writer')
+
+# Remove duplicates
+def remove_duplicates(df, movie_title):
+    df = df[df['title'] != movie_title]
+    return df.drop_duplicates(subset='title')
+
+def get_tfidf_similar_movies(title, df, tfidf_matrix, indices, top_n=10, neighbor_idx=None, ann_index=None):
+    if title not in indices:
+        return pd.DataFrame(columns=['title', 'reason'])  # empty if title not found
+
+    idx = indices[title]
+    if neighbor_idx is not None and top_n <= neighbor_idx.shape[1]:
+        # Served from the precomputed table: a slice instead of a full sort. Slots past the
+        # last neighbor (below the threshold, or a catalog smaller than the table) hold -1
+        movie_indices = neighbor_idx[idx, :top_n]
+        movie_indices = movie_indices[movie_indices >= 0]
+    elif ann_index is not None:
+        # Approximate: LSH candidates re-ranked by exact cosine (see ann_index.py)
+        movie_indices, _ = ann_index.query_row(tfidf_matrix, idx, top_n)
+    else:
+        from sklearn.metrics.pairwise import linear_kernel
+
+        cosine_sim = linear_kernel(tfidf_matrix[idx], tfidf_matrix).flatten()
+        sim_scores = list(enumerate(cosine_sim))
+        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)[1:top_n+1]
+        movie_indices = [i[0] for i in sim_scores]
+
+    return df.iloc[movie_indices][['title']].assign(reason='Same Genre')
+
+# ----------------- Collaborative Filtering ----------------------
+
+# Define the title cleaning function
+def clean_movie_title(title):
+    # Move articles like ", The" to the front and remove year
+    match = re.match(r"(.+),\s(The|An|A)\s*\((\d{4})\)", title)
+    if match:
+        title_cleaned = f"{match.group(2)} {match.group(1)}"
+    else:
+        # Remove year in parentheses
+        title_cleaned = re.sub(r"\s*\(\d{4}\)", "", title)
+
+        # Handle "Title, The" format without year
+        article_match = re.match(r"(.+),\s(The|An|A|La)$", title_cleaned)
+        if article_match:
+            title_cleaned = f"{article_match.group(2)} {article_match.group(1)}"
+
+    return title_cleaned.strip()
+
+# Define fuzzy matching function
+def fuzzy_matching(mapper, fav_movie, resolver=None):
+    # Closest MovieLens title within the resolver cutoff; the model keeps a prebuilt resolver
+    if resolver is None:
+        resolver = TitleResolver(mapper.index, values=mapper.values)
+    return resolver.resolve(fav_movie)
+
+# Function to clean up collaborative filtering output from merged_df
+def clean_collaborative_output(merged_df):
+    # Keep only title column and add a reason column
+    merged_df = merged_df[['title']].copy()
+    merged_df['reason'] = 'Collaborative Filtering'
+    return merged_df
+
+# Define the collaborative recommendation function
+def get_collaborative_recommendations(model_knn, data, mapper, fav_movie, n_recommendations, resolver=None, row_titles=None,
+                                      ann_index=None, mf_model=None):
+    idx = fuzzy_matching(mapper, fav_movie, resolver)
+    if idx is None:
+        return pd.DataFrame(columns=['title', 'reason'])
+
+    if mf_model is not None:
+        # Latent-factor engine: cosine between dense item embeddings, one matmul (see mf_engine.py)
+        neighbor_rows, _ = mf_model.similar_items(idx, n_recommendations)
+    elif ann_index is not None:
+        # LSH candidates re-ranked by exact cosine instead of the brute-force scan (see ann_index.py)
+        neighbor_rows, _ = ann_index.query_row(data, idx, n_recommendations)
+    else:
+        distances, indices = model_knn.kneighbors(data[idx], n_neighbors=min(n_recommendations + 1, data.shape[0]))
+        neighbor_rows = indices.flatten()[1:]  # skip the first item (itself)
+
+    # CF row -> title; the model keeps this as an array (RecommenderModel.cf_row_titles)
+    reverse_mapper = row_titles if row_titles is not None else {v: k for k, v in mapper.items()}
+
+    recommendations = []
+    for movie_id in neighbor_rows:
+        movie_title = reverse_mapper[movie_id] if row_titles is not None else reverse_mapper.get(movie_id)
+        if movie_title:
+            cleaned_title = clean_movie_title(movie_title)
+            recommendations.append({'title': cleaned_title, 'reason': 'Others also watched these'})
+
+    # Convert recommendations to DataFrame and return
+    return pd.DataFrame(recommendations)
+
+# ----------------- Hybrid Recommendation ------------------------
+
+def hybrid_recommendation(title, model, top_n=50):
+    from ann_index import use_ann  # LSH only for catalogs above ANN_MIN_ROWS
+
+    content_df = model.catalog
+
+    # Callers pass lowercased (sometimes misspelled) titles; the TF-IDF indices are keyed by the catalog spelling
+    pos = model.title_resolver.position(title)
+    canonical_title = content_df['title'].iat[pos] if pos is not None else title
+
+    # --- Content-Based Parts ---
+    person_index = model.person_index
+    part1 = get_movies_with_same_cast(title, content_df, top_n=10, person_index=person_index, pos=pos)
+    part2 = get_movies_by_same_director(title, content_df, top_n=10, person_index=person_index, pos=pos)
+    part3 = get_movies_with_similar_genre(title, content_df, top_n=10, person_index=person_index, pos=pos)
+    part4 = get_tfidf_similar_movies(canonical_title, content_df, model.tfidf_matrix, model.indices, top_n=10,
+                                     neighbor_idx=model.neighbor_idx, ann_index=use_ann(model.tfidf_ann))
+    part5 = get_movies_by_same_writer(title, content_df, top_n=10, person_index=person_index, pos=pos)
+    part6 = get_title_similar_movies(title, content_df, top_n=5, title_neighbor_idx=model.title_neighbor_idx, pos=pos)
+
+    # Combine all content-based recommendations
+    content_based_df = pd.concat([part1, part2, part3, part4, part5, part6], ignore_index=True)
+
+    # --- Collaborative Part ---
+    collab_df = get_collaborative_recommendations(model.model_knn, model.cf_matrix, model.movie_to_idx, canonical_title,
+                                                  n_recommendations=10, resolver=model.cf_resolver,
+                                                  row_titles=model.cf_row_titles, ann_index=use_ann(model.cf_ann),
+                                                  mf_model=model.mf)
+
+    # --- Combine both ---
+    all_recs = pd.concat([content_based_df, collab_df], ignore_index=True)
+
+    # --- Clean Up ---
+    all_recs = all_recs[all_recs['title'].str.lower() != title.lower()]  # remove the queried title
+    all_recs = all_recs.drop_duplicates(subset='title')  # remove duplicates
+    final_recs = all_recs.head(top_n)  # take top N
+
+    return final_recs
+
+# ----------------- Batch Hybrid Recommendation ------------------
+# hybrid_recommendation() for many titles at once. Every signal is scored for the whole
+# batch together instead of once per title:
+#
+#   cast / director / genre / writer   one sparse product per role (PersonIndex.*_many)
+#   TF-IDF                             one slice of the neighbor table, or one sparse matmul
+#   collaborative (kNN)                one kneighbors() call with a query row per title
+#
+# Each title's list is then assembled exactly as hybrid_recommendation() does (same part
+# order, queried title removed, duplicates dropped), so both give the same results.
+
+def _tfidf_rows_many(model, rows, top_n):
+    if model.neighbor_idx is not None and top_n <= model.neighbor_idx.shape[1]:
+        return [row[row >= 0] for row in model.neighbor_idx[rows, :top_n]]  # -1: empty slot
+
+    from ann_index import use_ann
+
+    ann_index = use_ann(model.tfidf_ann)
+    if ann_index is not None:
+        return [ann_index.query_row(model.tfidf_matrix, row, top_n)[0] for row in rows]
+    # Batch x N scores; the first (best) match of every row is the movie itself and is skipped
+    scores = (model.tfidf_matrix[rows] @ model.tfidf_matrix.T).toarray()
+    return list(np.argsort(-scores, axis=1, kind='stable')[:, 1:top_n + 1])
+
+
+def _collaborative_rows_many(model, rows, n_recommendations):
+    from ann_index import use_ann
+
+    ann_index = use_ann(model.cf_ann)
+    if model.mf is not None:
+        return [model.mf.similar_items(row, n_recommendations)[0] for row in rows]
+    if ann_index is not None:
+        return [ann_index.query_row(model.cf_matrix, row, n_recommendations)[0] for row in rows]
+    n_neighbors = min(n_recommendations + 1, model.cf_matrix.shape[0])
+    _, indices = model.model_knn.kneighbors(model.cf_matrix[rows], n_neighbors=n_neighbors)
+    return list(indices[:, 1:])  # skip the first item of every row (the movie itself)
+
+
+def hybrid_recommendation_batch(titles, model, top_n=50):
+    # One list of {'title', 'reason'} records per title, as hybrid_recommendation(...).to_dict('records')
+    results = [None] * len(titles)
+    person_index = model.person_index
+    positions = [model.title_resolver.position(title) for title in titles]
+    batch = [i for i, pos in enumerate(positions) if pos is not None]
+    if person_index is None:
+        batch = []
+    for i in set(range(len(titles))) - set(batch):
+        # Unknown titles (and models without a person index) take the per-title path
+        results[i] = hybrid_recommendation(titles[i], model, top_n=top_n).to_dict(orient='records')
+    if not batch:
+        return results
+
+    catalog_titles = model.catalog['title'].to_numpy()
+    pos = [positions[i] for i in batch]
+    canonical = [catalog_titles[p] for p in pos]
+
+    # --- Content-Based Parts ---
+    parts = {
+        'Similar Cast': person_index.ranked_overlap_many('cast', pos, 10),
+        'Same Director': person_index.ranked_matches_many('directors', pos, 10),
+        'Same Genre': person_index.ranked_matches_many('genres', pos, 10),
+    }
+    tfidf = [None] * len(batch)
+    tfidf_known = [j for j, title in enumerate(canonical) if title in model.indices]
+    if tfidf_known:
+        found = _tfidf_rows_many(model, [model.indices[canonical[j]] for j in tfidf_known], 10)
+        for j, rows in zip(tfidf_known, found):
+            tfidf[j] = rows
+    writers = person_index.ranked_matches_many('writers', pos, 10)
+
+    title_table = model.title_neighbor_idx
+    if title_table is not None and title_table.shape[1] >= 5:
+        similar_titles = [catalog_titles[row[row >= 0]] for row in title_table[pos, :5]]
+    else:
+        similar_titles = [get_title_similar_movies(titles[i], model.catalog, top_n=5)['title'] for i in batch]
+
+    # --- Collaborative Part ---
+    cf_rows = [model.cf_resolver.resolve(title) for title in canonical]
+    cf_known = [j for j, row in enumerate(cf_rows) if row is not None]
+    collab = [[] for _ in batch]
+    if cf_known:
+        found = _collaborative_rows_many(model, [cf_rows[j] for j in cf_known], 10)
+        for j, rows in zip(cf_known, found):
+            for row in rows:
+                movie_title = model.cf_row_titles[row]
+                if movie_title:
+                    collab[j].append(clean_movie_title(movie_title))
+
+    # --- Combine and Clean Up, per title ---
+    for j, i in enumerate(batch):
+        query = titles[i].lower()
+        candidates = [(t, 'Similar Cast') for t in catalog_titles[parts['Similar Cast'][j]]]
+        candidates += [(t, 'Same Director') for t in catalog_titles[parts['Same Director'][j]]]
+        candidates += [(t, 'Same Genre') for t in catalog_titles[parts['Same Genre'][j]]]
+        if tfidf[j] is not None:
+            candidates += [(t, 'Same Genre') for t in catalog_titles[tfidf[j]]]
+        candidates += [(t, 'Same Writer') for t in catalog_titles[writers[j]]]
+        candidates += [(t, 'Similar Title') for t in similar_titles[j]]
+        candidates += [(t, 'Others also watched these') for t in collab[j]]
+
+        seen, records = set(), []
+        for title, reason in candidates:
+            if title.lower() == query or title in seen:
+                continue
+            seen.add(title)
+            records.append({'title': title, 'reason': reason})
+            if len(records) == top_n:
+                break
+        results[i] = records
+    return results
+
+# ----------------- Mood-based Recommendation --------------------
+
+def recommend_by_mood(mood, mood_df, top_n=15, mood_index=None, sort='popularity', offset=0):
+    if mood_index is not None:
+        # Presorted per-mood rows (see mood_index.py): a page is a slice, sort is popularity / rating / recency
+        if mood not in mood_index:
+            return f"No movies found for mood: {mood}"
+        rows = mood_index.page(mood, sort=sort, offset=offset, limit=top_n)
+        return mood_df.iloc[rows][['title', 'mood', 'popularity']]
+
+    filtered = mood_df[mood_df['mood'] == mood]
+    if filtered.empty:
+        return f"No movies found for mood: {mood}"
+    # Sort by popularity descending if column exists
+    if 'popularity' in filtered.columns:
+        filtered = filtered.sort_values(by='popularity', ascending=False)
+    return filtered[['title', 'mood', 'popularity']].head(top_n)
@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# ----------------- Recommendation Result Cache ------------------
+# Bounded LRU cache with a time-to-live per entry, for finished recommendation lists.
+# Keys are (resolved catalog row, top_n, model version), so a new bundle never serves
+# results of the previous one and the many spellings of a title share one entry.
+#
+#   - least recently used entries are evicted once maxsize is reached
+#   - entries older than ttl seconds count as misses and are dropped
+#   - hits / misses / evictions / expirations are counted for sizing (stats())
+#   - snapshot() writes the live entries to a JSON file and restore() reads them back,
+#     skipping expired entries and those of other model versions, so a restart is warm
+
+DEFAULT_MAXSIZE = int(os.getenv('RESULT_CACHE_SIZE', 2048))
+DEFAULT_TTL = float(os.getenv('RESULT_CACHE_TTL', 3600))
+DEFAULT_SNAPSHOT = os.getenv('RESULT_CACHE_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'result_cache.json'))
+
+
+class ResultCache:
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (stored_at wall clock, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.time() - entry[0] < self.ttl
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry[0] >= self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, stored_at=None):
+        with self._lock:
+            self._entries[key] = (stored_at if stored_at is not None else time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    # --- persistence ---
+
+    def snapshot(self, path=DEFAULT_SNAPSHOT):
+        # Oldest first, so restoring replays the LRU order
+        with self._lock:
+            entries = [{'key': list(key), 'stored_at': stored_at, 'value': value}
+                       for key, (stored_at, value) in self._entries.items()]
+        # A temp file of its own per call, so workers snapshotting at the same time never
+        # write into one file; the last os.replace wins with a complete snapshot
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                   dir=os.path.dirname(path) or '.')
+        try:
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump({'entries': entries}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return len(entries)
+
+    def restore(self, path=DEFAULT_SNAPSHOT, version=None):
+        # Returns the number of entries loaded; keys end with the model version
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries = json.load(f)['entries']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARNING] Could not read result cache snapshot '{path}': {e}")
+            return 0
+
+        now = time.time()
+        loaded = 0
+        for entry in entries:
+            key = tuple(entry['key'])
+            if version is not None and key[-1] != version:
+                continue
+            if now - entry['stored_at'] >= self.ttl:
+                continue
+            self.put(key, entry['value'], stored_at=entry['stored_at'])
+            loaded += 1
+        return loaded
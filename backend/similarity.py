@@ -0,0 +1,156 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+from sklearn.metrics.pairwise import linear_kernel
+
+# ----------------- Blockwise Similarity Engine -------------------
+# Cosine similarity over the (L2-normalised) TF-IDF rows, computed one row block
+# at a time. Only a (block_rows x N) float64 slab exists at any moment, and only
+# the top-K / above-threshold entries of each row are kept. The full N x N
+# matrix is never materialised.
+
+DEFAULT_MAX_MEMORY_MB = int(os.getenv('SIM_MAX_MEMORY_MB', 256))
+DEFAULT_N_JOBS = int(os.getenv('SIM_N_JOBS', 1))
+
+# Dense block + argpartition/lexsort temporaries, in float64-sized cells per entry
+_BYTES_PER_CELL = 8 * 3
+
+
+def block_rows_for(n_cols: int, max_memory_mb: int = DEFAULT_MAX_MEMORY_MB, n_jobs: int = 1) -> int:
+    # Largest row block that keeps all concurrently running blocks under the memory cap
+    budget = max_memory_mb * 1024 * 1024 // max(1, n_jobs)
+    return max(1, budget // (max(1, n_cols) * _BYTES_PER_CELL))
+
+
+def row_blocks(n_rows: int, block_rows: int):
+    return [(start, min(start + block_rows, n_rows)) for start in range(0, n_rows, block_rows)]
+
+
+def _topk_rows(scores: np.ndarray, row_ids: np.ndarray, k: int, threshold: float = None):
+    # Drop each row's own column so a movie never counts as its own neighbor
+    scores[np.arange(len(row_ids)), row_ids] = -np.inf
+    if threshold is not None:
+        scores[scores < threshold] = -np.inf
+
+    if k <= 0:
+        return np.empty((len(row_ids), 0), dtype=np.int32), np.empty((len(row_ids), 0), dtype=np.float32)
+
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+
+    # Highest score first, lower index first on ties (same order as a stable sort)
+    order = np.lexsort((part, -part_scores), axis=1)
+    idx = np.take_along_axis(part, order, axis=1).astype(np.int32)
+    top = np.take_along_axis(part_scores, order, axis=1)
+
+    # Slots that fell below the threshold are marked with -1 / 0.0
+    missing = ~np.isfinite(top)
+    idx[missing] = -1
+    top[missing] = 0.0
+    return idx, top.astype(np.float32)
+
+
+def _threshold_rows(scores: np.ndarray, row_ids: np.ndarray, threshold: float):
+    scores[np.arange(len(row_ids)), row_ids] = 0.0
+    scores[scores < threshold] = 0.0
+    return csr_matrix(scores, dtype=np.float32)
+
+
+# Worker state for the process pool: the matrix is shipped once per worker, not per block
+_worker_matrix = None
+
+
+def _init_worker(matrix):
+    global _worker_matrix
+    _worker_matrix = matrix
+
+
+def _block_similarity(matrix, start, stop):
+    return linear_kernel(matrix[start:stop], matrix)
+
+
+def _topk_task(args):
+    start, stop, k, threshold = args
+    scores = _block_similarity(_worker_matrix, start, stop)
+    return start, _topk_rows(scores, np.arange(start, stop), k, threshold)
+
+
+def _threshold_task(args):
+    start, stop, threshold = args
+    scores = _block_similarity(_worker_matrix, start, stop)
+    return start, _threshold_rows(scores, np.arange(start, stop), threshold)
+
+
+def _run_blocks(matrix, task, tasks, n_jobs):
+    if n_jobs == 1:
+        _init_worker(matrix)
+        try:
+            for args in tasks:
+                yield task(args)
+        finally:
+            _init_worker(None)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(matrix,)) as pool:
+        for result in pool.map(task, tasks):
+            yield result
+
+
+def _resolve_jobs(n_jobs):
+    if n_jobs is None or n_jobs < 1:
+        return os.cpu_count() or 1
+    return n_jobs
+
+
+def topk_similarity(matrix, k: int, threshold: float = None,
+                    max_memory_mb: int = DEFAULT_MAX_MEMORY_MB, n_jobs: int = DEFAULT_N_JOBS):
+    # Returns (neighbor_idx int32 N x K, neighbor_scores float32 N x K); n_jobs <= 0 uses every core
+    matrix = csr_matrix(matrix)
+    n = matrix.shape[0]
+    k = max(0, min(k, n - 1))
+    n_jobs = _resolve_jobs(n_jobs)
+
+    neighbor_idx = np.empty((n, k), dtype=np.int32)
+    neighbor_scores = np.empty((n, k), dtype=np.float32)
+
+    tasks = [(start, stop, k, threshold)
+             for start, stop in row_blocks(n, block_rows_for(n, max_memory_mb, n_jobs))]
+    for start, (idx, scores) in _run_blocks(matrix, _topk_task, tasks, n_jobs):
+        neighbor_idx[start:start + len(idx)] = idx
+        neighbor_scores[start:start + len(idx)] = scores
+
+    return neighbor_idx, neighbor_scores
+
+
+def topk_similarity_rows(matrix, rows, k: int, max_memory_mb: int = DEFAULT_MAX_MEMORY_MB):
+    # topk_similarity() for the given rows only (against every row), e.g. rows just appended
+    matrix = csr_matrix(matrix)
+    rows = np.asarray(rows, dtype=np.int64)
+    n = matrix.shape[0]
+    k = max(0, min(k, n - 1))
+
+    neighbor_idx = np.empty((len(rows), k), dtype=np.int32)
+    neighbor_scores = np.empty((len(rows), k), dtype=np.float32)
+    for start, stop in row_blocks(len(rows), block_rows_for(n, max_memory_mb)):
+        block = rows[start:stop]
+        idx, scores = _topk_rows(linear_kernel(matrix[block], matrix), block, k)
+        neighbor_idx[start:stop] = idx
+        neighbor_scores[start:stop] = scores
+    return neighbor_idx, neighbor_scores
+
+
+def threshold_similarity(matrix, threshold: float,
+                         max_memory_mb: int = DEFAULT_MAX_MEMORY_MB, n_jobs: int = DEFAULT_N_JOBS):
+    # Sparse N x N float32 matrix holding only the pairs with similarity >= threshold
+    matrix = csr_matrix(matrix)
+    n = matrix.shape[0]
+    n_jobs = _resolve_jobs(n_jobs)
+
+    tasks = [(start, stop, threshold)
+             for start, stop in row_blocks(n, block_rows_for(n, max_memory_mb, n_jobs))]
+    blocks = [block for _, block in _run_blocks(matrix, _threshold_task, tasks, n_jobs)]
+    if not blocks:
+        return csr_matrix((0, 0), dtype=np.float32)
+    return vstack(blocks, format='csr')
@@ -0,0 +1,97 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# ----------------- Import-time Profile --------------------------
+# Imports the API module in a fresh interpreter with `python -X importtime` and the
+# network disabled, then reports the slowest imports and checks the total against a
+# budget. Exit code 1 means the budget was exceeded, the network was touched, or the
+# import loaded the model.
+#
+#   cd backend
+#   python startup_profile.py                 # profiles `import Appt`, budget 3s
+#   python startup_profile.py --budget 1.5 --top 25
+
+DEFAULT_BUDGET_S = float(os.getenv('STARTUP_BUDGET_S', 3.0))
+
+# Runs inside the child: any socket connect aborts the import instead of waiting on the network
+_BOOTSTRAP = """
+import socket, sys, time
+
+def _no_network(*args, **kwargs):
+    raise RuntimeError('network access during import')
+
+socket.socket.connect = _no_network
+socket.create_connection = _no_network
+socket.getaddrinfo = _no_network
+
+start = time.perf_counter()
+__import__({module!r})
+elapsed = time.perf_counter() - start
+
+import model_store
+print(f'@@total {{elapsed:.6f}}', file=sys.stderr)
+print(f'@@model_loaded {{int(model_store.is_loaded())}}', file=sys.stderr)
+"""
+
+
+def _parse_importtime(stderr):
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def profile_import(module='Appt', cwd=None):
+    cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _BOOTSTRAP.format(module=module)],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    markers = dict(line[2:].split(' ', 1) for line in proc.stderr.splitlines() if line.startswith('@@'))
+    return {
+        'ok': proc.returncode == 0,
+        'error': proc.stderr.strip().splitlines()[-1] if proc.returncode and proc.stderr.strip() else None,
+        'total_s': float(markers['total']) if 'total' in markers else None,
+        'model_loaded': markers.get('model_loaded') == '1',
+        'imports': _parse_importtime(proc.stderr),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile API import time with the network disabled.')
+    parser.add_argument('--module', default='Appt')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_S, help='maximum import time in seconds')
+    parser.add_argument('--top', type=int, default=15, help='number of slowest imports to list')
+    args = parser.parse_args()
+
+    result = profile_import(args.module)
+    if not result['ok']:
+        print(f"[ERROR] import {args.module} failed: {result['error']}")
+        sys.exit(1)
+
+    print(f"import {args.module}: {result['total_s']:.3f}s (budget {args.budget:.3f}s)")
+    print(f"{'cumulative ms'.rjust(14)} {'self ms'.rjust(10)}  module")
+    for self_us, cumulative_us, name in sorted(result['imports'], key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:10.1f}  {name}")
+
+    failed = False
+    if result['model_loaded']:
+        print("[ERROR] the model bundle was loaded at import time")
+        failed = True
+    if result['total_s'] > args.budget:
+        print(f"[ERROR] import time {result['total_s']:.3f}s exceeds the {args.budget:.3f}s budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# ----------------- Text Cleaning Stage --------------------------
+# clean_text() lowercases, keeps letters only, drops English stopwords and lemmatizes
+# every remaining word with WordNet. The corpus has millions of tokens but only tens of
+# thousands of distinct words, so each process keeps a word -> lemma memo (stopwords
+# map to None) and WordNet runs once per distinct word.
+#
+# iter_clean_texts() shards the rows into chunks across a process pool and yields the
+# cleaned rows in input order, so the result is the same for any CLEAN_N_JOBS.
+#
+#   python text_clean.py --rows 20000        # compare with the original function and time both
+
+DEFAULT_N_JOBS = int(os.getenv('CLEAN_N_JOBS', 0))  # <= 0: all cores
+DEFAULT_CHUNK_ROWS = int(os.getenv('CLEAN_CHUNK_ROWS', 2000))
+
+_NON_ALPHA = re.compile(r'[^a-zA-Z]')
+_stop_words = None
+_lemmatizer = None
+_lemmas = {}  # word -> lemma, or None for a stopword
+
+
+def _load_resources():
+    # Corpora come from ensure_nltk_data() in mrs.py; forked workers inherit them already loaded
+    global _stop_words, _lemmatizer
+    if _lemmatizer is None:
+        from nltk.corpus import stopwords
+        from nltk.stem import WordNetLemmatizer
+
+        _stop_words = set(stopwords.words('english'))
+        _lemmatizer = WordNetLemmatizer()
+
+
+def clean_text(text):
+    if pd.isna(text):
+        return ''
+    _load_resources()
+    words = []
+    for word in _NON_ALPHA.sub(' ', text.lower()).split():
+        if word in _lemmas:
+            lemma = _lemmas[word]
+        else:
+            lemma = _lemmas[word] = None if word in _stop_words else _lemmatizer.lemmatize(word)
+        if lemma is not None:
+            words.append(lemma)
+    return ' '.join(words)
+
+
+def _clean_chunk(texts):
+    return [clean_text(text) for text in texts]
+
+
+def iter_clean_texts(texts, n_jobs=DEFAULT_N_JOBS, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Cleaned rows in input order, one chunk at a time
+    texts = list(texts)
+    chunks = [texts[start:start + chunk_rows] for start in range(0, len(texts), chunk_rows)]
+    workers = n_jobs if n_jobs > 0 else (os.cpu_count() or 1)
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from _clean_chunk(chunk)
+        return
+
+    _load_resources()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_resources) as pool:
+        for cleaned in pool.map(_clean_chunk, chunks):
+            yield from cleaned
+
+
+# ----------------- Validation -------------------------------------
+
+def clean_text_reference(text):
+    # The original per-row function, kept to check iter_clean_texts() against
+    _load_resources()
+    if pd.isna(text):
+        return ''
+    text = re.sub(r'[^a-zA-Z]', ' ', text.lower())
+    words = text.split()
+    words = [_lemmatizer.lemmatize(word) for word in words if word not in _stop_words]
+    return ' '.join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the text cleaning stage against the original function.')
+    parser.add_argument('--csv', default='TMDB_IMDB_movies.csv')
+    parser.add_argument('--column', default='overview')
+    parser.add_argument('--rows', type=int, default=None)
+    parser.add_argument('--jobs', type=int, default=DEFAULT_N_JOBS)
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.csv, usecols=[args.column], nrows=args.rows)[args.column].tolist()
+
+    start = time.perf_counter()
+    expected = [clean_text_reference(text) for text in texts]
+    reference_s = time.perf_counter() - start
+
+    _lemmas.clear()
+    start = time.perf_counter()
+    got = list(iter_clean_texts(texts, n_jobs=args.jobs))
+    parallel_s = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(expected, got)) + abs(len(expected) - len(got))
+    print(f"rows: {len(texts)}  jobs: {args.jobs if args.jobs > 0 else os.cpu_count()}")
+    print(f"original: {reference_s:.2f}s  pipeline: {parallel_s:.2f}s  mismatching rows: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
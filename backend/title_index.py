@@ -0,0 +1,210 @@
+import bisect
+from array import array
+
+import numpy as np
+
+# ----------------- Title Search Index ---------------------------
+# Built once when the movie dataset loads; extended() adds ingested titles without
+# re-splitting the existing ones.
+#
+# Documents are numbered in popularity order (doc 0 = most popular), so every
+# posting list and every candidate list is already ranked and can stop at `limit`.
+#
+#   search(q)    substring search: intersect the trigram posting lists of q, then
+#                confirm `q in title` on the few survivors
+#   complete(p)  typeahead: popularity-ranked titles where p is a prefix of the
+#                title or of any word in it. Prefixes up to HEAD_PREFIX_LEN chars
+#                are answered from a precomputed table, longer ones by bisecting a
+#                sorted array of word-start suffixes (a flattened prefix trie)
+
+GRAM = 3
+HEAD_PREFIX_LEN = 3
+HEAD_SIZE = 20
+
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def _popularity(details):
+    try:
+        return float(details.get('popularity') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _word_starts(key):
+    # The title itself plus every suffix that begins a word: "the dark knight" ->
+    # "the dark knight", "dark knight", "knight"
+    starts = [0] + [i + 1 for i, ch in enumerate(key) if ch == ' ' and i + 1 < len(key) and key[i + 1] != ' ']
+    return [key[i:] for i in starts]
+
+
+class TitleSearchIndex:
+
+    def __init__(self, keys, popularity):
+        # keys: lowercased titles; popularity: parallel list of floats
+        order = sorted(range(len(keys)), key=lambda i: -popularity[i])
+        self.keys = [keys[i] for i in order]
+        self.popularity = np.asarray([popularity[i] for i in order], dtype=np.float32)
+        self._build_grams()
+        self._build_prefixes()
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        keys, popularity = [], []
+        for key, details in dataset.items():
+            keys.append(key)
+            popularity.append(_popularity(details))
+        return cls(keys, popularity)
+
+    def extended_from_dataset(self, dataset, keys):
+        # extended() with `keys` of `dataset`, e.g. the titles an ingestion added to MOVIE_DATASET
+        return self.extended(keys, [_popularity(dataset[key]) for key in keys])
+
+    def extended(self, keys, popularity):
+        # A new index with `keys` (titles not in this index yet) added. Only the new keys are
+        # split into trigrams and word starts; the existing posting lists, suffix array and
+        # head table are renumbered and merged, as a full build would have numbered them
+        order = sorted(range(len(keys)), key=lambda i: -popularity[i])
+        new_keys = [keys[i] for i in order]
+        new_pop = np.asarray([popularity[i] for i in order], dtype=np.float32)
+        n_old, n_new = len(self.keys), len(new_keys)
+
+        # New docs go after the existing docs of equal popularity, as in a rebuild over old + new
+        insert_at = np.searchsorted(-self.popularity, -new_pop, side='right')
+        old_map = np.arange(n_old) + np.searchsorted(insert_at, np.arange(n_old), side='right')
+        new_map = insert_at + np.arange(n_new)
+
+        index = object.__new__(TitleSearchIndex)
+        merged = np.empty(n_old + n_new, dtype=object)
+        merged[old_map] = self.keys
+        merged[new_map] = new_keys
+        index.keys = merged.tolist()
+        index.popularity = np.empty(n_old + n_new, dtype=np.float32)
+        index.popularity[old_map] = self.popularity
+        index.popularity[new_map] = new_pop
+
+        # Trigram postings: the old (gram, doc) pairs renumbered, plus the new keys' pairs
+        gram_ids = dict(self._gram_ids)
+        pair_gram, pair_doc = array('i'), array('i')
+        for doc, key in zip(new_map.tolist(), new_keys):
+            for g in _grams(key):
+                pair_gram.append(gram_ids.setdefault(g, len(gram_ids)))
+                pair_doc.append(doc)
+        old_gram = np.repeat(np.arange(len(self._gram_ids), dtype=np.int32), np.diff(self._gram_indptr))
+        pair_gram = np.concatenate((old_gram, np.frombuffer(pair_gram, dtype=np.int32)))
+        pair_doc = np.concatenate((old_map[self._gram_docs].astype(np.int32), np.frombuffer(pair_doc, dtype=np.int32)))
+        order = np.lexsort((pair_doc, pair_gram))
+        index._gram_ids = gram_ids
+        index._gram_docs = pair_doc[order]
+        index._gram_indptr = np.concatenate(([0], np.cumsum(np.bincount(pair_gram, minlength=len(gram_ids)))))
+
+        # Word-start suffixes: the new entries are inserted into the sorted array
+        # (entries of equal suffix stay in doc order)
+        entries = sorted((suffix, doc) for doc, key in zip(new_map.tolist(), new_keys) for suffix in _word_starts(key))
+        old_docs = old_map[self._suffix_docs]
+        positions = []
+        for suffix, doc in entries:
+            lo = bisect.bisect_left(self._suffixes, suffix)
+            hi = bisect.bisect_right(self._suffixes, suffix, lo)
+            positions.append(lo + int(np.searchsorted(old_docs[lo:hi], doc)))
+        suffixes = np.empty(len(self._suffixes), dtype=object)
+        suffixes[:] = self._suffixes
+        index._suffixes = np.insert(suffixes, positions, [suffix for suffix, _ in entries]).tolist()
+        index._suffix_docs = np.insert(old_docs, positions, [doc for _, doc in entries]).astype(np.int32)
+
+        # Head table: renumber, then let the new docs compete for the HEAD_SIZE places
+        head = {prefix: old_map[docs].tolist() for prefix, docs in self._head.items()}
+        for suffix, doc in entries:
+            for n in range(1, min(HEAD_PREFIX_LEN, len(suffix)) + 1):
+                docs = head.setdefault(suffix[:n], [])
+                if doc not in docs:
+                    bisect.insort(docs, doc)
+                    del docs[HEAD_SIZE:]
+        index._head = head
+        return index
+
+    # --- substring search ---
+
+    def _build_grams(self):
+        gram_ids = {}
+        pair_gram, pair_doc = array('i'), array('i')
+        for doc, key in enumerate(self.keys):
+            for g in _grams(key):
+                pair_gram.append(gram_ids.setdefault(g, len(gram_ids)))
+                pair_doc.append(doc)
+
+        pair_gram = np.frombuffer(pair_gram, dtype=np.int32)
+        pair_doc = np.frombuffer(pair_doc, dtype=np.int32)
+        order = np.argsort(pair_gram, kind='stable')  # stable: each posting list stays in doc order
+        self._gram_ids = gram_ids
+        self._gram_docs = pair_doc[order]
+        self._gram_indptr = np.concatenate(([0], np.cumsum(np.bincount(pair_gram, minlength=len(gram_ids)))))
+
+    def _postings(self, gram):
+        gid = self._gram_ids.get(gram)
+        if gid is None:
+            return np.empty(0, dtype=np.int32)
+        return self._gram_docs[self._gram_indptr[gid]:self._gram_indptr[gid + 1]]
+
+    def search(self, query, limit=None):
+        # Keys containing `query` as a substring, most popular first
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        if len(query) < GRAM:
+            candidates = range(len(self.keys))
+        else:
+            lists = sorted((self._postings(g) for g in _grams(query)), key=len)
+            candidates = lists[0]
+            for postings in lists[1:]:
+                if len(candidates) == 0:
+                    break
+                candidates = np.intersect1d(candidates, postings, assume_unique=True)
+
+        results = []
+        for doc in candidates:
+            key = self.keys[doc]
+            if query in key:
+                results.append(key)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    # --- prefix completion ---
+
+    def _build_prefixes(self):
+        entries = []
+        head = {}
+        for doc, key in enumerate(self.keys):
+            for suffix in _word_starts(key):
+                entries.append((suffix, doc))
+                for n in range(1, min(HEAD_PREFIX_LEN, len(suffix)) + 1):
+                    docs = head.setdefault(suffix[:n], [])
+                    # Docs arrive in popularity order, so the first HEAD_SIZE are the best ones
+                    if len(docs) < HEAD_SIZE and (not docs or docs[-1] != doc):
+                        docs.append(doc)
+        entries.sort()
+        self._suffixes = [suffix for suffix, _ in entries]
+        self._suffix_docs = np.asarray([doc for _, doc in entries], dtype=np.int32)
+        self._head = head
+
+    def complete(self, prefix, limit=10):
+        # Doc ids of the best `limit` completions, most popular first
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        if len(prefix) <= HEAD_PREFIX_LEN and limit <= HEAD_SIZE:
+            return self._head.get(prefix, [])[:limit]
+
+        lo = bisect.bisect_left(self._suffixes, prefix)
+        hi = bisect.bisect_left(self._suffixes, prefix + '\uffff', lo)
+        if lo == hi:
+            return []
+        docs = np.unique(self._suffix_docs[lo:hi])  # sorted, i.e. by popularity
+        return docs[:limit].tolist()
+
+    def complete_keys(self, prefix, limit=10):
+        return [(self.keys[doc], float(self.popularity[doc])) for doc in self.complete(prefix, limit)]
@@ -0,0 +1,146 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+
+# ----------------- Title Resolver -------------------------------
+# One place that turns whatever the user typed into a catalog row. Shared by
+# recommender.py (content and collaborative parts), watchlist_recommender.py and the API.
+#
+#   1. exact match on the normalized title            (dict lookup)
+#   2. otherwise the titles sharing the most character trigrams with the query
+#      are taken from a trigram posting index            (no catalog scan)
+#   3. those candidates are checked with an edit distance that gives up as soon as it
+#      exceeds what the cutoff allows, and the closest one wins
+#
+# Resolved queries are kept in an LRU cache, so a repeated lookup is a dict hit.
+
+DEFAULT_CUTOFF = 0.7        # same meaning as difflib's cutoff: 1 - distance / longer length
+MAX_CANDIDATES = 32         # titles verified per query
+CACHE_SIZE = int(os.getenv('TITLE_RESOLVER_CACHE', 4096))
+
+
+def normalize_title(title):
+    return ' '.join(str(title).lower().split())
+
+
+def _grams(key):
+    padded = f' {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_edit_distance(a, b, max_dist):
+    # Levenshtein distance, or max_dist + 1 as soon as it is certain to exceed max_dist.
+    # Only the diagonal band |i - j| <= max_dist of the DP table is filled in.
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    if len(a) > len(b):
+        a, b = b, a
+    too_far = max_dist + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        lo = max(1, i - max_dist)
+        hi = min(len(b), i + max_dist)
+        cur = [too_far] * (len(b) + 1)
+        if lo == 1:
+            cur[0] = i
+        best = cur[0]
+        for j in range(lo, hi + 1):
+            cost = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < cost:
+                cost = prev[j] + 1
+            if cur[j - 1] + 1 < cost:
+                cost = cur[j - 1] + 1
+            cur[j] = cost
+            if cost < best:
+                best = cost
+        if best > max_dist:
+            return too_far
+        prev = cur
+    return min(prev[len(b)], too_far)
+
+
+class TitleResolver:
+
+    def __init__(self, titles, values=None, cutoff=DEFAULT_CUTOFF, cache_size=CACHE_SIZE):
+        # titles: iterable of titles; values: what resolve() returns for each (default: its position)
+        self.keys = [normalize_title(t) for t in titles]
+        self.values = list(values) if values is not None else list(range(len(self.keys)))
+        self.cutoff = cutoff
+
+        self.exact = {}
+        for pos, key in enumerate(self.keys):
+            self.exact.setdefault(key, pos)  # first occurrence wins
+
+        gram_ids = {}
+        rows, cols = [], []
+        for key, pos in self.exact.items():
+            for g in _grams(key):
+                rows.append(gram_ids.setdefault(g, len(gram_ids)))
+                cols.append(pos)
+        rows = np.asarray(rows, dtype=np.int32)
+        self._gram_counts = np.bincount(np.asarray(cols, dtype=np.int32), minlength=len(self.keys))
+        order = np.argsort(rows, kind='stable')
+        self._gram_ids = gram_ids
+        self._gram_docs = np.asarray(cols, dtype=np.int32)[order]
+        self._gram_indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=len(gram_ids)))))
+
+        self._match = lru_cache(maxsize=cache_size)(self._match_uncached)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _candidates(self, key):
+        grams = _grams(key)
+        ids = [self._gram_ids[g] for g in grams if g in self._gram_ids]
+        if not ids:
+            return np.empty(0, dtype=np.int32)
+        hits = np.concatenate([self._gram_docs[self._gram_indptr[i]:self._gram_indptr[i + 1]] for i in ids])
+        docs, shared = np.unique(hits, return_counts=True)
+        # Dice overlap of the trigram sets, so long titles that merely contain the query
+        # don't crowd out titles of the right length; catalog order on ties
+        dice = shared / (len(grams) + self._gram_counts[docs])
+        order = np.lexsort((docs, -dice))[:MAX_CANDIDATES]
+        return docs[order]
+
+    def _match_uncached(self, key, cutoff):
+        pos = self.exact.get(key)
+        if pos is not None:
+            return pos, 1.0
+        if not key:
+            return None
+
+        best, best_dist = None, None
+        for pos in self._candidates(key):
+            candidate = self.keys[pos]
+            longest = max(len(key), len(candidate))
+            max_dist = int(longest * (1 - cutoff) + 1e-9)
+            if best_dist is not None:
+                max_dist = min(max_dist, best_dist - 1)  # only a strictly closer title can win
+            if max_dist < 0:
+                break
+            dist = bounded_edit_distance(key, candidate, max_dist)
+            if dist <= max_dist:
+                best, best_dist = int(pos), dist
+                if dist == 0:
+                    break
+        if best is None:
+            return None
+        return best, 1 - best_dist / max(len(key), len(self.keys[best]))
+
+    def match(self, title, cutoff=None):
+        # (position, similarity) of the closest title, or None if nothing passes the cutoff
+        if title is None:
+            return None
+        return self._match(normalize_title(title), self.cutoff if cutoff is None else cutoff)
+
+    def resolve(self, title, cutoff=None):
+        found = self.match(title, cutoff)
+        return self.values[found[0]] if found else None
+
+    def position(self, title, cutoff=None):
+        found = self.match(title, cutoff)
+        return found[0] if found else None
+
+    def cache_info(self):
+        return self._match.cache_info()
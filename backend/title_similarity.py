@@ -0,0 +1,139 @@
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from similarity import topk_similarity, topk_similarity_rows, DEFAULT_MAX_MEMORY_MB, DEFAULT_N_JOBS
+
+# ----------------- Title Similarity Table -----------------------
+# "Similar Title" recommendations used to run difflib.SequenceMatcher against every
+# title on every request. Instead, at build time:
+#
+#   1. titles become count vectors of their character 1-3 grams (L2-normalised)
+#   2. every title's TITLE_CANDIDATES nearest titles by cosine come from the blockwise
+#      engine in similarity.py
+#   3. only those candidates are scored with SequenceMatcher and the best K kept
+#
+# The result is a table like the TF-IDF neighbor table: title_neighbor_idx (int32, N x K)
+# and title_neighbor_scores (float32 SequenceMatcher ratios, N x K). A request is a row slice.
+#
+#   python title_similarity.py --sample 300     # agreement with SequenceMatcher on the bundle catalog
+
+DEFAULT_TITLE_K = int(os.getenv('TITLE_NEIGHBOR_K', 20))
+TITLE_CANDIDATES = int(os.getenv('TITLE_CANDIDATES', 50))
+NGRAM_RANGE = (1, 3)
+
+
+def title_vectors(titles):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    # Plain n-gram counts across word boundaries: SequenceMatcher has no notion of rare
+    # words, and grams spanning a space keep some of the word order it rewards
+    vectorizer = TfidfVectorizer(analyzer='char', ngram_range=NGRAM_RANGE, lowercase=True, use_idf=False)
+    return vectorizer.fit_transform([str(t) for t in titles])
+
+
+def build_title_neighbors(titles, k: int = DEFAULT_TITLE_K, candidates: int = TITLE_CANDIDATES,
+                          max_memory_mb: int = DEFAULT_MAX_MEMORY_MB, n_jobs: int = DEFAULT_N_JOBS):
+    titles = [str(t).lower() for t in titles]
+    candidates = max(k, candidates)
+    cand_idx, _ = topk_similarity(title_vectors(titles), candidates, max_memory_mb=max_memory_mb, n_jobs=n_jobs)
+    return rescore_candidates(titles, range(len(titles)), cand_idx, k)
+
+
+def title_neighbors_for_rows(titles, rows, k: int = DEFAULT_TITLE_K, candidates: int = TITLE_CANDIDATES):
+    # Table rows for `rows` only (e.g. movies just appended), plus their cosine candidates
+    titles = [str(t).lower() for t in titles]
+    cand_idx, _ = topk_similarity_rows(title_vectors(titles), rows, max(k, candidates))
+    neighbor_idx, neighbor_scores = rescore_candidates(titles, rows, cand_idx, k)
+    return neighbor_idx, neighbor_scores, cand_idx
+
+
+def rescore_candidates(titles, rows, cand_idx, k):
+    # SequenceMatcher ratio of each row's title against its candidates (lowercased titles); best k kept
+    from difflib import SequenceMatcher
+
+    k = min(k, cand_idx.shape[1])
+    neighbor_idx = np.full((len(cand_idx), k), -1, dtype=np.int32)
+    neighbor_scores = np.zeros((len(cand_idx), k), dtype=np.float32)
+    matcher = SequenceMatcher(None)
+    for i, (pos, row) in enumerate(zip(rows, cand_idx)):
+        row = row[row >= 0]
+        matcher.set_seq2(titles[pos])  # SequenceMatcher caches details of seq2
+        ratios = np.empty(len(row), dtype=np.float32)
+        for j, other in enumerate(row):
+            matcher.set_seq1(titles[other])
+            ratios[j] = matcher.ratio()
+        # Best ratio first, catalog order on ties (as the old stable sort over the catalog)
+        order = np.lexsort((row, -ratios))[:k]
+        neighbor_idx[i, :len(order)] = row[order]
+        neighbor_scores[i, :len(order)] = ratios[order]
+    return neighbor_idx, neighbor_scores
+
+
+# ----------------- Validation -------------------------------------
+
+def sequence_matcher_top(title, titles, top_n):
+    from difflib import SequenceMatcher
+
+    title = title.lower()
+    scores = np.array([SequenceMatcher(None, title, t.lower()).ratio() for t in titles])
+    order = np.lexsort((np.arange(len(titles)), -scores))
+    return [i for i in order if titles[i].lower() != title][:top_n]
+
+
+def compare_with_sequence_matcher(titles, title_neighbor_idx, sample=200, top_n=5, seed=42):
+    # Mean overlap of the two top_n lists (self excluded), plus mean SequenceMatcher ratio of
+    # each method's picks, so a low overlap between equally good candidates is visible as such
+    from difflib import SequenceMatcher
+
+    titles = [str(t) for t in titles]
+    rows = random.Random(seed).sample(range(len(titles)), min(sample, len(titles)))
+    overlap, ratio_table, ratio_sm, sm_seconds = [], [], [], 0.0
+    for pos in rows:
+        start = time.perf_counter()
+        expected = sequence_matcher_top(titles[pos], titles, top_n)
+        sm_seconds += time.perf_counter() - start
+
+        got = [i for i in title_neighbor_idx[pos] if i >= 0 and titles[i].lower() != titles[pos].lower()][:top_n]
+        overlap.append(len(set(got) & set(expected)) / max(1, len(expected)))
+        query = titles[pos].lower()
+        ratio_table.append(np.mean([SequenceMatcher(None, query, titles[i].lower()).ratio() for i in got]) if got else 0.0)
+        ratio_sm.append(np.mean([SequenceMatcher(None, query, titles[i].lower()).ratio() for i in expected]) if expected else 0.0)
+
+    return {
+        'sample': len(rows),
+        'overlap_at_n': float(np.mean(overlap)),
+        'mean_ratio_table': float(np.mean(ratio_table)),
+        'mean_ratio_sequence_matcher': float(np.mean(ratio_sm)),
+        'sequence_matcher_ms_per_query': sm_seconds / max(1, len(rows)) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the title neighbor table with SequenceMatcher.')
+    parser.add_argument('--sample', type=int, default=200)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    from model_store import get_model
+
+    model = get_model()
+    titles = model.catalog['title'].tolist()
+    table = model.title_neighbor_idx
+    if table is None:
+        print("[WARNING] The bundle has no title neighbor table; building one in memory.")
+        table, _ = build_title_neighbors(titles)
+
+    result = compare_with_sequence_matcher(titles, table, sample=args.sample, top_n=args.top)
+    print(f"titles: {len(titles)}  sample: {result['sample']}  top_n: {args.top}")
+    print(f"overlap with SequenceMatcher top-{args.top}: {result['overlap_at_n']:.3f}")
+    print(f"mean SequenceMatcher ratio  table: {result['mean_ratio_table']:.3f}  "
+          f"SequenceMatcher: {result['mean_ratio_sequence_matcher']:.3f}")
+    print(f"SequenceMatcher scan: {result['sequence_matcher_ms_per_query']:.1f} ms/query (table: one row slice)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,19 @@
+import numpy as np
 import pandas as pd
-from difflib import SequenceMatcher, get_close_matches
-from sklearn.metrics.pairwise import linear_kernel
-from sklearn.feature_extraction.text import TfidfVectorizer
-
-# ----------------- Load and Preprocess Data ---------------------
-df = pd.read_csv('processed_movies_dataset.csv')
-df['title_lower'] = df['title'].str.lower()
-
-# TF-IDF Vector
-tfidf = TfidfVectorizer(max_features=5000, stop_words='english')
-df['tags'] = df['tags'].fillna('')  # Make sure no NaN
-tfidf_matrix = tfidf.fit_transform(df['tags'])  # assumes 'tags' column exists
-indices = pd.Series(df.index, index=df['title_lower']).drop_duplicates()
+from difflib import SequenceMatcher
+from model_store import get_model
+from title_resolver import TitleResolver
 
+# ----------------- Model State ----------------------------------
+# The catalog (processed_movies_dataset.csv), its TF-IDF matrix and the neighbor table all come
+# from the shared model bundle, loaded lazily on first use instead of being refit at import.
 
 # ----------------- Recommender Functions ------------------------
 
-def get_title_similar_movies(title: str, df: pd.DataFrame, top_n: int = 5) -> pd.DataFrame:
+def get_title_similar_movies(title: str, df: pd.DataFrame, top_n: int = 5, title_neighbor_idx=None, pos=None) -> pd.DataFrame:
+    if title_neighbor_idx is not None and pos is not None and top_n <= title_neighbor_idx.shape[1]:
+        matches = title_neighbor_idx[pos, :top_n]
+        return df.iloc[matches[matches >= 0]][['title']].assign(reason='Similar Title')
     title = title.lower()
     temp_df = df.copy()
     temp_df['title_score'] = temp_df['title'].apply(lambda x: SequenceMatcher(None, title, x.lower()).ratio())
@@ -25,21 +22,30 @@ def get_title_similar_movies(title: str, df: pd.DataFrame, top_n: int = 5) -> pd
     print(f"[DEBUG][TF-IDF] Index for '{title_lower}':", idx)
     print("[DEBUG][TF-IDF] TF-IDF shape:", tfidf_matrix.shape)
 
-def get_movies_with_similar_genre(title: str, df: pd.DataFrame, top_n: int = 10) -> pd.DataFrame:
+def get_movies_with_similar_genre(title: str, df: pd.DataFrame, top_n: int = 10, person_index=None, pos=None) -> pd.DataFrame:
+    if person_index is not None and pos is not None:
+        matches = person_index.ranked_matches('genres', pos, top_n)
+        return df.iloc[matches][['title']].assign(reason='Same Genre')
     row = df[df['title_lower'] == title.lower()]
     if row.empty: return pd.DataFrame(columns=['title', 'reason'])
     target_genres = row.iloc[0]['genres']
     genre_match = df[df['genres'] == target_genres]
     return genre_match[['title']].drop_duplicates().head(top_n).assign(reason='Same Genre')
 
-def get_movies_by_same_director(title: str, df: pd.DataFrame, top_n: int = 10) -> pd.DataFrame:
+def get_movies_by_same_director(title: str, df: pd.DataFrame, top_n: int = 10, person_index=None, pos=None) -> pd.DataFrame:
+    if person_index is not None and pos is not None:
+        matches = person_index.ranked_matches('directors', pos, top_n)
+        return df.iloc[matches][['title']].assign(reason='Same Director')
     row = df[df['title_lower'] == title.lower()]
     if row.empty: return pd.DataFrame(columns=['title', 'reason'])
     director = row.iloc[0]['directors']
     same_director = df[df['directors'] == director]
     return same_director[['title']].drop_duplicates().head(top_n).assign(reason='Same Director')
 
-def get_movies_with_same_cast(title: str, df: pd.DataFrame, top_n: int = 10) -> pd.DataFrame:
+def get_movies_with_same_cast(title: str, df: pd.DataFrame, top_n: int = 10, person_index=None, pos=None) -> pd.DataFrame:
+    if person_index is not None and pos is not None:
+        matches = person_index.ranked_overlap('cast', pos, top_n)
+        return df.iloc[matches][['title']].assign(reason='Similar Cast')
     row = df[df['title_lower'] == title.lower()]
     if row.empty: return pd.DataFrame(columns=['title', 'reason'])
     target_cast = set(row.iloc[0]['cast'].split(", "))
@@ -54,14 +60,17 @@ def get_movies_with_same_cast(title: str, df: pd.DataFrame, top_n: int = 10) ->
     temp_df['cast_score'] = temp_df['cast'].apply(cast_overlap)
     return temp_df.nlargest(top_n, 'cast_score')[['title']].assign(reason='Similar Cast')
 
-def get_movies_by_same_writer(title: str, df: pd.DataFrame, top_n: int = 10) -> pd.DataFrame:
+def get_movies_by_same_writer(title: str, df: pd.DataFrame, top_n: int = 10, person_index=None, pos=None) -> pd.DataFrame:
+    if person_index is not None and pos is not None:
+        matches = person_index.ranked_matches('writers', pos, top_n)
+        return df.iloc[matches][['title']].assign(reason='Same Writer')
     row = df[df['title_lower'] == title.lower()]
     if row.empty: return pd.DataFrame(columns=['title', 'reason'])
     writer = row.iloc[0]['writers']
     same_writer = df[df['writers'] == writer]
     return same_writer[['title']].drop_duplicates().head(top_n).assign(reason='Same Writer')
 
-def get_tfidf_similar_movies(title: str, df: pd.DataFrame, tfidf_matrix, indices, top_n: int = 10) -> pd.DataFrame:
+def get_tfidf_similar_movies(title: str, df: pd.DataFrame, tfidf_matrix, indices, top_n: int = 10, neighbor_idx=None) -> pd.DataFrame:
     title_lower = title.lower()
     try:
         idx = indices[title_lower]
@@ -69,23 +78,19 @@ def get_tfidf_similar_movies(title: str, df: pd.DataFrame, tfidf_matrix, indices
         print(f"[WARNING] Title '{title}' not found in indices.")
         return pd.DataFrame(columns=['title', 'reason'])
 
-    # Now proceed safely
-    try:
-        cosine_sim = linear_kernel(tfidf_matrix[idx:idx+1], tfidf_matrix).flatten()
-        sim_scores = sorted(list(enumerate(cosine_sim)), key=lambda x: x[1], reverse=True)[1:top_n+1]
-        movie_indices = [i[0] for i in sim_scores]
-        return df.iloc[movie_indices][['title']].assign(reason='TF-IDF Similar')
-    except Exception as e:
-        print(f"[ERROR] TF-IDF similarity failed for {title}: {e}")
-        return pd.DataFrame(columns=['title', 'reason'])
-
     if isinstance(idx, pd.Series):
         idx = idx.iloc[0]  # take first occurrence
 
     try:
-        cosine_sim = linear_kernel(tfidf_matrix[idx:idx+1], tfidf_matrix).flatten()
-        sim_scores = sorted(list(enumerate(cosine_sim)), key=lambda x: x[1], reverse=True)[1:top_n+1]
-        movie_indices = [i[0] for i in sim_scores]
+        if neighbor_idx is not None and top_n <= neighbor_idx.shape[1]:
+            movie_indices = neighbor_idx[idx, :top_n]
+            movie_indices = movie_indices[movie_indices >= 0]  # -1: empty slot
+        else:
+            from sklearn.metrics.pairwise import linear_kernel
+
+            cosine_sim = linear_kernel(tfidf_matrix[idx:idx+1], tfidf_matrix).flatten()
+            sim_scores = sorted(list(enumerate(cosine_sim)), key=lambda x: x[1], reverse=True)[1:top_n+1]
+            movie_indices = [i[0] for i in sim_scores]
         return df.iloc[movie_indices][['title']].assign(reason='TF-IDF Similar')
     except Exception as e:
         print(f"[ERROR] TF-IDF similarity failed for {title}: {e}")
@@ -96,12 +101,18 @@ def remove_duplicates(df: pd.DataFrame, movie_title: str) -> pd.DataFrame:
     return df.drop_duplicates(subset='title')
 
 def hybrid_recommend(title: str, df: pd.DataFrame) -> pd.DataFrame:
-    part1 = get_movies_with_same_cast(title, df, top_n=10)
-    part2 = get_movies_by_same_director(title, df, top_n=10)
-    part3 = get_movies_with_similar_genre(title, df, top_n=10)
-    part4 = get_tfidf_similar_movies(title, df, tfidf_matrix, indices)
-    part5 = get_movies_by_same_writer(title, df, top_n=10)
-    part6 = get_title_similar_movies(title, df, top_n=5)
+    model = get_model()
+    # The person/genre index is positional, so it only applies when df is the model catalog itself
+    person_index = model.person_index if df is model.catalog else None
+    title_neighbor_idx = model.title_neighbor_idx if df is model.catalog else None
+    pos = model.title_resolver.position(title)
+    part1 = get_movies_with_same_cast(title, df, top_n=10, person_index=person_index, pos=pos)
+    part2 = get_movies_by_same_director(title, df, top_n=10, person_index=person_index, pos=pos)
+    part3 = get_movies_with_similar_genre(title, df, top_n=10, person_index=person_index, pos=pos)
+    tfidf_title = model.catalog['title'].iat[pos] if pos is not None else title  # catalog spelling
+    part4 = get_tfidf_similar_movies(tfidf_title, df, model.tfidf_matrix, model.title_to_pos, neighbor_idx=model.neighbor_idx)
+    part5 = get_movies_by_same_writer(title, df, top_n=10, person_index=person_index, pos=pos)
+    part6 = get_title_similar_movies(title, df, top_n=5, title_neighbor_idx=title_neighbor_idx, pos=pos)
 
     weight_map = {
         'Similar Cast': 1.0,
@@ -130,29 +141,125 @@ def hybrid_recommend(title: str, df: pd.DataFrame) -> pd.DataFrame:
     clean = remove_duplicates(combined, title)
     clean = clean.sort_values(by='score', ascending=False)
     return clean.head(45)
-print("[DEBUG][HYBRID] DF shape in hybrid_recommend:", df.shape)
 
-print("[DEBUG] TF-IDF matrix shape:", tfidf_matrix.shape)
-print("[DEBUG] DataFrame shape:", df.shape)
-
-# ----------------- Helper: Fuzzy Match --------------------------
-
-def match_title_fuzzy(user_title, all_titles, cutoff=0.7):
-    matches = get_close_matches(user_title.lower(), [t.lower() for t in all_titles], n=1, cutoff=cutoff)
-    return matches[0] if matches else None
+# ----------------- Multi-Seed Recommendation --------------------
+# One pass over the whole watchlist instead of a hybrid run per title. Every signal is a
+# dense score over the catalog for the seed set as a whole:
+#
+#   cast / director / genre / writer   shared people weighted by how many seeds have them
+#   TF-IDF                             cosine with the mean seed vector (one mat-vec)
+#   similar title                      the seeds' title-table rows, summed
+#   collaborative                      cosine with the summed, normalised seed rating rows
+#
+# Each signal is scaled to [0, 1], weighted as in hybrid_recommend() and summed. The cost is a
+# few passes over the matrices plus one histogram of the seeds, so it grows far slower than
+# the watchlist.
+
+SIGNAL_WEIGHTS = {
+    'Similar Cast': 1.0,
+    'Same Director': 0.9,
+    'Same Genre': 0.8,
+    'TF-IDF Similar': 1.2,
+    'Same Writer': 0.85,
+    'Similar Title': 0.7,
+    'Others also watched these': 1.0,
+}
+
+def _collaborative_scores(model, seeds):
+    # Catalog-aligned CF cosine of every movie with the seed set (zeros where a movie has no CF row)
+    scores = np.zeros(len(model.catalog), dtype=np.float32)
+    rows = {model.cf_resolver.resolve(model.catalog['title'].iat[pos]) for pos in seeds}
+    rows = np.array(sorted(r for r in rows if r is not None), dtype=np.int64)
+    if len(rows) == 0:
+        return scores
+
+    if model.mf is not None:
+        factors = model.mf.item_factors
+        norms = model.mf.item_norms
+        cf_scores = (factors @ (factors[rows] / norms[rows, None]).sum(axis=0)) / norms
+    else:
+        matrix = model.cf_matrix
+        norms = model.cf_row_norms
+        profile = np.asarray((matrix[rows].multiply(1.0 / norms[rows, None])).sum(axis=0), dtype=np.float32).ravel()
+        cf_scores = (matrix @ profile) / norms
+
+    target = model.cf_catalog_pos
+    known = target >= 0
+    np.maximum.at(scores, target[known], np.asarray(cf_scores, dtype=np.float32)[known])
+    return scores
+
+def multi_seed_recommend(watchlist: list, model=None, top_n: int = 20) -> pd.DataFrame:
+    model = model if model is not None else get_model()
+    catalog = model.catalog
+    seeds = sorted({pos for pos in map(model.title_resolver.position, watchlist) if pos is not None})
+    if not seeds:
+        return pd.DataFrame(columns=['title', 'reason', 'score'])
+
+    n = len(catalog)
+    signals = {}
+    person_index = model.person_index
+    for reason, role in (('Similar Cast', 'cast'), ('Same Director', 'directors'),
+                         ('Same Genre', 'genres'), ('Same Writer', 'writers')):
+        signals[reason] = person_index.profile_scores(role, seeds)
+
+    tfidf_matrix = model.tfidf_matrix
+    profile = np.asarray(tfidf_matrix[seeds].mean(axis=0)).ravel()
+    signals['TF-IDF Similar'] = tfidf_matrix @ profile
+
+    if model.title_neighbor_idx is not None:
+        title_scores = np.zeros(n, dtype=np.float32)
+        neighbors = np.asarray(model.title_neighbor_idx[seeds])
+        valid = neighbors >= 0
+        np.add.at(title_scores, neighbors[valid], np.asarray(model.title_neighbor_scores[seeds])[valid])
+        signals['Similar Title'] = title_scores
+
+    signals['Others also watched these'] = _collaborative_scores(model, seeds)
+
+    # Scale each signal to [0, 1] and weight it; the strongest weighted signal names the reason
+    reasons = list(signals)
+    weighted = np.zeros((len(reasons), n), dtype=np.float32)
+    for i, reason in enumerate(reasons):
+        scores = np.clip(np.asarray(signals[reason], dtype=np.float32), 0, None)
+        peak = scores.max()
+        if peak > 0:
+            weighted[i] = scores / peak * SIGNAL_WEIGHTS[reason]
+    total = weighted.sum(axis=0)
+
+    # Seeds, and other catalog rows with a seed's title, are never recommended
+    seed_titles = set(catalog['title'].iloc[seeds].str.lower())
+    total[catalog['title'].str.lower().isin(seed_titles).to_numpy()] = -np.inf
+    total[seeds] = -np.inf
+
+    # A few spare candidates cover catalog rows that repeat a title
+    k = min(2 * top_n, int(np.isfinite(total).sum()))
+    if k <= 0:
+        return pd.DataFrame(columns=['title', 'reason', 'score'])
+    top = np.argpartition(-total, k - 1)[:k]
+    top = top[np.lexsort((top, -total[top]))]
+    titles = catalog['title'].to_numpy()
+    top = top[~pd.Series(titles[top]).duplicated().to_numpy()][:top_n]
+    return pd.DataFrame({
+        'title': titles[top],
+        'reason': [reasons[i] for i in weighted[:, top].argmax(axis=0)],
+        'score': np.round(total[top], 3),
+    })
 
 # ----------------- Watchlist-Based Recommendation ---------------
 
 def personalized_recommend(watchlist: list, df: pd.DataFrame, top_n: int = 20) -> pd.DataFrame:
     print(f"[DEBUG] Original Watchlist: {watchlist}")
 
-    df_titles = df['title'].tolist()
+    # Shared resolver: exact lookup first, then trigram candidates + bounded edit distance
+    model = get_model()
+    resolver = model.title_resolver if df is model.catalog else TitleResolver(df['title'])
     matched_titles = []
+    watchlist_indices = []
 
     for title in watchlist:
-        match = match_title_fuzzy(title.strip(), df_titles)
-        if match:
-            matched_titles.append(match)
+        pos = resolver.position(title)
+        if pos is not None:
+            matched_titles.append(df['title'].iat[pos])
+            watchlist_indices.append(pos)
         else:
             print(f"[WARNING] Could not match title: {title}")
 
@@ -167,21 +274,10 @@ def personalized_recommend(watchlist: list, df: pd.DataFrame, top_n: int = 20) -
         })
 
     try:
-        watchlist_indices = []
-        for title in matched_titles:
-            try:
-                idx = indices[title.lower()]
-                if isinstance(idx, pd.Series):
-                    idx = idx.iloc[0]
-                watchlist_indices.append(idx)
-            except (KeyError, IndexError) as e:
-                print(f"[WARNING] Could not resolve index for '{title}': {e}")
-
-        if not watchlist_indices:
-            raise ValueError("No valid indices found for matched titles.")
-
+        tfidf_matrix = model.tfidf_matrix
         watchlist_vectors = tfidf_matrix[watchlist_indices]
         user_profile = watchlist_vectors.mean(axis=0).A  # Converts to ndarray
+        from sklearn.metrics.pairwise import linear_kernel
         cosine_sim = linear_kernel(user_profile, tfidf_matrix).flatten()
 
         sim_scores = sorted(list(enumerate(cosine_sim)), key=lambda x: x[1], reverse=True)
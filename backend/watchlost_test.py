@@ -2,9 +2,10 @@ import pandas as pd
 from difflib import SequenceMatcher, get_close_matches
 from sklearn.metrics.pairwise import linear_kernel
 from sklearn.feature_extraction.text import TfidfVectorizer
+from catalog_cache import load_processed
 
 # --- Load and preprocess ---
-df = pd.read_csv('processed_movies_dataset.csv')
+df = load_processed()  # processed_movies_dataset.csv, from the columnar cache written by mrs.py
 
 # Fill missing data to avoid errors
 df['cast'] = df['cast'].fillna('')
@@ -1,19 +1,45 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
+import axios from 'axios';
 import { motion } from 'framer-motion';
 import { Search } from 'lucide-react';
 
 export default function SearchBar() {
   const [query, setQuery] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
   const navigate = useNavigate();
 
+  // Typeahead: ask /autocomplete on every keystroke and drop the answer of any stale request
+  useEffect(() => {
+    const q = query.trim();
+    if (!q) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    axios
+      .get('http://127.0.0.1:5000/autocomplete', { params: { q, limit: 8 }, signal: controller.signal })
+      .then((res) => setSuggestions(res.data.suggestions || []))
+      .catch((err) => {
+        if (!axios.isCancel(err)) setSuggestions([]);
+      });
+    return () => controller.abort();
+  }, [query]);
+
   const handleSubmit = (e) => {
     e.preventDefault();
+    setSuggestions([]);
     if (query.trim()) {
       navigate(`/search?query=${encodeURIComponent(query.trim())}`);
     }
   };
 
+  const handleSelect = (title) => {
+    setSuggestions([]);
+    setQuery(title);
+    navigate(`/movie_details?query=${encodeURIComponent(title)}`);
+  };
+
   return (
     <motion.form
       onSubmit={handleSubmit}
@@ -84,6 +110,44 @@ export default function SearchBar() {
         >
           Search
         </button>
+        {suggestions.length > 0 && (
+          <ul
+            role="listbox"
+            style={{
+              position: 'absolute',
+              top: '100%',
+              left: '1.5rem',
+              right: '1.5rem',
+              marginTop: '0.5rem',
+              padding: '0.5rem 0',
+              listStyle: 'none',
+              borderRadius: '1rem',
+              backgroundColor: 'var(--card-surface)',
+              border: '1px solid var(--sepia-accent)',
+              boxShadow: '0 6px 20px rgba(139,106,79,0.25)',
+              overflow: 'hidden',
+            }}
+          >
+            {suggestions.map((s) => (
+              <li
+                key={s.title}
+                role="option"
+                onMouseDown={(e) => {
+                  e.preventDefault();
+                  handleSelect(s.title);
+                }}
+                style={{
+                  padding: '0.6rem 1.5rem',
+                  color: 'var(--text-primary)',
+                  cursor: 'pointer',
+                }}
+                className="hover:bg-fadedGold hover:text-smoky"
+              >
+                {s.title}
+              </li>
+            ))}
+          </ul>
+        )}
       </div>
     </motion.form>
   );
@@ -1,8 +1,40 @@
 import { useState, useEffect, useRef } from 'react';
-import axios from 'axios';
 import { FiMessageCircle, FiSend, FiRefreshCw } from 'react-icons/fi';
 import { marked } from 'marked';
 
+const CHAT_STREAM_URL = 'http://localhost:5000/chat/stream';
+
+// Clean and format a reply using marked.js for markdown
+const formatReply = (text) => marked.parse(text.replace(/[*_~`]/g, ''));
+
+// Reads the server-sent events from /chat/stream, calling onDelta with each fragment
+const streamReply = async (message, onDelta) => {
+  const res = await fetch(CHAT_STREAM_URL, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ message }),
+  });
+  if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    for (const event of events) {
+      if (!event.startsWith('data:')) continue;
+      const data = JSON.parse(event.slice(5));
+      if (data.error) throw new Error(data.error);
+      if (data.done) return;
+      onDelta(data.delta);
+    }
+  }
+};
+
 const Chatbox = () => {
   const [messages, setMessages] = useState([]);
   const [userInput, setUserInput] = useState('');
@@ -39,23 +71,23 @@ const Chatbox = () => {
     setLoading(true);
     setError(null);
 
+    let reply = '';
     try {
-      const res = await axios.post('http://localhost:5000/chat', {
-        message: inputToSend,
-      });
-
-      // Clean and format the response using marked.js for markdown
-      const cleanResponse = marked.parse(res.data.reply.replace(/[*_~`]/g, ''));
-
-      setMessages((prev) => [
-        ...prev,
-        {
-          text: cleanResponse,
+      // Show the bot message as soon as the first fragment arrives, then grow it in place
+      await streamReply(inputToSend, (delta) => {
+        const started = reply !== '';
+        reply += delta;
+        const botMessage = {
+          text: formatReply(reply),
           type: 'bot',
           timestamp: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
-        },
-      ]);
+        };
+        setMessages((prev) => (started ? [...prev.slice(0, -1), botMessage] : [...prev, botMessage]));
+        setLoading(false);
+      });
     } catch (err) {
+      // Drop a half-streamed reply so Retry resends the user's message
+      if (reply) setMessages((prev) => prev.slice(0, -1));
       setError('Failed to get response. Please try again.');
     } finally {
       setLoading(false);